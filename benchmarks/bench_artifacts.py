@@ -0,0 +1,117 @@
+# Description: benchmark of the tool logs retrieval through the argo-server artifact proxy and straight from the
+# S3-compatible artifact repository, against the in-process fake argo-server and fake S3 store.
+# Usage: python benchmarks/bench_artifacts.py [--iterations N] [--nodes N] [--payload-size B] [--latency S]
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.testing import FakeArgoServer, FakeS3Server
+
+ACCESS_KEY = "minio"
+
+
+def create_execution(server, name):
+    return Execution(
+        namespace="ns1",
+        workflow=None,
+        entrypoint="water-bodies",
+        workflow_name=name,
+        processing_parameters={},
+        volume_size="1Gi",
+        max_cores=1,
+        max_ram="1Gi",
+        storage_class="standard",
+        handler=None,
+        endpoint=ArgoEndpoint(url=server.url, token="token"),
+    )
+
+
+def measure(name, server, iterations, env):
+    """retrieves the log, the usage report and the tool logs of iterations workflows"""
+    timings = []
+    with mock.patch.dict(os.environ, env):
+        for index in range(iterations):
+            workflow_name = f"{name.replace(' ', '-')}-{index}"
+            server.create_workflow("ns1", {"metadata": {"name": workflow_name}, "spec": {}})
+            execution = create_execution(server, workflow_name)
+            # as monitored to completion by the runner
+            execution.workflow_status = execution.get_workflow()
+            execution.completed = True
+
+            before = time.perf_counter()
+            execution.get_log()
+            execution.get_tool_logs()
+            timings.append(time.perf_counter() - before)
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": statistics.median(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "proxied_requests": len([path for _, path in server.requests if path.startswith("/artifact-files/")]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Artifact retrieval benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--nodes", type=int, default=32, help="tool logs per workflow")
+    parser.add_argument("--payload-size", type=int, default=256 * 1024, help="size of each log (bytes)")
+    parser.add_argument("--latency", type=float, default=0.005, help="latency of both servers (s)")
+    parser.add_argument("--json", action="store_true", help="print the results in JSON")
+    args = parser.parse_args()
+
+    # keep the runner logs out of the report
+    from loguru import logger
+
+    logger.remove()
+
+    s3 = FakeS3Server(latency=args.latency, access_key=ACCESS_KEY).start()
+    server = FakeArgoServer(
+        latency=args.latency, nodes=args.nodes, payload_size=args.payload_size, outputs="artifacts", s3=s3
+    ).start()
+
+    # get_tool_logs writes the logs in the working directory
+    cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+
+    try:
+        results = [
+            measure("argo-server proxy", server, args.iterations, {"ARGO_WF_S3_ACCESS_KEY_ID": ""}),
+            measure(
+                "artifact repository",
+                server,
+                args.iterations,
+                {"ARGO_WF_S3_ACCESS_KEY_ID": ACCESS_KEY, "ARGO_WF_S3_SECRET_ACCESS_KEY": "secret"},
+            ),
+        ]
+    finally:
+        os.chdir(cwd)
+        workdir.cleanup()
+        server.stop()
+        s3.stop()
+
+    # the proxied requests are cumulated over the runs
+    results[1]["proxied_requests"] -= results[0]["proxied_requests"]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'retrieval':<22} {'p50 ms':>10} {'max ms':>10} {'proxied requests':>18}")
+    for result in results:
+        print(
+            f"{result['name']:<22} {result['p50_ms']:>10.2f} {result['max_ms']:>10.2f} "
+            f"{result['proxied_requests']:>18}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Description: cold-start benchmark of a job: each run is a new Python process loading the service, evaluating
+# its resources and building its manifest, with and without a precompiled bundle.
+# Usage: python benchmarks/bench_cold_start.py [runs]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import yaml
+
+from zoo_argowf_runner.bundle import compile_service
+
+CWL_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "water_bodies_detection", "app-package.cwl"
+)
+
+# the job startup: from the CWL document to the manifest ready to be submitted
+JOB = """
+import sys, time, yaml
+start = time.perf_counter()
+from zoo_argowf_runner.bundle import load_cwl_workflow
+from zoo_argowf_runner.manifest import build_workflow_manifest
+imported = time.perf_counter()
+with open(sys.argv[1]) as stream:
+    cwl = yaml.safe_load(stream)
+workflow = load_cwl_workflow(cwl, "water-bodies")
+resources = workflow.eval_resource()
+workflow.get_workflow_inputs(mandatory=True)
+build_workflow_manifest(
+    workflow=workflow,
+    entrypoint="water-bodies",
+    argo_wf_name="water-bodies-1",
+    inputs={"inputs": {"aoi": "-121.399,39.834,-120.74,40.472"}},
+    max_cores=max(resources["coresMax"]),
+    max_ram=f"{max(resources['ramMax'])}Mi",
+)
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def run(runs, env):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", JOB, CWL_PATH],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append([float(value) * 1000 for value in output.split()[-2:]])
+    return timings
+
+
+def main(runs):
+    with open(CWL_PATH) as stream:
+        cwl = yaml.safe_load(stream)
+
+    env = {key: value for key, value in os.environ.items() if key != "ARGO_WF_BUNDLE_DIR"}
+
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        compile_service(cwl, "water-bodies", bundle_dir)
+
+        results = {
+            "parsed CWL": run(runs, env),
+            "bundle": run(runs, {**env, "ARGO_WF_BUNDLE_DIR": bundle_dir}),
+        }
+
+    medians = {}
+    for name, timings in results.items():
+        imports, startup = (statistics.median(column) for column in zip(*timings))
+        medians[name] = startup
+        print(f"{name:>10}: imports {imports:8.1f} ms, load and build {startup:8.1f} ms (medians)")
+
+    print(f"load and build speed-up: {medians['parsed CWL'] / medians['bundle']:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
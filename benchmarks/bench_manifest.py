@@ -0,0 +1,95 @@
+# Description: micro-benchmark of the build and serialisation time per submission of the Hera and fast manifest builders.
+# Usage: python benchmarks/bench_manifest.py [iterations]
+import json
+import os
+import statistics
+import sys
+import time
+
+import yaml
+from hera.workflows.models import WorkflowCreateRequest
+
+from zoo_argowf_runner.cwl2argo import cwl_to_argo
+from zoo_argowf_runner.manifest import VolumeManifests, build_workflow_manifest
+from zoo_argowf_runner.volume import VolumeTemplates
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+CWL_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "water_bodies_detection", "app-package.cwl"
+)
+
+
+def get_arguments(workflow, volume_templates, index):
+    return dict(
+        workflow=workflow,
+        entrypoint="water-bodies",
+        argo_wf_name=f"water-bodies-{index}",
+        inputs={"inputs": {"aoi": "-121.399,39.834,-120.74,40.472", "epsg": "EPSG:4326"}},
+        volume_size="12Gi",
+        max_cores=2,
+        max_ram="1024Mi",
+        storage_class="standard",
+        namespace="ns1",
+        pod_placement=PodPlacement(node_selector={"pool": "spot"}, env_vars={"A": "1"}),
+        priority=500,
+        additional_configmaps=[
+            volume_templates.create_config_map_volume(
+                name="cwl-wrapper-config-vol",
+                config_map_name="cwl-wrapper-config",
+                items=[{"key": "main.yaml", "path": "main.yaml", "mode": 420}],
+                default_mode=420,
+                optional=False,
+            )
+        ],
+        additional_secrets=[
+            volume_templates.create_secret_volume(
+                name="usersettings-vol", secret_name="user-settings"
+            )
+        ],
+    )
+
+
+def hera_submission(workflow, index):
+    wf = cwl_to_argo(**get_arguments(workflow, VolumeTemplates, index))
+    return WorkflowCreateRequest(workflow=wf.build()).json(
+        exclude_none=True, by_alias=True, exclude_unset=True, exclude_defaults=True
+    )
+
+
+def fast_submission(workflow, index):
+    manifest = build_workflow_manifest(**get_arguments(workflow, VolumeManifests, index))
+    return json.dumps({"workflow": manifest})
+
+
+def bench(function, workflow, iterations):
+    durations = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        function(workflow, index)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with open(CWL_PATH) as stream:
+        workflow = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+    assert hera_submission(workflow, 0) == fast_submission(workflow, 0)
+
+    report = {}
+    for name, function in [("hera", hera_submission), ("fast", fast_submission)]:
+        durations = bench(function, workflow, iterations)
+        report[name] = {
+            "first_ms": round(durations[0] * 1000, 3),
+            "mean_ms": round(statistics.mean(durations[1:]) * 1000, 3),
+            "p99_ms": round(sorted(durations)[int(len(durations) * 0.99) - 1] * 1000, 3),
+        }
+    report["speedup"] = round(report["hera"]["mean_ms"] / report["fast"]["mean_ms"], 1)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Description: benchmark suite of the runner against an in-process fake argo-server: CWL to Argo conversion,
+# resource evaluation, processing parameters, submission, monitoring and output retrieval end to end.
+# Usage: python benchmarks/bench_runner.py [--iterations N] [--latency S] [--nodes N] [--payload-size B]
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.cwl2argo import cwl_to_argo
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.manifest import VolumeManifests
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, ZooInputs
+
+CWL_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "water_bodies_detection", "app-package.cwl"
+)
+
+ZOO_INPUTS = {
+    "aoi": {"value": "-121.399,39.834,-120.74,40.472", "dataType": "string"},
+    "epsg": {"value": "EPSG:4326", "dataType": "string"},
+    "bands": {"value": ["green", "nir"], "maxOccurs": "2"},
+    "stac_items": {
+        "value": [
+            "https://earth-search.aws.element84.com/v0/collections/sentinel-s2-l2a-cogs/items/S2B_10TFK_20210713_0_L2A",
+            "https://earth-search.aws.element84.com/v0/collections/sentinel-s2-l2a-cogs/items/S2A_10TFK_20220524_0_L2A",
+        ],
+        "maxOccurs": "2",
+    },
+}
+
+
+def peak_rss_mb() -> float:
+    """returns the peak resident set size of the process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name, func, iterations):
+    """runs func iterations times and returns the throughput and latency percentiles"""
+    timings = []
+    start = time.perf_counter()
+    for index in range(iterations):
+        before = time.perf_counter()
+        func(index)
+        timings.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "throughput": iterations / elapsed,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def create_execution(workflow, server, index):
+    return Execution(
+        namespace="ns1",
+        workflow=workflow,
+        entrypoint="water-bodies",
+        workflow_name=f"water-bodies-{index}",
+        processing_parameters=ZooInputs(json.loads(json.dumps(ZOO_INPUTS))).get_processing_parameters(),
+        volume_size="12Gi",
+        max_cores=2,
+        max_ram="1024Mi",
+        storage_class="standard",
+        handler=None,
+        endpoint=ArgoEndpoint(url=server.url, token="token"),
+    )
+
+
+def volumes():
+    return dict(
+        additional_configmaps=[
+            VolumeManifests.create_config_map_volume(
+                name="cwl-wrapper-config-vol",
+                config_map_name="cwl-wrapper-config",
+                items=[{"key": "main.yaml", "path": "main.yaml", "mode": 420}],
+                default_mode=420,
+                optional=False,
+            )
+        ],
+        additional_secrets=[
+            VolumeManifests.create_secret_volume(
+                name="usersettings-vol", secret_name="user-settings"
+            )
+        ],
+    )
+
+
+def retrieve_outputs(execution):
+    execution.is_successful()
+    execution.get_output()
+    execution.get_log()
+    execution.get_usage_report()
+    execution.get_stac_catalog()
+    execution.get_tool_logs()
+
+
+def run_suite(iterations, latency, nodes, payload_size, run_duration, monitor_interval):
+    with open(CWL_PATH) as stream:
+        raw_cwl = yaml.safe_load(stream)
+    workflow = CWLWorkflow(raw_cwl, "water-bodies")
+
+    server = FakeArgoServer(
+        latency=latency, run_duration=run_duration, nodes=nodes, payload_size=payload_size
+    ).start()
+
+    # get_tool_logs writes the logs in the working directory
+    cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+
+    try:
+        submitted = {}
+
+        def submit(index):
+            execution = create_execution(workflow, server, f"submit-{index}")
+            execution.run(**volumes())
+            submitted[index] = execution
+
+        def end_to_end(index):
+            execution = create_execution(workflow, server, f"e2e-{index}")
+            execution.run(**volumes())
+            execution.monitor(interval=monitor_interval)
+            retrieve_outputs(execution)
+
+        results = [
+            measure(
+                "cwl_to_argo",
+                lambda index: cwl_to_argo(
+                    workflow=workflow,
+                    entrypoint="water-bodies",
+                    argo_wf_name=f"water-bodies-{index}",
+                    inputs={"inputs": {"aoi": "-121.399,39.834,-120.74,40.472"}},
+                ).to_dict(),
+                iterations,
+            ),
+            measure("eval_resource", lambda index: workflow.eval_resource(), iterations),
+            measure(
+                "get_processing_parameters",
+                lambda index: ZooInputs(
+                    json.loads(json.dumps(ZOO_INPUTS))
+                ).get_processing_parameters(),
+                iterations,
+            ),
+            measure("submission", submit, iterations),
+            measure(
+                "monitoring",
+                lambda index: submitted[index].monitor(interval=monitor_interval),
+                iterations,
+            ),
+            measure("output retrieval", lambda index: retrieve_outputs(submitted[index]), iterations),
+            measure("end to end", end_to_end, iterations),
+        ]
+    finally:
+        os.chdir(cwd)
+        workdir.cleanup()
+        server.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runner benchmarks against a fake argo-server")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="argo-server latency (s)")
+    parser.add_argument("--nodes", type=int, default=4, help="pod nodes per workflow")
+    parser.add_argument("--payload-size", type=int, default=64 * 1024, help="outputs size (bytes)")
+    parser.add_argument("--run-duration", type=float, default=0.0, help="workflow duration (s)")
+    parser.add_argument("--monitor-interval", type=float, default=0.01, help="polling interval (s)")
+    parser.add_argument("--json", action="store_true", help="print the results in JSON")
+    args = parser.parse_args()
+
+    # keep the runner logs out of the report
+    from loguru import logger
+
+    logger.remove()
+
+    os.environ.setdefault("ARGO_WF_MANIFEST_BUILDER", "fast")
+
+    results = run_suite(
+        args.iterations,
+        args.latency,
+        args.nodes,
+        args.payload_size,
+        args.run_duration,
+        args.monitor_interval,
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'benchmark':<26} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak RSS MiB':>14}")
+    for result in results:
+        print(
+            f"{result['name']:<26} {result['throughput']:>10.1f} {result['p50_ms']:>10.2f} "
+            f"{result['p99_ms']:>10.2f} {result['peak_rss_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
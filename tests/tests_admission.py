@@ -0,0 +1,131 @@
+import os
+import socket
+import sqlite3
+import tempfile
+import unittest
+
+from zoo_argowf_runner.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "admission.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_namespace_limit(self):
+        controller = AdmissionController(self.db_path, max_per_namespace=1)
+
+        first = controller._enqueue("ns1", "water-bodies", "ns1")
+        second = controller._enqueue("ns1", "water-bodies", "ns1")
+        other = controller._enqueue("ns2", "water-bodies", "ns2")
+
+        self.assertTrue(controller._try_admit(first))
+        self.assertFalse(controller._try_admit(second))
+        # another namespace is not blocked by ns1
+        self.assertTrue(controller._try_admit(other))
+
+        controller.release(first)
+        self.assertTrue(controller._try_admit(second))
+
+    def test_service_limit(self):
+        controller = AdmissionController(self.db_path, max_per_service=1)
+
+        with controller.admitted("ns1", "water-bodies", "ns1"):
+            ticket = controller._enqueue("ns2", "water-bodies", "ns2")
+            self.assertFalse(controller._try_admit(ticket))
+
+        self.assertTrue(controller._try_admit(ticket))
+
+    def test_weighted_fair_queuing(self):
+        controller = AdmissionController(
+            self.db_path, max_per_service=1, user_weights={"heavy": 1, "light": 2}
+        )
+
+        blocker = controller._enqueue("ns0", "svc", "ns0")
+        self.assertTrue(controller._try_admit(blocker))
+
+        burst = [controller._enqueue("heavy", "svc", "heavy") for _ in range(4)]
+        light = [controller._enqueue("light", "svc", "light") for _ in range(2)]
+
+        order = []
+        controller.release(blocker)
+        pending = burst + light
+        while pending:
+            admitted = next(t for t in pending if controller._try_admit(t))
+            order.append(admitted)
+            pending.remove(admitted)
+            controller.release(admitted)
+
+        # the light user jobs are not stuck behind the heavy user burst
+        self.assertEqual(order, [light[0], burst[0], light[1], burst[1], burst[2], burst[3]])
+
+    def test_priority_first(self):
+        controller = AdmissionController(self.db_path, max_per_service=1)
+
+        blocker = controller.acquire("ns0", "svc", "ns0")
+        batch = controller._enqueue("ns1", "svc", "ns1", priority=0)
+        interactive = controller._enqueue("ns2", "svc", "ns2", priority=1000)
+        controller.release(blocker)
+
+        self.assertFalse(controller._try_admit(batch))
+        self.assertTrue(controller._try_admit(interactive))
+
+    def test_schema_migration(self):
+        """a database created before the priorities gets the priority column"""
+        with sqlite3.connect(self.db_path) as db:
+            db.execute(
+                "CREATE TABLE tickets (id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, "
+                "service TEXT NOT NULL, user TEXT NOT NULL, state TEXT NOT NULL, finish_tag REAL NOT NULL, "
+                "pid INTEGER NOT NULL, host TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            db.execute(
+                "INSERT INTO tickets (namespace, service, user, state, finish_tag, pid, host, created) "
+                "VALUES ('ns0', 'svc', 'ns0', 'running', 1, ?, ?, 0)",
+                (os.getpid(), socket.gethostname()),
+            )
+
+        controller = AdmissionController(self.db_path, max_per_service=2)
+        ticket = controller._enqueue("ns1", "svc", "ns1", priority=1000)
+
+        self.assertTrue(controller._try_admit(ticket))
+        with sqlite3.connect(self.db_path) as db:
+            self.assertEqual(
+                db.execute("SELECT priority FROM tickets ORDER BY id").fetchall(), [(0,), (1000,)]
+            )
+
+    def test_bounded_queue(self):
+        controller = AdmissionController(self.db_path, max_queue=2)
+
+        controller._enqueue("ns1", "svc", "ns1")
+        controller._enqueue("ns1", "svc", "ns1")
+
+        with self.assertRaises(AdmissionRejected):
+            controller._enqueue("ns1", "svc", "ns1")
+
+    def test_timeout(self):
+        controller = AdmissionController(
+            self.db_path, max_per_namespace=1, poll_interval=0.01, timeout=0.05
+        )
+
+        with controller.admitted("ns1", "svc", "ns1"):
+            with self.assertRaises(AdmissionRejected):
+                controller.acquire("ns1", "svc", "ns1")
+
+            # the timed out ticket is not left in the queue
+            with sqlite3.connect(self.db_path) as db:
+                self.assertEqual(
+                    db.execute("SELECT COUNT(*) FROM tickets").fetchone()[0], 1
+                )
+
+    def test_stale_tickets_are_purged(self):
+        controller = AdmissionController(self.db_path, max_per_namespace=1)
+
+        ticket = controller.acquire("ns1", "svc", "ns1")
+        with sqlite3.connect(self.db_path) as db:
+            # no process can have this pid
+            db.execute("UPDATE tickets SET pid = ? WHERE id = ?", (2**22 + 1, ticket))
+
+        self.assertIsNotNone(controller.acquire("ns1", "svc", "ns1"))
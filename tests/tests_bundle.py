@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+from click.testing import CliRunner
+
+from zoo_argowf_runner.bundle import (
+    BundledCWLWorkflow,
+    get_bundle_path,
+    compile_service,
+    load_cwl_workflow,
+)
+from zoo_argowf_runner.cli import main
+from zoo_argowf_runner.cwl2argo import cwl_to_argo
+from zoo_argowf_runner.manifest import build_workflow_manifest, get_skeleton
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestBundle(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwl_path = os.path.join(
+            os.path.dirname(__file__), "water_bodies", "app-package.cwl"
+        )
+        with open(cls.cwl_path) as stream:
+            cls.cwl = yaml.safe_load(stream)
+
+    def setUp(self):
+        self.bundle_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.bundle_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {"ARGO_WF_BUNDLE_DIR": self.bundle_dir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_bundle(self):
+        workflow = load_cwl_workflow(self.cwl, "water-bodies")
+
+        self.assertNotIsInstance(workflow, BundledCWLWorkflow)
+
+    def test_bundle_matches_parsed_cwl(self):
+        compile_service(self.cwl, "water-bodies", self.bundle_dir.name)
+
+        parsed = CWLWorkflow(self.cwl, "water-bodies")
+        bundled = load_cwl_workflow(self.cwl, "water-bodies")
+
+        self.assertIsInstance(bundled, BundledCWLWorkflow)
+        for method in ["get_version", "get_label", "get_doc", "eval_resource", "get_input_schema",
+                       "get_docker_images"]:
+            self.assertEqual(getattr(bundled, method)(), getattr(parsed, method)())
+        self.assertEqual(
+            bundled.get_workflow_inputs(mandatory=True),
+            parsed.get_workflow_inputs(mandatory=True),
+        )
+
+        arguments = dict(
+            entrypoint="water-bodies",
+            argo_wf_name="water-bodies-1",
+            inputs={"inputs": {"aoi": "-118.985,38.432,-118.183,38.938"}},
+            namespace="ns1",
+        )
+        self.assertEqual(
+            build_workflow_manifest(workflow=bundled, **arguments),
+            cwl_to_argo(workflow=parsed, **arguments).to_dict(),
+        )
+
+        # the CWL document is not parsed
+        self.assertNotIn("cwl", bundled.__dict__)
+
+    def test_bundled_skeleton(self):
+        for outputs in ["parameters", "artifacts"]:
+            with mock.patch.dict(os.environ, {"ARGO_WF_OUTPUTS": outputs}):
+                compile_service(self.cwl, "water-bodies", self.bundle_dir.name)
+                workflow = load_cwl_workflow(self.cwl, "water-bodies")
+
+                self.assertIs(get_skeleton(workflow, "water-bodies"), workflow.bundle["skeleton"])
+
+    def test_stale_bundle(self):
+        compile_service(self.cwl, "water-bodies", self.bundle_dir.name)
+
+        cwl = {**self.cwl, "s:softwareVersion": "9.9.9"}
+
+        workflow = load_cwl_workflow(cwl, "water-bodies")
+
+        self.assertNotIsInstance(workflow, BundledCWLWorkflow)
+        self.assertEqual(workflow.get_version(), "9.9.9")
+
+    def test_corrupted_bundle(self):
+        with open(get_bundle_path(self.bundle_dir.name, "water-bodies"), "wb") as stream:
+            stream.write(b"not a bundle")
+
+        self.assertNotIsInstance(load_cwl_workflow(self.cwl, "water-bodies"), BundledCWLWorkflow)
+
+    def test_scatter_multiplier_change(self):
+        compile_service(self.cwl, "water-bodies", self.bundle_dir.name)
+        workflow = load_cwl_workflow(self.cwl, "water-bodies")
+
+        with mock.patch.dict(os.environ, {"SCATTER_MULTIPLIER": "5"}):
+            self.assertEqual(
+                workflow.eval_resource(),
+                CWLWorkflow(self.cwl, "water-bodies").eval_resource(),
+            )
+
+    def test_cli_compile(self):
+        result = CliRunner().invoke(
+            main, ["compile", self.cwl_path, "--workflow-id", "water-bodies"]
+        )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertTrue(
+            os.path.exists(get_bundle_path(self.bundle_dir.name, "water-bodies"))
+        )
+        self.assertIsInstance(load_cwl_workflow(self.cwl, "water-bodies"), BundledCWLWorkflow)
@@ -0,0 +1,169 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.reaper import (
+    HOST_LABEL,
+    PID_LABEL,
+    PID_START_LABEL,
+    get_job_labels,
+    get_process_start,
+    is_job_alive,
+    label_value,
+    reap_orphans,
+)
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.testing import FakeArgoServer
+
+
+class TestCancel(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=60, nodes=2).start()
+        self.addCleanup(self.server.stop)
+
+    def run_job(self, env=None):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cwl = yaml.safe_load(stream)
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+
+        with mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": self.server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.02",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+                **(env or {}),
+            },
+        ):
+            runner = ZooArgoWorkflowsRunner(
+                cwl=cwl,
+                conf=conf,
+                inputs={
+                    "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                    "item": {"value": "https://example.com/item"},
+                },
+                outputs={"Result": {"value": ""}},
+                execution_handler=LoadTestExecutionHandler(conf=conf),
+            )
+            return runner, runner.execute()
+
+    def test_runner_timeout(self):
+        runner, exit_value = self.run_job(
+            {"ARGO_WF_RUNNER_TIMEOUT": "0.3", "ARGO_WF_ACTIVE_DEADLINE": "3600"}
+        )
+
+        self.assertEqual(exit_value, zoo.SERVICE_FAILED)
+        self.assertIn("not completed after 0.3 seconds", runner.execution.failure_reason)
+
+        (workflow,) = self.server.workflows.values()
+        self.assertEqual(workflow["spec"]["activeDeadlineSeconds"], 3600)
+        self.assertEqual(workflow["metadata"]["labels"][PID_LABEL], str(os.getpid()))
+        self.assertEqual(workflow["metadata"]["labels"]["zoo-argowf-runner/usid"], "abc-1234")
+        self.assertEqual(workflow["status"]["phase"], "Failed")
+        self.assertIn(("PUT", f"/api/v1/workflows/ns1/{runner.execution.workflow_name}/terminate"), self.server.requests)
+
+    def test_signal(self):
+        timer = threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        runner, exit_value = self.run_job({"ARGO_WF_CANCEL_MODE": "stop"})
+
+        self.assertEqual(exit_value, zoo.SERVICE_FAILED)
+        self.assertEqual(runner.execution.failure_reason, "execution cancelled: SIGTERM")
+        self.assertIn(("PUT", f"/api/v1/workflows/ns1/{runner.execution.workflow_name}/stop"), self.server.requests)
+        # the previous handler is restored
+        self.assertIs(signal.getsignal(signal.SIGTERM), signal.SIG_DFL)
+
+    def test_unknown_phase(self):
+        self.server.workflows[("ns1", "wf-unknown")] = {
+            "metadata": {"name": "wf-unknown", "namespace": "ns1", "labels": {}},
+            "status": {},
+        }
+        execution = Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name="wf-unknown",
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+        )
+
+        execution.monitor(schedule=PollingSchedule(interval=0.01, policy="fixed"), max_unknown_polls=3)
+
+        self.assertFalse(execution.is_completed())
+        self.assertEqual(execution.failure_reason, "workflow status unknown after 3 status checks")
+        self.assertEqual(
+            len([path for method, path in self.server.requests if path == "/api/v1/workflows/ns1/wf-unknown"]),
+            3,
+        )
+
+
+class TestReaper(unittest.TestCase):
+    def test_job_labels(self):
+        labels = get_job_labels(service="water_bodies", usid="abc-1234")
+
+        self.assertEqual(labels["zoo-argowf-runner/service"], "water_bodies")
+        self.assertTrue(is_job_alive(labels))
+        self.assertEqual(label_value("a b/c" + "x" * 100), "a-b-c" + "x" * 58)
+
+        # the process identity is checked
+        self.assertFalse(is_job_alive({**labels, PID_START_LABEL: "1"}))
+        self.assertIsNone(is_job_alive({**labels, HOST_LABEL: "another-host"}))
+
+    def test_reap_orphans(self):
+        server = FakeArgoServer(run_duration=60).start()
+        self.addCleanup(server.stop)
+
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead_pid = process.pid
+        process.wait()
+
+        host = label_value(socket.gethostname())
+        for name, labels in [
+            ("wf-orphan", {HOST_LABEL: host, PID_LABEL: str(dead_pid)}),
+            ("wf-alive", get_job_labels(service="water-bodies")),
+            ("wf-remote", {HOST_LABEL: "another-host", PID_LABEL: str(dead_pid)}),
+            ("wf-other", {}),
+        ]:
+            server.create_workflow("ns1", {"metadata": {"name": name, "labels": labels}})
+
+        endpoint = ArgoEndpoint(url=server.url, token="t")
+
+        self.assertEqual(reap_orphans(endpoint, dry_run=True), ["ns1/wf-orphan"])
+        self.assertNotIn("PUT", [method for method, _ in server.requests])
+
+        self.assertEqual(reap_orphans(endpoint, namespace="ns1"), ["ns1/wf-orphan"])
+        self.assertEqual(server.get_workflow("ns1", "wf-orphan")["status"]["phase"], "Failed")
+        self.assertEqual(server.get_workflow("ns1", "wf-alive")["status"]["phase"], "Running")
+
+        # the terminated workflow is completed
+        self.assertEqual(reap_orphans(endpoint), [])
+
+    def test_process_start(self):
+        self.assertIsNotNone(get_process_start(os.getpid()))
+        self.assertIsNone(get_process_start(2**22 + 1))
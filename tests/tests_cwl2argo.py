@@ -0,0 +1,106 @@
+import json
+import os
+import unittest
+
+import yaml
+
+from zoo_argowf_runner.cwl2argo import cwl_to_argo
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+
+class TestCwlToArgo(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cls.cwl = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+    def build(self, **kwargs):
+        return cwl_to_argo(
+            workflow=self.cwl,
+            entrypoint="water-bodies",
+            argo_wf_name="water-bodies-123",
+            inputs={"inputs": {"aoi": "-118.985,38.432,-118.183,38.938"}},
+            namespace="ns1",
+            **kwargs,
+        ).to_dict()
+
+    @staticmethod
+    def get_template(workflow, name):
+        return next(t for t in workflow["spec"]["templates"] if t["name"] == name)
+
+    @staticmethod
+    def get_step_parameters(workflow, step_name):
+        for group in TestCwlToArgo.get_template(workflow, "water-bodies")["steps"]:
+            for step in group:
+                if step["name"] == step_name:
+                    return {
+                        p["name"]: p["value"] for p in step["arguments"]["parameters"]
+                    }
+
+    def test_no_placement(self):
+        workflow = self.build()
+
+        for key in [
+            "nodeSelector",
+            "affinity",
+            "tolerations",
+            "podPriorityClassName",
+            "priority",
+        ]:
+            self.assertNotIn(key, workflow["spec"])
+
+        self.assertEqual(
+            sorted(self.get_step_parameters(workflow, "argo-cwl").keys()),
+            ["cwl", "entry_point", "max_cores", "max_ram", "parameters"],
+        )
+
+    def test_placement(self):
+        pod_placement = PodPlacement(
+            node_selector={"node-role": "storage"},
+            env_vars={"A": "1"},
+            affinity={
+                "nodeAffinity": {
+                    "requiredDuringSchedulingIgnoredDuringExecution": {
+                        "nodeSelectorTerms": [
+                            {
+                                "matchExpressions": [
+                                    {"key": "pool", "operator": "In", "values": ["spot"]}
+                                ]
+                            }
+                        ]
+                    }
+                }
+            },
+            tolerations=[{"key": "spot", "operator": "Exists", "effect": "NoSchedule"}],
+            priority_class="low",
+        )
+
+        workflow = self.build(pod_placement=pod_placement)
+
+        self.assertEqual(workflow["spec"]["nodeSelector"], {"node-role": "storage"})
+        self.assertEqual(workflow["spec"]["affinity"], pod_placement.affinity)
+        self.assertEqual(workflow["spec"]["tolerations"], pod_placement.tolerations)
+        self.assertEqual(workflow["spec"]["podPriorityClassName"], "low")
+
+        parameters = self.get_step_parameters(workflow, "argo-cwl")
+        self.assertEqual(json.loads(parameters["pod_env_vars"]), {"A": "1"})
+        self.assertEqual(
+            json.loads(parameters["pod_node_selector"]), {"node-role": "storage"}
+        )
+        self.assertEqual(json.loads(parameters["pod_tolerations"]), pod_placement.tolerations)
+        self.assertEqual(parameters["pod_priority_class"], "low")
+
+        self.assertEqual(
+            self.get_template(workflow, "prepare")["script"]["env"],
+            [{"name": "A", "value": "1"}],
+        )
+
+    def test_priority(self):
+        workflow = self.build(
+            priority=1200, pod_placement=PodPlacement(priority_class="zoo-high")
+        )
+
+        self.assertEqual(workflow["spec"]["priority"], 1200)
+        self.assertEqual(workflow["spec"]["podPriorityClassName"], "zoo-high")
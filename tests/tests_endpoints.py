@@ -0,0 +1,148 @@
+import os
+import socket
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import (
+    ArgoEndpoint,
+    ConsistentHashSelector,
+    HealthSelector,
+    LeastInFlightSelector,
+    get_endpoint_selector,
+)
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner
+from zoo_argowf_runner.timing import PhaseRecorder
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cls.raw_cwl = yaml.safe_load(stream)
+        cls.cwl = CWLWorkflow(cls.raw_cwl, "water-bodies")
+
+    def setUp(self):
+        self.servers = [FakeArgoServer().start(), FakeArgoServer().start()]
+        self.endpoints = [
+            ArgoEndpoint(url=server.url, token=f"token-{i}", name=f"cluster-{i}")
+            for i, server in enumerate(self.servers)
+        ]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def create_execution(self, endpoint):
+        return Execution(
+            namespace="ns1",
+            workflow=self.cwl,
+            entrypoint="water-bodies",
+            workflow_name="water-bodies-123",
+            processing_parameters={"aoi": "-118.985,38.432,-118.183,38.938"},
+            volume_size="10Gi",
+            max_cores=2,
+            max_ram="1024Mi",
+            storage_class="standard",
+            handler=None,
+            endpoint=endpoint,
+        )
+
+    def test_consistent_hash(self):
+        selector = ConsistentHashSelector(self.endpoints)
+
+        namespaces = [f"ns{i}" for i in range(50)]
+        selected = [selector.select(namespace).name for namespace in namespaces]
+
+        # stable and spread across the endpoints
+        self.assertEqual(selected, [selector.select(ns).name for ns in namespaces])
+        self.assertEqual(set(selected), {"cluster-0", "cluster-1"})
+
+    def test_health_failover(self):
+        selector = HealthSelector(self.endpoints)
+        self.assertEqual(selector.select("ns1").name, "cluster-0")
+
+        self.servers[0].healthy = False
+        self.assertEqual(selector.select("ns1").name, "cluster-1")
+        self.assertEqual(
+            [endpoint.name for endpoint in selector.candidates("ns1")],
+            ["cluster-1", "cluster-0"],
+        )
+
+    def test_least_in_flight(self):
+        self.servers[0].workflows[("ns1", "running")] = {
+            "metadata": {"name": "running"},
+            "status": {"phase": "Running"},
+        }
+
+        selector = LeastInFlightSelector(self.endpoints)
+        self.assertEqual(selector.select("ns1").name, "cluster-1")
+        self.assertEqual(selector.select("ns2").name, "cluster-0")
+
+    def test_probes_counted(self):
+        timings = PhaseRecorder()
+        metrics = mock.Mock()
+
+        with mock.patch("zoo_argowf_runner.argo_api.get_metrics", return_value=metrics):
+            with timings.phase("endpoint selection"):
+                HealthSelector(self.endpoints).candidates("ns1", timings)
+                LeastInFlightSelector(self.endpoints).candidates("ns1", timings)
+
+        self.assertEqual(timings.phases["endpoint selection"].api_calls, 6)
+        operations = [call.args[1]["operation"] for call in metrics.inc.call_args_list]
+        self.assertEqual(operations.count("get_version"), 4)
+        self.assertEqual(operations.count("count_in_flight_workflows"), 2)
+
+    def test_selector_from_env(self):
+        with mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINTS": f'[{{"url": "{self.servers[0].url}/", "token": "t"}}]',
+                "ARGO_WF_ENDPOINT_SELECTOR": "least-in-flight",
+            },
+        ):
+            selector = get_endpoint_selector()
+
+        self.assertIsInstance(selector, LeastInFlightSelector)
+        self.assertEqual(selector.endpoints[0].url, self.servers[0].url)
+
+    def test_execution_uses_selected_endpoint(self):
+        execution = self.create_execution(self.endpoints[1])
+        execution.run()
+
+        self.assertIn(("ns1", "water-bodies-123"), self.servers[1].workflows)
+        self.assertEqual(self.servers[0].workflows, {})
+
+        execution.monitor(interval=0)
+        self.assertTrue(execution.is_completed())
+        self.assertEqual(self.servers[0].requests, [])
+
+    def test_submission_failover(self):
+        # an endpoint nobody listens on
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            unreachable = ArgoEndpoint(
+                url=f"http://127.0.0.1:{sock.getsockname()[1]}", token="t", name="down"
+            )
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "auth_env": {"user": "ns1"},
+        }
+        with mock.patch.dict(os.environ, {"ARGO_WF_TOKEN": "t"}):
+            runner = ZooArgoWorkflowsRunner(
+                cwl=self.raw_cwl, conf=conf, inputs={}, outputs={}
+            )
+        runner.execution = self.create_execution(unreachable)
+
+        endpoint = runner.submit([unreachable, self.endpoints[0]])
+
+        self.assertEqual(endpoint.name, "cluster-0")
+        self.assertEqual(runner.execution.workflows_service, self.servers[0].url)
+        self.assertIn(("ns1", "water-bodies-123"), self.servers[0].workflows)
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestFakeArgoServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cls.cwl = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.2, nodes=3, payload_size=100).start()
+        self.addCleanup(self.server.stop)
+
+        self.execution = Execution(
+            namespace="ns1",
+            workflow=self.cwl,
+            entrypoint="water-bodies",
+            workflow_name="water-bodies-123",
+            processing_parameters={"aoi": "-118.985,38.432,-118.183,38.938"},
+            volume_size="10Gi",
+            max_cores=2,
+            max_ram="1024Mi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+        )
+        self.execution.run()
+
+    def test_end_to_end(self):
+        progress = []
+        self.execution.monitor(
+            interval=0.02, update_function=lambda percentage, message: progress.append(percentage)
+        )
+
+        self.assertTrue(self.execution.is_completed())
+        self.assertTrue(self.execution.is_successful())
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(len(self.execution.get_log()), 100)
+        self.assertEqual(json.loads(self.execution.get_output())["type"], "FeatureCollection")
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                tool_logs = self.execution.get_tool_logs()
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(tool_logs, ["step-0.log", "step-1.log", "step-2.log"])
+
+    def test_events_stream(self):
+        response = requests.get(
+            f"{self.server.url}/api/v1/workflow-events/ns1",
+            params={"listOptions.fieldSelector": "metadata.name=water-bodies-123"},
+            stream=True,
+        )
+
+        phases = [
+            json.loads(line[len("data: "):])["result"]["object"]["status"]["phase"]
+            for line in response.iter_lines(decode_unicode=True)
+            if line
+        ]
+
+        self.assertEqual(phases[-1], "Succeeded")
+        self.assertIn("Running", phases)
+
+    def test_logs(self):
+        response = requests.get(
+            f"{self.server.url}/api/v1/workflows/ns1/water-bodies-123/log",
+            params={"logOptions.container": "main"},
+        )
+
+        lines = [json.loads(line)["result"] for line in response.text.splitlines()]
+        self.assertTrue(lines)
+        self.assertTrue(all(line["podName"].startswith("water-bodies-123-") for line in lines))
+
+    def test_latency(self):
+        self.server.latency = 0.1
+
+        response = requests.get(f"{self.server.url}/api/v1/version")
+
+        self.assertGreaterEqual(response.elapsed.total_seconds(), 0.1)
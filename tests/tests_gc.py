@@ -0,0 +1,151 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.testing import FakeArgoServer
+
+
+class TestGarbageCollection(unittest.TestCase):
+    def test_ttl_zero(self):
+        """the workflow is deleted as soon as it completes, the runner gets it from the archive"""
+        server = FakeArgoServer(run_duration=0.1, nodes=2, archive=True).start()
+        self.addCleanup(server.stop)
+
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cwl = yaml.safe_load(stream)
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir, mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.05",
+                "ARGO_WF_MONITOR_POLICY": "fixed",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+                "ARGO_WF_TTL_AFTER_COMPLETION": "0",
+                "ARGO_WF_POD_GC": "OnPodCompletion",
+            },
+        ):
+            os.chdir(workdir)
+            try:
+                runner = ZooArgoWorkflowsRunner(
+                    cwl=cwl,
+                    conf=conf,
+                    inputs={
+                        "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                        "item": {"value": "https://example.com/item"},
+                    },
+                    outputs={"Result": {"value": ""}},
+                    execution_handler=LoadTestExecutionHandler(conf=conf),
+                )
+                exit_value = runner.execute()
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(exit_value, zoo.SERVICE_SUCCEEDED)
+        self.assertEqual(server.workflows, {})
+
+        (workflow,) = server.archived.values()
+        self.assertEqual(workflow["spec"]["ttlStrategy"], {"secondsAfterCompletion": 0})
+        self.assertEqual(workflow["spec"]["podGC"], {"strategy": "OnPodCompletion"})
+        self.assertIn(
+            ("GET", f"/api/v1/archived-workflows/{workflow['metadata']['uid']}?namespace=ns1"),
+            server.requests,
+        )
+        self.assertIn('"type": "FeatureCollection"', runner.outputs.outputs["Result"]["value"])
+
+    def test_archived_workflow_lookup(self):
+        """the outputs of a deleted workflow are looked up by name in the archive"""
+        server = FakeArgoServer(run_duration=0, archive=True).start()
+        self.addCleanup(server.stop)
+
+        server.create_workflow(
+            "ns1",
+            {"metadata": {"name": "wf-1"}, "spec": {"ttlStrategy": {"secondsAfterSuccess": 0}}},
+        )
+        time.sleep(0.01)
+        self.assertIsNone(server.get_workflow("ns1", "wf-1"))
+
+        execution = Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name="wf-1",
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=server.url, token="t"),
+        )
+
+        self.assertEqual(execution.get_stac_catalog(), "s3://results/wf-1/catalog.json")
+        self.assertIsNotNone(execution.workflow_uid)
+
+    def test_no_archive(self):
+        server = FakeArgoServer(run_duration=0).start()
+        self.addCleanup(server.stop)
+
+        execution = Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name="wf-missing",
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=server.url, token="t"),
+        )
+
+        self.assertIsNone(execution.get_workflow())
+        self.assertIsNone(execution.get_stac_catalog())
+
+    def test_outage_not_archived(self):
+        """the archive is only consulted for a deleted workflow, not when the argo-server fails"""
+        server = FakeArgoServer(run_duration=10, archive=True).start()
+        self.addCleanup(server.stop)
+        server.create_workflow("ns1", {"metadata": {"name": "wf-1"}})
+        server.healthy = False
+
+        execution = Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name="wf-1",
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=server.url, token="t"),
+        )
+        execution.cancel = mock.Mock()
+
+        self.assertIsNone(execution.get_workflow())
+        execution.monitor(schedule=PollingSchedule(interval=0.01, policy="fixed"), max_unknown_polls=3)
+
+        # one get_workflow call per poll, no archive lookup
+        self.assertEqual(server.requests, [("GET", "/api/v1/workflows/ns1/wf-1")] * 4)
@@ -0,0 +1,234 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.idempotency import (
+    INPUTS_HASH_LABEL,
+    get_idempotency_key,
+    get_idempotent_workflow_name,
+    get_inputs_hash,
+)
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestIdempotencyKeys(unittest.TestCase):
+    def test_keys(self):
+        inputs = {"aoi": "-118.985,38.432", "bands": ["green", "nir"]}
+
+        # the inputs are hashed in their canonical form
+        self.assertEqual(
+            get_inputs_hash("water-bodies", inputs),
+            get_inputs_hash("water-bodies", {"bands": ["green", "nir"], "aoi": "-118.985,38.432"}),
+        )
+        self.assertNotEqual(
+            get_inputs_hash("water-bodies", inputs),
+            get_inputs_hash("water-bodies", {**inputs, "bands": ["nir", "green"]}),
+        )
+
+        key = get_idempotency_key("water-bodies", "abc-1234", inputs)
+        self.assertEqual(key, get_idempotency_key("water-bodies", "abc-1234", dict(inputs)))
+        self.assertNotEqual(key, get_idempotency_key("water-bodies", "abc-1235", inputs))
+
+        self.assertEqual(get_idempotent_workflow_name("water_bodies", key), f"water-bodies-{key[:16]}")
+        self.assertEqual(len(get_idempotent_workflow_name("x" * 100, key)), 43)
+
+
+class TestDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.5, nodes=2).start()
+        self.addCleanup(self.server.stop)
+
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+
+        # the tool logs of the executions are written to the working directory
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(workdir.name)
+
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            self.cwl = yaml.safe_load(stream)
+
+    def get_runner(self, usid):
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": usid},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+        return ZooArgoWorkflowsRunner(
+            cwl=self.cwl,
+            conf=conf,
+            inputs={
+                "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                "item": {"value": "https://example.com/item"},
+            },
+            outputs={"Result": {"value": ""}},
+            execution_handler=LoadTestExecutionHandler(conf=conf),
+        )
+
+    def get_env(self, mode):
+        return {
+            "ARGO_WF_ENDPOINT": self.server.url,
+            "ARGO_WF_TOKEN": "t",
+            "ARGO_WF_MONITOR_INTERVAL": "0.05",
+            "ARGO_WF_MONITOR_POLICY": "fixed",
+            "ARGO_WF_MANIFEST_BUILDER": "fast",
+            "ARGO_WF_DEDUPLICATION": mode,
+            "ARGO_WF_LOCK_DIR": self.lock_dir,
+        }
+
+    def test_retried_job(self):
+        """a retried job gets the workflow of its first attempt"""
+        with mock.patch.dict(os.environ, self.get_env("idempotent")):
+            runners = [self.get_runner("abc-1234"), self.get_runner("abc-1234")]
+            exit_values = [runner.execute() for runner in runners]
+
+        self.assertEqual(exit_values, [zoo.SERVICE_SUCCEEDED] * 2)
+        self.assertEqual(len(self.server.workflows), 1)
+        self.assertEqual(runners[0].execution.workflow_name, runners[1].execution.workflow_name)
+        self.assertEqual(runners[0].execution.workflow_uid, runners[1].execution.workflow_uid)
+        self.assertEqual(len([method for method, _ in self.server.requests if method == "POST"]), 2)
+        self.assertIn('"type": "FeatureCollection"', runners[1].outputs.outputs["Result"]["value"])
+
+    def test_hera_create_or_get(self):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            workflow = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+        executions = []
+        for _ in range(2):
+            execution = Execution(
+                namespace="ns1",
+                workflow=workflow,
+                entrypoint="water-bodies",
+                workflow_name="water-bodies-0123456789abcdef",
+                processing_parameters={},
+                volume_size="1Gi",
+                max_cores=1,
+                max_ram="1Gi",
+                storage_class="standard",
+                handler=None,
+                endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+            )
+            execution.run()
+            executions.append(execution)
+
+        self.assertEqual(len(self.server.workflows), 1)
+        self.assertEqual(executions[0].workflow_uid, executions[1].workflow_uid)
+
+    def test_single_flight(self):
+        """concurrent jobs with the same inputs attach to one workflow"""
+        results = {}
+
+        def run(usid):
+            runner = self.get_runner(usid)
+            results[usid] = (runner, runner.execute())
+
+        with mock.patch.dict(os.environ, self.get_env("single-flight")):
+            threads = [threading.Thread(target=run, args=(f"job-{index}",)) for index in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([exit_value for _, exit_value in results.values()], [zoo.SERVICE_SUCCEEDED] * 3)
+        ((workflow_name, workflow),) = [
+            (name, workflow) for (_, name), workflow in self.server.workflows.items()
+        ]
+        self.assertIn(INPUTS_HASH_LABEL, workflow["metadata"]["labels"])
+        self.assertEqual(
+            sorted(runner.execution.attached for runner, _ in results.values()), [False, True, True]
+        )
+        self.assertEqual({runner.execution.workflow_name for runner, _ in results.values()}, {workflow_name})
+
+    def test_attached_not_admitted(self):
+        """a job attaching to a workflow in flight does not wait for an admission slot"""
+        self.server.run_duration = 3
+        env = {
+            **self.get_env("single-flight"),
+            "ADMISSION_CONTROL_DB": os.path.join(self.lock_dir, "admission.db"),
+            "ADMISSION_MAX_PER_NAMESPACE": "1",
+            "ADMISSION_TIMEOUT": "0",
+        }
+        results = {}
+
+        def run(usid):
+            runner = self.get_runner(usid)
+            results[usid] = (runner, runner.execute())
+
+        with mock.patch.dict(os.environ, env):
+            first = threading.Thread(target=run, args=("job-0",))
+            first.start()
+            try:
+                deadline = time.time() + 10
+                while not self.server.workflows and time.time() < deadline:
+                    time.sleep(0.05)
+                # the first job holds the only slot of the namespace
+                run("job-1")
+            finally:
+                # the job writes its tool logs to the working directory of the test
+                first.join()
+
+        self.assertEqual([exit_value for _, exit_value in results.values()], [zoo.SERVICE_SUCCEEDED] * 2)
+        self.assertEqual(len(self.server.workflows), 1)
+        self.assertTrue(results["job-1"][0].execution.attached)
+
+    def test_single_flight_additional_parameters(self):
+        """jobs with the same inputs but other additional parameters do not share a workflow"""
+        results = {}
+
+        def run(usid):
+            runner = self.get_runner(usid)
+            runner.handler.get_additional_parameters = lambda: {"sub_path": usid}
+            results[usid] = (runner, runner.execute())
+
+        with mock.patch.dict(os.environ, self.get_env("single-flight")):
+            threads = [threading.Thread(target=run, args=(f"job-{index}",)) for index in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual([exit_value for _, exit_value in results.values()], [zoo.SERVICE_SUCCEEDED] * 2)
+        self.assertEqual(len(self.server.workflows), 2)
+        self.assertEqual([runner.execution.attached for runner, _ in results.values()], [False, False])
+        self.assertEqual(
+            {runner.execution.processing_parameters["sub_path"] for runner, _ in results.values()},
+            {"job-0", "job-1"},
+        )
+
+    def test_attached_not_cancelled(self):
+        self.server.create_workflow("ns1", {"metadata": {"name": "wf-1"}, "spec": {}})
+        execution = Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name="wf-1",
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+        )
+        execution.attached = True
+
+        execution.abort("execution cancelled: SIGTERM")
+
+        self.assertEqual(self.server.get_workflow("ns1", "wf-1")["status"]["phase"], "Running")
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# seconds, the runner imported hera-workflows, requests and cwl_utils in about 1s
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", 0.5))
+
+HEAVY_MODULES = ["hera", "requests", "cwl_utils.parser", "schema_salad"]
+
+IMPORT_RUNNER = f"""
+import json, sys, time
+start = time.perf_counter()
+import zoo_argowf_runner.runner
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+LOAD_CWL = """
+import json, sys, yaml
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+with open(sys.argv[1]) as stream:
+    CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+print(json.dumps(sorted(name for name in sys.modules if name.startswith("cwl_utils.parser"))))
+"""
+
+
+def run_python(source, *args):
+    output = subprocess.run(
+        [sys.executable, "-c", source, *args],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    def test_runner_import_budget(self):
+        # best of three to absorb the noise of a cold file system cache
+        results = [run_python(IMPORT_RUNNER) for _ in range(3)]
+
+        self.assertEqual(results[0]["loaded"], [])
+        self.assertLess(min(result["elapsed"] for result in results), IMPORT_TIME_BUDGET)
+
+    def test_only_declared_cwl_version_loaded(self):
+        loaded = run_python(
+            LOAD_CWL,
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl"),
+        )
+
+        self.assertEqual(loaded, ["cwl_utils.parser.cwl_v1_0"])
@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.journal import ExecutionJournal
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.reaper import HOST_LABEL, PID_LABEL, USID_LABEL, label_value, reap_orphans
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.testing import FakeArgoServer
+
+
+class TestExecutionJournal(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = ExecutionJournal(directory.name)
+
+    def test_write_read(self):
+        self.assertIsNone(self.journal.read("abc-1234"))
+
+        self.journal.write("abc-1234", {"workflow_name": "wf-1", "phase": "Running"})
+        self.journal.write("abc-1234", {"workflow_name": "wf-1", "phase": "Succeeded"})
+
+        entry = self.journal.read("abc-1234")
+        self.assertEqual(entry["phase"], "Succeeded")
+        self.assertEqual(entry["usid"], "abc-1234")
+        # no temporary file is left behind
+        self.assertEqual(os.listdir(self.journal.directory), ["abc-1234.json"])
+
+        self.journal.remove("abc-1234")
+        self.journal.remove("abc-1234")
+        self.assertIsNone(self.journal.read("abc-1234"))
+
+    def test_unreadable(self):
+        with open(self.journal.get_path("abc-1234"), "w") as stream:
+            stream.write('{"workflow_na')
+        self.assertIsNone(self.journal.read("abc-1234"))
+
+
+class TestReattach(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.5, nodes=2).start()
+        self.addCleanup(self.server.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        # the tool logs of the executions are written to the working directory
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(workdir.name)
+
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            self.cwl = yaml.safe_load(stream)
+
+        patcher = mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": self.server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.05",
+                "ARGO_WF_MONITOR_POLICY": "fixed",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+                "ARGO_WF_JOURNAL_DIR": self.directory,
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_runner(self):
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+        return ZooArgoWorkflowsRunner(
+            cwl=self.cwl,
+            conf=conf,
+            inputs={
+                "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                "item": {"value": "https://example.com/item"},
+            },
+            outputs={"Result": {"value": ""}},
+            execution_handler=LoadTestExecutionHandler(conf=conf),
+        )
+
+    def crash(self):
+        """runs a job whose process dies while monitoring its workflow"""
+        runner = self.get_runner()
+        original = Execution.get_workflow_status
+        running_polls = []
+
+        def get_workflow_status(*args, **kwargs):
+            status, workflow = original(*args, **kwargs)
+            if status == "Running":
+                running_polls.append(status)
+                if len(running_polls) > 1:
+                    raise SystemExit("killed")
+            return status, workflow
+
+        with mock.patch.object(Execution, "get_workflow_status", side_effect=get_workflow_status):
+            with self.assertRaises(SystemExit):
+                runner.execute()
+        return runner
+
+    def test_reattach(self):
+        crashed = self.crash()
+
+        entry = ExecutionJournal(self.directory).read("abc-1234")
+        self.assertEqual(entry["workflow_name"], crashed.execution.workflow_name)
+        self.assertEqual(entry["phase"], "Running")
+        self.assertEqual(entry["endpoint"]["url"], self.server.url)
+
+        runner = self.get_runner()
+        exit_value = runner.execute()
+
+        self.assertEqual(exit_value, zoo.SERVICE_SUCCEEDED)
+        self.assertEqual(runner.execution.workflow_name, crashed.execution.workflow_name)
+        self.assertEqual(len(self.server.workflows), 1)
+        self.assertEqual(len([method for method, _ in self.server.requests if method == "POST"]), 1)
+        self.assertIn('"type": "FeatureCollection"', runner.outputs.outputs["Result"]["value"])
+        # the job is over
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_journaled_outputs(self):
+        """the outputs retrieved before the restart are not retrieved again"""
+        self.crash()
+        entry = ExecutionJournal(self.directory).read("abc-1234")
+        ExecutionJournal(self.directory).write(
+            "abc-1234", {**entry, "outputs": {"results": json.dumps({"stac": "s3://journaled"})}}
+        )
+
+        runner = self.get_runner()
+        runner.execute()
+
+        self.assertEqual(runner.execution.get_results(), json.dumps({"stac": "s3://journaled"}))
+
+    def test_workflow_gone(self):
+        ExecutionJournal(self.directory).write(
+            "abc-1234",
+            {
+                "service": "water-bodies",
+                "workflow_name": "wf-deleted",
+                "namespace": "ns1",
+                "endpoint": {"url": self.server.url, "name": self.server.url},
+            },
+        )
+
+        runner = self.get_runner()
+
+        self.assertEqual(runner.execute(), zoo.SERVICE_SUCCEEDED)
+        self.assertNotEqual(runner.execution.workflow_name, "wf-deleted")
+        self.assertEqual(len(self.server.workflows), 1)
+
+    def test_journaled_workflow_not_reaped(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        for name, usid in [("wf-journaled", "abc-1234"), ("wf-orphan", "abc-5678")]:
+            self.server.create_workflow(
+                "ns1",
+                {
+                    "metadata": {
+                        "name": name,
+                        "labels": {
+                            HOST_LABEL: label_value(socket.gethostname()),
+                            PID_LABEL: str(process.pid),
+                            USID_LABEL: usid,
+                        },
+                    }
+                },
+            )
+        ExecutionJournal(self.directory).write("abc-1234", {"workflow_name": "wf-journaled"})
+
+        self.assertEqual(
+            reap_orphans(ArgoEndpoint(url=self.server.url, token="t"), dry_run=True), ["ns1/wf-orphan"]
+        )
+
+        # a job not restarted within the ttl is given up
+        with mock.patch.dict(os.environ, {"ARGO_WF_JOURNAL_TTL": "60"}), mock.patch(
+            "zoo_argowf_runner.journal.time.time", return_value=time.time() + 61
+        ):
+            self.assertEqual(
+                sorted(reap_orphans(ArgoEndpoint(url=self.server.url, token="t"), dry_run=True)),
+                ["ns1/wf-journaled", "ns1/wf-orphan"],
+            )
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from zoo_argowf_runner.cli import main
+from zoo_argowf_runner.loadtest import parse_time
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_parse_time(self):
+        self.assertEqual(
+            parse_time("2024-05-01T10:00:01Z").timestamp() + 0.5,
+            parse_time("2024-05-01T10:00:01.500000Z").timestamp(),
+        )
+
+    def test_loadtest_report(self):
+        root = os.path.join(os.path.dirname(__file__), "..")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            report_path = os.path.join(workdir, "report.json")
+            result = CliRunner().invoke(
+                main,
+                [
+                    "loadtest",
+                    "--jobs",
+                    "2",
+                    "--concurrency",
+                    "2",
+                    "--cwl",
+                    os.path.join(root, "water_bodies_detection", "app-package.cwl"),
+                    "--params",
+                    os.path.join(root, "water_bodies_detection", "param.json"),
+                    "--monitor-interval",
+                    "0.05",
+                    "--fake-run-duration",
+                    "0.2",
+                    "--output",
+                    report_path,
+                ],
+                env={"ARGO_WF_ENDPOINT": None, "ARGO_WF_ENDPOINTS": None},
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+
+            with open(report_path) as stream:
+                report = json.load(stream)
+
+        self.assertEqual(report["jobs"], 2)
+        self.assertEqual(report["succeeded"], 2)
+        self.assertEqual(report["errors"], 0)
+        for result in report["results"]:
+            self.assertGreater(result["submit_latency"], 0)
+            self.assertGreaterEqual(result["time_to_running"], 0)
+            # the terminal phase is seen at most one polling interval late
+            self.assertLess(result["completion_lag"], 1)
+            self.assertGreater(result["api_calls"], 2)
+        self.assertEqual(
+            set(report["summary"]),
+            {"submit_latency", "time_to_running", "completion_lag", "api_calls", "duration"},
+        )
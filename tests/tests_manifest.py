@@ -0,0 +1,256 @@
+import json
+import os
+import unittest
+from unittest import mock
+
+import yaml
+from hera.workflows.models import WorkflowCreateRequest
+
+from zoo_argowf_runner.cwl2argo import cwl_to_argo
+from zoo_argowf_runner.manifest import VolumeManifests, build_workflow_manifest
+from zoo_argowf_runner.stage_in_cache import StageInCacheVolume
+from zoo_argowf_runner.volume import VolumeTemplates
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+
+class TestManifest(unittest.TestCase):
+    """The fast manifest builder must emit the same manifest as the Hera path"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workflows = []
+        for package, workflow_id in [
+            ("water_bodies", "water-bodies"),
+            ("water_bodies_cloud_native", "water-bodies"),
+        ]:
+            with open(
+                os.path.join(os.path.dirname(__file__), package, "app-package.cwl")
+            ) as stream:
+                cls.workflows.append(CWLWorkflow(yaml.safe_load(stream), workflow_id))
+
+    @staticmethod
+    def volumes(templates):
+        return {
+            "additional_configmaps": [
+                templates.create_config_map_volume(
+                    name="cwl-wrapper-config-vol",
+                    config_map_name="cwl-wrapper-config",
+                    items=[
+                        {"key": "main.yaml", "path": "main.yaml", "mode": 420},
+                        {"key": "rules.yaml", "path": "rules.yaml"},
+                    ],
+                    default_mode=420,
+                    optional=False,
+                )
+            ],
+            "additional_secrets": [
+                templates.create_secret_volume(
+                    name="usersettings-vol", secret_name="user-settings"
+                )
+            ],
+        }
+
+    def assert_equivalent(self, **kwargs):
+        for workflow in self.workflows:
+            arguments = dict(
+                workflow=workflow,
+                entrypoint="water-bodies",
+                argo_wf_name="water-bodies-123",
+                inputs={"inputs": {"aoi": "-118.985,38.432", "bands": ["green", "nir"]}},
+                volume_size="12Gi",
+                max_cores=2,
+                max_ram="1024Mi",
+                storage_class="standard",
+                namespace="ns1",
+            )
+            arguments.update(kwargs)
+
+            hera_workflow = cwl_to_argo(**arguments, **self.volumes(VolumeTemplates))
+            manifest = build_workflow_manifest(**arguments, **self.volumes(VolumeManifests))
+
+            self.assertEqual(json.dumps(manifest), json.dumps(hera_workflow.to_dict()))
+            # the request body sent to argo-server
+            self.assertEqual(
+                json.dumps({"workflow": manifest}),
+                WorkflowCreateRequest(workflow=hera_workflow.build()).json(
+                    exclude_none=True, by_alias=True, exclude_unset=True, exclude_defaults=True
+                ),
+            )
+
+    def test_default(self):
+        self.assert_equivalent()
+
+    def test_no_namespace(self):
+        self.assert_equivalent(namespace=None, storage_class=None)
+
+    def test_synchronization_config_map(self):
+        with mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_SYNCHRONIZATION_CM": "semaphore-argo-cwl-runner",
+                "ARGO_CWL_RUNNER_TEMPLATE": "argo-cwl-runner-stage-in-out",
+            },
+        ):
+            self.assert_equivalent()
+
+    def test_placement_and_priority(self):
+        self.assert_equivalent(
+            priority=1200,
+            pod_placement=PodPlacement(
+                node_selector={"zone": "b", "pool": "spot"},
+                env_vars={"B": "1", "A": 2},
+                affinity={
+                    "podAffinity": {
+                        "preferredDuringSchedulingIgnoredDuringExecution": [
+                            {
+                                "weight": 10,
+                                "podAffinityTerm": {
+                                    "topologyKey": "kubernetes.io/hostname",
+                                    "labelSelector": {"matchLabels": {"z": "1", "a": "2"}},
+                                },
+                            }
+                        ]
+                    }
+                },
+                tolerations=[
+                    {"operator": "Exists", "key": "spot", "effect": "NoSchedule"},
+                    {"key": "io", "value": "high", "tolerationSeconds": 30},
+                ],
+                priority_class="zoo-high",
+            ),
+        )
+
+    def test_deadline_and_labels(self):
+        self.assert_equivalent(
+            active_deadline_seconds=3600,
+            labels={"zoo-argowf-runner/usid": "abc-1234", "zoo-argowf-runner/host": "zoo-1"},
+        )
+
+    def test_gc_policy(self):
+        with mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_TTL_AFTER_SUCCESS": "300",
+                "ARGO_WF_TTL_AFTER_FAILURE": "86400",
+                "ARGO_WF_POD_GC": "OnPodCompletion",
+                "ARGO_WF_VOLUME_CLAIM_GC": "OnWorkflowCompletion",
+            },
+        ):
+            self.assert_equivalent()
+
+    def test_artifact_outputs(self):
+        with mock.patch.dict(os.environ, {"ARGO_WF_OUTPUTS": "artifacts"}):
+            self.assert_equivalent()
+
+            manifest = build_workflow_manifest(
+                self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}
+            )
+
+        outputs = manifest["spec"]["templates"][0]["outputs"]
+        self.assertEqual(
+            [parameter["name"] for parameter in outputs["parameters"]],
+            ["results", "stac-catalog", "outcome"],
+        )
+        self.assertIn(
+            {"fromExpression": "steps['argo-cwl'].outputs.artifacts['log']", "name": "log"},
+            outputs["artifacts"],
+        )
+
+    def test_outputs_bundle(self):
+        with mock.patch.dict(os.environ, {"ARGO_WF_OUTPUTS": "bundle"}):
+            self.assert_equivalent()
+
+            manifest = build_workflow_manifest(
+                self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}
+            )
+
+        self.assertEqual(manifest["spec"]["onExit"], "outputs-bundle")
+        self.assertEqual(manifest["spec"]["templates"][-1]["name"], "outputs-bundle")
+
+    def test_notify_completion(self):
+        url = "http://zoo.example:8080/token/water-bodies-123"
+        self.assert_equivalent(notify_url=url)
+        with mock.patch.dict(os.environ, {"ARGO_WF_OUTPUTS": "bundle"}):
+            self.assert_equivalent(notify_url=url)
+
+            manifest = build_workflow_manifest(
+                self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}, notify_url=url
+            )
+
+        # the bundle is written before the runner is notified
+        self.assertEqual(manifest["spec"]["onExit"], "exit-handler")
+        self.assertEqual(
+            [step[0]["template"] for step in manifest["spec"]["templates"][-1]["steps"]],
+            ["outputs-bundle", "notify-completion"],
+        )
+        self.assertEqual(manifest["spec"]["templates"][-2]["script"]["env"][0]["value"], url)
+
+    def test_stage_in_cache(self):
+        cache = StageInCacheVolume(claim_name="stage-in-cache-claim")
+        self.assert_equivalent(stage_in_cache=cache)
+
+        manifest = build_workflow_manifest(
+            self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}, stage_in_cache=cache
+        )
+
+        self.assertEqual(
+            manifest["spec"]["volumes"],
+            [{"name": "stage-in-cache", "persistentVolumeClaim": {"claimName": "stage-in-cache-claim"}}],
+        )
+        parameters = manifest["spec"]["templates"][0]["steps"][1][0]["arguments"]["parameters"]
+        self.assertEqual(
+            parameters[-2:],
+            [
+                {"name": "stage_in_cache_claim", "value": "stage-in-cache-claim"},
+                {"name": "stage_in_cache_path", "value": "/stage-in-cache"},
+            ],
+        )
+
+    def test_skeleton_is_not_modified(self):
+        first = build_workflow_manifest(
+            self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}
+        )
+        build_workflow_manifest(
+            self.workflows[0],
+            "water-bodies",
+            "wf-2",
+            inputs={"inputs": {"aoi": "1"}},
+            pod_placement=PodPlacement(env_vars={"A": "1"}),
+        )
+        self.assertEqual(
+            json.dumps(first),
+            json.dumps(
+                build_workflow_manifest(
+                    self.workflows[0], "water-bodies", "wf-1", inputs={"inputs": {}}
+                )
+            ),
+        )
+
+    def test_fast_submission(self):
+        from zoo_argowf_runner.testing import FakeArgoServer
+        from zoo_argowf_runner.argo_api import Execution
+        from zoo_argowf_runner.endpoints import ArgoEndpoint
+
+        server = FakeArgoServer().start()
+        try:
+            with mock.patch.dict(os.environ, {"ARGO_WF_MANIFEST_BUILDER": "fast"}):
+                execution = Execution(
+                    namespace="ns1",
+                    workflow=self.workflows[0],
+                    entrypoint="water-bodies",
+                    workflow_name="water-bodies-123",
+                    processing_parameters={"aoi": "-118.985,38.432"},
+                    volume_size="10Gi",
+                    max_cores=2,
+                    max_ram="1024Mi",
+                    storage_class="standard",
+                    handler=None,
+                    endpoint=ArgoEndpoint(url=server.url, token="t"),
+                )
+            execution.run(**self.volumes(VolumeManifests))
+        finally:
+            server.stop()
+
+        submitted = server.workflows[("ns1", "water-bodies-123")]
+        self.assertEqual(submitted["spec"]["entrypoint"], "water-bodies")
+        self.assertEqual(len(submitted["spec"]["volumes"]), 2)
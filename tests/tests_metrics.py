@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.metrics import Metrics, NullMetrics, get_metrics
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner
+from zoo_argowf_runner.testing import FakeArgoServer
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        get_metrics.cache_clear()
+        self.addCleanup(get_metrics.cache_clear)
+
+    def test_disabled_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("ARGO_WF_METRICS_TEXTFILE_DIR", None)
+            os.environ.pop("ARGO_WF_METRICS_PUSHGATEWAY", None)
+
+            self.assertIsInstance(get_metrics(), NullMetrics)
+            self.assertFalse(get_metrics().enabled)
+
+    def test_render(self):
+        metrics = Metrics()
+        metrics.inc("api_requests_total", {"operation": "get_workflow", "method": "GET", "status": "200"})
+        metrics.inc("api_requests_total", {"operation": "get_workflow", "method": "GET", "status": "200"})
+        metrics.observe("api_request_duration_seconds", {"operation": "get_workflow"}, 0.2)
+
+        text = metrics.render(metrics.counters, metrics.histograms)
+
+        self.assertIn("# TYPE zoo_argowf_runner_api_requests_total counter", text)
+        self.assertIn(
+            'zoo_argowf_runner_api_requests_total{method="GET",operation="get_workflow",status="200"} 2',
+            text,
+        )
+        self.assertIn(
+            'zoo_argowf_runner_api_request_duration_seconds_bucket{operation="get_workflow",le="0.1"} 0',
+            text,
+        )
+        self.assertIn(
+            'zoo_argowf_runner_api_request_duration_seconds_bucket{operation="get_workflow",le="0.25"} 1',
+            text,
+        )
+        self.assertIn('zoo_argowf_runner_api_request_duration_seconds_count{operation="get_workflow"} 1', text)
+
+    def test_textfile_merge(self):
+        with tempfile.TemporaryDirectory() as textfile_dir:
+            # two Zoo processes writing to the same textfile collector directory
+            for _ in range(2):
+                metrics = Metrics(textfile_dir=textfile_dir)
+                metrics.inc("executions_total", {"service": "water-bodies", "outcome": "succeeded"})
+                metrics.flush(service="water-bodies")
+
+            with open(os.path.join(textfile_dir, "zoo_argowf_runner.prom")) as stream:
+                text = stream.read()
+
+        self.assertIn(
+            'zoo_argowf_runner_executions_total{outcome="succeeded",service="water-bodies"} 2', text
+        )
+
+    def test_pushgateway_group(self):
+        with tempfile.TemporaryDirectory() as state_dir, mock.patch("requests.put") as put:
+            # two Zoo processes pushing to the same group
+            for _ in range(2):
+                metrics = Metrics(pushgateway="http://pushgateway:9091/", state_dir=state_dir)
+                metrics.inc("executions_total", {"service": "water-bodies", "outcome": "succeeded"})
+                metrics.flush(service="water-bodies")
+
+        self.assertEqual(put.call_count, 2)
+        url = put.call_args.args[0]
+        self.assertTrue(url.startswith("http://pushgateway:9091/metrics/job/zoo_argowf_runner/instance/"), url)
+        self.assertTrue(url.endswith("/service/water-bodies"), url)
+        # the group is replaced with the totals of the host
+        self.assertIn(
+            'zoo_argowf_runner_executions_total{outcome="succeeded",service="water-bodies"} 2',
+            put.call_args.kwargs["data"],
+        )
+
+    def run_job(self):
+        """runs a Zoo job against a fake argo-server, returns its exit value (or error) and the textfile"""
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cwl = yaml.safe_load(stream)
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+
+        server = FakeArgoServer(run_duration=0.1, nodes=1).start()
+        self.addCleanup(server.stop)
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir, mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.02",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+                "ARGO_WF_METRICS_TEXTFILE_DIR": os.path.join(workdir, "textfile"),
+            },
+        ):
+            os.chdir(workdir)
+            try:
+                runner = ZooArgoWorkflowsRunner(
+                    cwl=cwl,
+                    conf=conf,
+                    inputs={
+                        "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                        "item": {"value": "https://example.com/item"},
+                    },
+                    outputs={"Result": {"value": ""}},
+                    execution_handler=LoadTestExecutionHandler(conf=conf),
+                )
+                try:
+                    exit_value = runner.execute()
+                except Exception as exc:
+                    exit_value = exc
+            finally:
+                os.chdir(cwd)
+
+            with open(os.path.join(workdir, "textfile", "zoo_argowf_runner.prom")) as stream:
+                return exit_value, stream.read()
+
+    def test_runner_metrics(self):
+        _, text = self.run_job()
+
+        self.assertIn(
+            'zoo_argowf_runner_api_requests_total{method="POST",operation="create_workflow",status="200"} 1',
+            text,
+        )
+        self.assertIn('zoo_argowf_runner_submissions_total{service="water-bodies"} 1', text)
+        self.assertIn('zoo_argowf_runner_monitor_polls_total{service="water-bodies"}', text)
+        self.assertIn(
+            'zoo_argowf_runner_executions_total{outcome="succeeded",service="water-bodies"} 1', text
+        )
+        self.assertIn(
+            'zoo_argowf_runner_phase_duration_seconds_count{phase="submit",service="water-bodies"} 1',
+            text,
+        )
+
+    def test_runner_error_metrics(self):
+        with mock.patch(
+            "zoo_argowf_runner.argo_api.Execution.get_output", side_effect=RuntimeError("artifact gone")
+        ):
+            error, text = self.run_job()
+
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn(
+            'zoo_argowf_runner_executions_total{outcome="failed",service="water-bodies"} 1', text
+        )
+        self.assertIn(
+            'zoo_argowf_runner_phase_duration_seconds_count{phase="submit",service="water-bodies"} 1',
+            text,
+        )
@@ -0,0 +1,113 @@
+import json
+import os
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.manifest import VolumeManifests
+from zoo_argowf_runner.notify import CompletionListener
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestCompletionListener(unittest.TestCase):
+    def setUp(self):
+        self.listener = CompletionListener(url="http://127.0.0.1:{port}", host="127.0.0.1").start()
+        self.addCleanup(self.listener.stop)
+
+    def post(self, url, body):
+        request = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+    def test_notify(self):
+        url = self.listener.get_callback_url("wf-1")
+        self.assertTrue(url.startswith(f"http://127.0.0.1:{self.listener.server.server_address[1]}/"))
+
+        self.assertIsNone(self.listener.wait("wf-1", 0.01))
+        self.assertEqual(self.post(url, {"phase": "Succeeded"}), 204)
+        self.assertEqual(self.listener.wait("wf-1", 1), "Succeeded")
+
+        self.listener.discard("wf-1")
+        self.assertIsNone(self.listener.wait("wf-1", 0))
+
+    def test_wrong_token(self):
+        self.assertEqual(self.post(f"{self.listener.url}/not-the-token/wf-1", {"phase": "Failed"}), 404)
+        self.assertEqual(self.listener.notifications, {})
+
+
+class TestPushMonitoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cls.workflow = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.5, nodes=2).start()
+        self.addCleanup(self.server.stop)
+
+    def run_execution(self, safety_interval):
+        listener = CompletionListener(
+            url="http://127.0.0.1:{port}", host="127.0.0.1", safety_interval=safety_interval
+        ).start()
+        self.addCleanup(listener.stop)
+
+        with mock.patch.dict(os.environ, {"ARGO_WF_MANIFEST_BUILDER": "fast"}):
+            execution = Execution(
+                namespace="ns1",
+                workflow=self.workflow,
+                entrypoint="water-bodies",
+                workflow_name="water-bodies-123",
+                processing_parameters={},
+                volume_size="1Gi",
+                max_cores=1,
+                max_ram="1Gi",
+                storage_class="standard",
+                handler=None,
+                endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+            )
+        execution.listener = listener
+        execution.run(
+            additional_configmaps=[],
+            additional_secrets=[VolumeManifests.create_secret_volume("usersettings-vol", "user-settings")],
+        )
+        return execution, listener
+
+    def status_polls(self):
+        return len(
+            [path for method, path in self.server.requests if path == "/api/v1/workflows/ns1/water-bodies-123"]
+        )
+
+    def test_push(self):
+        """the runner waits for the notification instead of polling"""
+        execution, listener = self.run_execution(safety_interval=60)
+
+        execution.monitor(schedule=PollingSchedule(interval=0.01, policy="fixed"), timeout=10)
+
+        self.assertTrue(execution.is_successful())
+        self.assertEqual(self.server.notifications, [("water-bodies-123", "Succeeded", 204)])
+        # one poll after the submission, one after the notification
+        self.assertEqual(self.status_polls(), 2)
+        self.assertEqual(listener.notifications, {})
+
+    def test_lost_notification(self):
+        """the safety polls complete the execution when the notification does not arrive"""
+        execution, listener = self.run_execution(safety_interval=0.2)
+        listener.token = "rotated"
+
+        execution.monitor(schedule=PollingSchedule(interval=0.01, policy="fixed"), timeout=10)
+
+        self.assertTrue(execution.is_successful())
+        self.assertEqual(self.server.notifications, [("water-bodies-123", "Succeeded", 404)])
+        self.assertLessEqual(self.status_polls(), 5)
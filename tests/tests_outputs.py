@@ -0,0 +1,221 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.outputs_bundle import HEAD_SIZE, OutputsBundle, write_outputs_bundle
+from zoo_argowf_runner.testing import FakeArgoServer, FakeS3Server
+from zoo_argowf_runner.testing.fake_argo import ARTIFACTS_BUCKET
+
+
+class TestArtifactOutputs(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3Server().start()
+        self.addCleanup(self.s3.stop)
+        self.server = FakeArgoServer(
+            run_duration=0.1, nodes=2, payload_size=100_000, outputs="artifacts", s3=self.s3
+        ).start()
+        self.addCleanup(self.server.stop)
+
+    def get_execution(self, workflow_name):
+        return Execution(
+            namespace="ns1",
+            workflow=None,
+            entrypoint="water-bodies",
+            workflow_name=workflow_name,
+            processing_parameters={},
+            volume_size="1Gi",
+            max_cores=1,
+            max_ram="1Gi",
+            storage_class="standard",
+            handler=None,
+            endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+        )
+
+    def test_lazy_fetch(self):
+        self.server.run_duration = 0
+        self.server.create_workflow("ns1", {"metadata": {"name": "wf-1"}, "spec": {}})
+        execution = self.get_execution("wf-1")
+
+        # the workflow status only holds the small outputs and the artifact references
+        workflow = execution.get_workflow()
+        self.assertLess(len(json.dumps(workflow)), 5_000)
+        self.assertEqual(execution.get_stac_catalog(), "s3://results/wf-1/catalog.json")
+        self.assertEqual(self.s3.requests, [])
+
+        key = f"wf-1-{workflow['metadata']['uid']}-artifacts/log.gz"
+        self.assertLess(len(self.s3.get_object(ARTIFACTS_BUCKET, key)), 10_000)
+
+        artifact_requests = [path for _, path in self.server.requests if path.startswith("/artifact-files/")]
+        self.assertEqual(len(execution.get_log()), 100_000)
+        self.assertEqual(len(execution.get_log()), 100_000)
+        self.assertEqual(
+            [path for _, path in self.server.requests if path.startswith("/artifact-files/")],
+            artifact_requests + ["/artifact-files/ns1/workflows/wf-1/wf-1/outputs/log"],
+        )
+        self.assertEqual(json.loads(execution.get_feature_collection())["type"], "FeatureCollection")
+
+    def test_uncompressed_artifact(self):
+        self.server.run_duration = 0
+        self.server.create_workflow("ns1", {"metadata": {"name": "wf-1"}, "spec": {}})
+        execution = self.get_execution("wf-1")
+
+        key = f"wf-1-{execution.get_workflow()['metadata']['uid']}-artifacts/usage-report.gz"
+        self.s3.put_object(ARTIFACTS_BUCKET, key, gzip.decompress(self.s3.get_object(ARTIFACTS_BUCKET, key)))
+
+        self.assertEqual(len(json.loads(execution.get_usage_report())["children"]), 2)
+
+    def test_missing_artifact(self):
+        self.server.run_duration = 0
+        self.server.create_workflow("ns1", {"metadata": {"name": "wf-1"}, "spec": {}})
+        execution = self.get_execution("wf-1")
+
+        self.s3.objects.clear()
+
+        self.assertIsNone(execution.get_log())
+        self.assertIsNone(execution.get_execution_output("not-an-output"))
+
+    def test_runner(self):
+        runner, exit_value = self.run_job({"ARGO_WF_OUTPUTS": "artifacts"})
+
+        self.assertEqual(exit_value, zoo.SERVICE_SUCCEEDED)
+        self.assertIn('"type": "FeatureCollection"', runner.outputs.outputs["Result"]["value"])
+
+        (workflow,) = self.server.workflows.values()
+        entrypoint = workflow["spec"]["templates"][0]
+        self.assertNotIn("log", [parameter["name"] for parameter in entrypoint["outputs"]["parameters"]])
+
+        # the log, usage report and feature collection are downloaded once
+        self.assertEqual(runner.timings.get_phase("output retrieval").api_calls, 3)
+
+    def test_outputs_bundle(self):
+        self.server.nodes = 20
+        self.server.payload_size = 1000
+
+        runner, exit_value = self.run_job({"ARGO_WF_OUTPUTS": "bundle"})
+
+        self.assertEqual(exit_value, zoo.SERVICE_SUCCEEDED)
+        (workflow,) = self.server.workflows.values()
+        self.assertEqual(workflow["spec"]["onExit"], "outputs-bundle")
+
+        # the log, usage report and the 20 tool logs are in the head of the bundle, read once
+        bundle_requests = [
+            path for _, path in self.server.requests if path.endswith("/outputs/outputs-bundle")
+        ]
+        self.assertEqual(len(bundle_requests), 1)
+        self.assertNotIn("tool-logs", "".join(path for _, path in self.server.requests))
+        # the feature collection is in the bundle too, no other artifact is downloaded
+        self.assertEqual(
+            [path for _, path in self.server.requests if "/artifact-files/" in path], bundle_requests
+        )
+        self.assertIn('"type": "FeatureCollection"', runner.outputs.outputs["Result"]["value"])
+        self.assertEqual(runner.timings.get_phase("log download").api_calls, 0)
+        self.assertEqual(
+            runner.execution.get_outputs_bundle().get_tool_log("step-7"),
+            self.server.get_payload("tool-logs/step-7.log").decode(),
+        )
+
+    def run_job(self, env):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cwl = yaml.safe_load(stream)
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir, mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": self.server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.05",
+                "ARGO_WF_MONITOR_POLICY": "fixed",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+                **env,
+            },
+        ):
+            os.chdir(workdir)
+            try:
+                runner = ZooArgoWorkflowsRunner(
+                    cwl=cwl,
+                    conf=conf,
+                    inputs={
+                        "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                        "item": {"value": "https://example.com/item"},
+                    },
+                    outputs={"Result": {"value": ""}},
+                    execution_handler=LoadTestExecutionHandler(conf=conf),
+                )
+                exit_value = runner.execute()
+            finally:
+                os.chdir(cwd)
+
+        return runner, exit_value
+
+
+class TestOutputsBundle(unittest.TestCase):
+    def write_bundle(self, workdir, tool_logs):
+        os.makedirs(os.path.join(workdir, "logs"))
+        with open(os.path.join(workdir, "report.json"), "w") as stream:
+            stream.write('{"children": []}')
+        with open(os.path.join(workdir, "stderr.log"), "w") as stream:
+            stream.write("calrissian log")
+        for step, content in tool_logs.items():
+            with open(os.path.join(workdir, "logs", f"{step}.log"), "wb") as stream:
+                stream.write(content)
+
+        write_outputs_bundle(
+            os.path.join(workdir, "bundle"),
+            "Succeeded",
+            {
+                "results": os.path.join(workdir, "output.json"),
+                "usage-report": os.path.join(workdir, "report.json"),
+            },
+            os.path.join(workdir, "stderr.log"),
+            os.path.join(workdir, "logs"),
+        )
+        with open(os.path.join(workdir, "bundle"), "rb") as stream:
+            return stream.read()
+
+    def test_range_reads(self):
+        tool_logs = {f"step-{index}": os.urandom(HEAD_SIZE // 4).hex().encode() for index in range(50)}
+        with tempfile.TemporaryDirectory() as workdir:
+            payload = self.write_bundle(workdir, tool_logs)
+
+        ranges = []
+
+        def read_range(first, last):
+            ranges.append((first, last))
+            return payload[first:last + 1]
+
+        bundle = OutputsBundle(read_range)
+
+        self.assertEqual(bundle.outcome, "Succeeded")
+        self.assertIsNone(bundle.get_output("results"))
+        self.assertEqual(bundle.get_output("usage-report"), '{"children": []}')
+        self.assertEqual(bundle.get_log(), "calrissian log")
+        self.assertEqual(len(bundle.get_tool_log_names()), 50)
+        self.assertIsNone(bundle.get_tool_log("step-50"))
+        self.assertEqual(ranges, [(0, HEAD_SIZE - 1)])
+
+        # one range read of the compressed log
+        self.assertEqual(bundle.get_tool_log("step-42").encode(), tool_logs["step-42"])
+        self.assertEqual(len(ranges), 2)
+        self.assertLess(ranges[1][1] - ranges[1][0], HEAD_SIZE)
+
+    def test_not_a_bundle(self):
+        with self.assertRaises(ValueError):
+            OutputsBundle(lambda first, last: b"not an outputs bundle"[first:last + 1])
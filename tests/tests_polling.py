@@ -0,0 +1,122 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from zoo_argowf_runner.history import RunHistory
+from zoo_argowf_runner.polling import PollingSchedule
+
+
+def get_polls(schedule, duration, status="Running"):
+    """returns the times of the polls of a workflow running for duration seconds"""
+    elapsed, polls = 0.0, []
+    while elapsed < duration:
+        elapsed += schedule.next_interval(elapsed, status)
+        polls.append(elapsed)
+    return polls
+
+
+class TestPollingSchedule(unittest.TestCase):
+    def test_fixed(self):
+        schedule = PollingSchedule(interval=30, policy="fixed")
+
+        self.assertEqual(get_polls(schedule, 90), [30, 60, 90])
+
+    def test_backoff(self):
+        schedule = PollingSchedule(interval=30, min_interval=2, max_interval=300, jitter=0)
+
+        self.assertEqual(schedule.next_interval(0, "Pending"), 2)
+        self.assertEqual(schedule.next_interval(2, "Pending"), 3)
+
+        # the interval stays under interval until the workflow runs
+        for _ in range(10):
+            interval = schedule.next_interval(10, "Pending")
+        self.assertEqual(interval, 30)
+
+        self.assertEqual(schedule.next_interval(100, "Running"), 45)
+        # a long running workflow is polled far less than with the fixed interval
+        self.assertLess(len(get_polls(schedule, 6 * 3600)), 6 * 3600 / 30 / 5)
+
+    def test_expected_completion(self):
+        schedule = PollingSchedule(
+            interval=30, min_interval=2, max_interval=300, jitter=0, expected_duration=3600
+        )
+
+        polls = get_polls(schedule, 3600)
+
+        # the back-off stops at the start of the completion window
+        self.assertIn(3600 - 360, polls)
+        # and the completion is seen at most a quarter of the window late
+        self.assertLessEqual(polls[-1] - 3600, 90)
+
+    def test_jitter(self):
+        schedule = PollingSchedule(interval=30, min_interval=10, jitter=0.1, rng=random.Random(1))
+
+        intervals = [schedule.next_interval(0, "Pending") for _ in range(20)]
+
+        self.assertTrue(all(9 <= interval <= 33 for interval in intervals))
+        self.assertGreater(len(set(intervals)), 1)
+
+
+class TestRunHistory(unittest.TestCase):
+    def test_expected_duration(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            history = RunHistory(os.path.join(workdir, "history.db"), window=3)
+
+            self.assertIsNone(history.expected_duration("water-bodies"))
+
+            for duration in [100, 500, 120, 140]:
+                history.record("water-bodies", "ns1", "wf", "Succeeded", duration)
+            history.record("water-bodies", "ns1", "wf", "Failed", 5)
+            history.record("other", "ns1", "wf", "Succeeded", 5)
+
+            # the median of the last 3 successful runs of the service
+            self.assertEqual(history.expected_duration("water-bodies"), 140)
+
+    def test_retention(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, "history.db")
+            history = RunHistory(db_path, window=2, max_runs=3)
+
+            for duration in [10, 20, 30, 40, 50]:
+                history.record("water-bodies", "ns1", "wf", "Succeeded", duration, [("crop", duration)])
+            history.record("other", "ns1", "wf", "Succeeded", 5, [("crop", 5)])
+
+            with sqlite3.connect(db_path) as db:
+                self.assertEqual(
+                    db.execute("SELECT duration FROM runs WHERE service = 'water-bodies'").fetchall(),
+                    [(30,), (40,), (50,)],
+                )
+                self.assertEqual(
+                    db.execute("SELECT duration FROM steps WHERE service = 'water-bodies'").fetchall(),
+                    [(30,), (40,), (50,)],
+                )
+                self.assertEqual(db.execute("SELECT COUNT(*) FROM runs WHERE service = 'other'").fetchone(), (1,))
+
+            # the runs older than max_age are removed at the next record
+            history = RunHistory(db_path, window=2, max_runs=3, max_age=60)
+            with mock.patch("zoo_argowf_runner.history.time.time", return_value=time.time() + 120):
+                history.record("water-bodies", "ns1", "wf", "Succeeded", 60, [("crop", 60)])
+            self.assertEqual(history.expected_duration("water-bodies"), 60)
+            self.assertEqual(history.get_step_durations("water-bodies"), {"crop": 60})
+
+    def test_record_workflow(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            history = RunHistory(os.path.join(workdir, "history.db"))
+
+            history.record_workflow(
+                "water-bodies",
+                {
+                    "metadata": {"name": "wf", "namespace": "ns1"},
+                    "status": {
+                        "phase": "Succeeded",
+                        "startedAt": "2024-05-01T10:00:00Z",
+                        "finishedAt": "2024-05-01T10:02:30.500000Z",
+                    },
+                },
+            )
+
+            self.assertEqual(history.expected_duration("water-bodies"), 150.5)
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+from click.testing import CliRunner
+
+from zoo_argowf_runner.bundle import BundledCWLWorkflow, compile_service, load_cwl_workflow
+from zoo_argowf_runner.cli import main
+from zoo_argowf_runner.prepull import PULL_COMMAND, get_prepull_daemonset, get_workflow_images
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+WATER_BODIES_IMAGES = [
+    "ghcr.io/eoap/mastering-app-package/crop@sha256:a40bc27f475e9027524508839433bf2db3360278f8163f1d61140550bd97795d",
+    "ghcr.io/eoap/mastering-app-package/norm_diff@sha256:85588958311b20f6c257531fe087da8dee3d962fdb4a4a8a1b1d61915e0a74a9",
+    "ghcr.io/eoap/mastering-app-package/otsu@sha256:a390c8613df6da7617a28dd588a78b9f07f0be9d30a284eb98cc5467288309ef",
+    "ghcr.io/eoap/mastering-app-package/stac@sha256:61d590777cf88ed890dbb0b8e24bc1163868ae8a6f335343060365c4182827a4",
+]
+
+
+def load_cwl(package):
+    with open(os.path.join(os.path.dirname(__file__), package, "app-package.cwl")) as stream:
+        return yaml.safe_load(stream)
+
+
+class TestWorkflowImages(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwl = load_cwl("water_bodies")
+
+    def test_water_bodies_images(self):
+        self.assertEqual(get_workflow_images(CWLWorkflow(self.cwl, "water-bodies")), WATER_BODIES_IMAGES)
+
+    def test_subworkflow_images(self):
+        # the tools run by the detect_water_body subworkflow, in step order
+        images = get_workflow_images(CWLWorkflow(load_cwl("water_bodies_cloud_native"), "water-bodies"))
+
+        self.assertEqual(
+            [image.split("@")[0].rsplit("/", 1)[-1] for image in images],
+            ["stac", "crop", "norm_diff", "otsu"],
+        )
+
+    def test_collected_once(self):
+        workflow = CWLWorkflow(self.cwl, "water-bodies")
+
+        with mock.patch.object(workflow, "get_docker_images", wraps=workflow.get_docker_images) as collect:
+            images = get_workflow_images(workflow)
+            self.assertIs(get_workflow_images(workflow), images)
+        self.assertEqual(collect.call_count, 1)
+
+    def test_bundled_images(self):
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            compile_service(self.cwl, "water-bodies", bundle_dir)
+            with mock.patch.dict(os.environ, {"ARGO_WF_BUNDLE_DIR": bundle_dir}):
+                workflow = load_cwl_workflow(self.cwl, "water-bodies")
+
+        self.assertIsInstance(workflow, BundledCWLWorkflow)
+        self.assertEqual(get_workflow_images(workflow), WATER_BODIES_IMAGES)
+        # the CWL document is not parsed
+        self.assertNotIn("cwl", workflow.__dict__)
+
+
+class TestPrepullDaemonSet(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwl_path = os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        cls.workflow = CWLWorkflow(load_cwl("water_bodies"), "water-bodies")
+
+    def test_daemonset(self):
+        tolerations = [{"key": "eo", "operator": "Exists", "effect": "NoSchedule"}]
+        manifest = get_prepull_daemonset(
+            self.workflow,
+            namespace="zoo",
+            pod_placement=PodPlacement(node_selector={"pool": "eo"}, tolerations=tolerations),
+        )
+
+        self.assertEqual(manifest["kind"], "DaemonSet")
+        self.assertEqual(manifest["metadata"]["name"], "prepull-water-bodies")
+        self.assertEqual(manifest["metadata"]["namespace"], "zoo")
+
+        spec = manifest["spec"]["template"]["spec"]
+        # started side by side, an image failing to start does not hold back the others
+        self.assertNotIn("initContainers", spec)
+        pulls, pause = spec["containers"][:-1], spec["containers"][-1]
+        self.assertEqual([container["image"] for container in pulls], WATER_BODIES_IMAGES)
+        self.assertEqual({container["command"][0] for container in pulls}, {PULL_COMMAND[0]})
+        self.assertEqual(pause["name"], "pause")
+        self.assertNotIn("command", pause)
+        self.assertEqual(spec["nodeSelector"], {"pool": "eo"})
+        self.assertEqual(spec["tolerations"], tolerations)
+        self.assertNotIn("affinity", spec)
+        self.assertLessEqual(
+            manifest["spec"]["selector"]["matchLabels"].items(),
+            manifest["spec"]["template"]["metadata"]["labels"].items(),
+        )
+
+    def test_cli_prepull(self):
+        result = CliRunner().invoke(
+            main,
+            [
+                "prepull",
+                self.cwl_path,
+                "--workflow-id",
+                "water-bodies",
+                "--namespace",
+                "zoo",
+                "--node-selector",
+                "pool=eo",
+            ],
+        )
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        [manifest] = list(yaml.safe_load_all(result.output))
+        self.assertEqual(
+            manifest,
+            get_prepull_daemonset(
+                self.workflow, namespace="zoo", pod_placement=PodPlacement(node_selector={"pool": "eo"})
+            ),
+        )
+
+        result = CliRunner().invoke(
+            main, ["prepull", self.cwl_path, "--workflow-id", "water-bodies", "--node-selector", "eo"]
+        )
+        self.assertNotEqual(result.exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
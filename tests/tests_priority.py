@@ -0,0 +1,58 @@
+import os
+import unittest
+from unittest import mock
+
+from zoo_argowf_runner.priority import (
+    compute_priority,
+    get_input_size,
+    get_priority_class,
+    quantity_to_mi,
+)
+from zoo_argowf_runner.zoo_helpers import ResourcePlan
+
+
+class TestPriority(unittest.TestCase):
+    def test_quantity_to_mi(self):
+        self.assertEqual(quantity_to_mi("512Mi"), 512)
+        self.assertEqual(quantity_to_mi("12Gi"), 12 * 1024)
+        self.assertAlmostEqual(quantity_to_mi("1G"), 1e9 / 2**20)
+        with self.assertRaises(ValueError):
+            quantity_to_mi("12 parsecs")
+
+    def test_input_size(self):
+        self.assertEqual(get_input_size({"aoi": "1,2,3,4", "items": ["a", "b", "c"]}), 4)
+
+    def test_small_jobs_first(self):
+        small = ResourcePlan(volume_size="1Gi", max_cores=1, max_ram="512Mi")
+        large = ResourcePlan(volume_size="100Gi", max_cores=16, max_ram="64Gi")
+
+        self.assertGreater(
+            compute_priority(small, input_size=1), compute_priority(large, input_size=1)
+        )
+        self.assertGreater(
+            compute_priority(small, input_size=1), compute_priority(small, input_size=50)
+        )
+
+    def test_user_tier(self):
+        plan = ResourcePlan(volume_size="100Gi", max_cores=16, max_ram="64Gi")
+
+        self.assertGreater(
+            compute_priority(plan, user_tier="interactive"),
+            compute_priority(plan, user_tier="batch"),
+        )
+
+        with mock.patch.dict(os.environ, {"PRIORITY_TIERS": '{"gold": 5000}'}):
+            self.assertGreater(
+                compute_priority(plan, user_tier="gold"),
+                compute_priority(plan, user_tier="interactive"),
+            )
+
+    def test_priority_class(self):
+        self.assertIsNone(get_priority_class(100))
+
+        with mock.patch.dict(
+            os.environ, {"PRIORITY_CLASSES": '{"zoo-high": 1000, "zoo-low": 0}'}
+        ):
+            self.assertEqual(get_priority_class(1200), "zoo-high")
+            self.assertEqual(get_priority_class(200), "zoo-low")
+            self.assertIsNone(get_priority_class(-1))
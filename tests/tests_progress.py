@@ -0,0 +1,117 @@
+import os
+import tempfile
+import time
+import unittest
+
+from zoo_argowf_runner.history import RunHistory
+from zoo_argowf_runner.progress import ProgressTracker, format_eta
+
+
+def get_node(step, phase, **kwargs):
+    return {"templateName": step, "type": "Pod", "phase": phase, **kwargs}
+
+
+class TestProgressTracker(unittest.TestCase):
+    def test_band(self):
+        progress = ProgressTracker(start=20, end=90)
+
+        progress.update({}, now=0)
+        self.assertEqual(progress.get_percentage(), 20)
+        self.assertIsNone(progress.get_eta(now=0))
+
+        progress.update(
+            {
+                "wf": {"type": "Steps", "phase": "Running"},
+                "a": get_node("stage-in", "Succeeded"),
+                "b": get_node("calrissian", "Pending"),
+            },
+            now=10,
+        )
+        self.assertEqual(progress.get_percentage(), 55)
+        self.assertEqual(progress.get_message(now=10), "1/2 steps completed, 0 running, ETA 10s")
+
+        progress.update({"a": get_node("stage-in", "Succeeded"), "b": get_node("calrissian", "Succeeded")}, now=20)
+        self.assertEqual(progress.get_percentage(), 90)
+
+    def test_step_durations(self):
+        # the past runs spent 10 s staging in, 80 s running calrissian and 10 s staging out
+        progress = ProgressTracker(
+            start=0, end=100, step_durations={"stage-in": 10, "calrissian": 80, "stage-out": 10}
+        )
+
+        progress.update({"a": get_node("stage-in", "Running")}, now=0)
+        self.assertEqual(progress.get_percentage(), 0)
+
+        nodes = {"a": get_node("stage-in", "Succeeded"), "b": get_node("calrissian", "Running")}
+        progress.update(nodes, now=10)
+        # stage-out is not created yet and still counted
+        self.assertEqual(progress.get_percentage(), 10)
+
+        progress.update(nodes, now=50)
+        self.assertEqual(progress.get_percentage(), 50)
+        self.assertAlmostEqual(progress.get_eta(now=50), 50)
+
+        # a running step past its expected duration does not complete the workflow
+        progress.update(nodes, now=200)
+        self.assertLess(progress.get_percentage(), 90)
+
+    def test_never_backwards(self):
+        progress = ProgressTracker(start=0, end=100)
+
+        progress.update({"a": get_node("scatter", "Succeeded")}, now=0)
+        self.assertEqual(progress.get_percentage(), 100)
+
+        # new nodes are created for the next steps
+        progress.update(
+            {"a": get_node("scatter", "Succeeded"), "b": get_node("scatter", "Pending")}, now=1
+        )
+        self.assertEqual(progress.get_percentage(), 100)
+
+    def test_large_workflow(self):
+        progress = ProgressTracker()
+        nodes = {f"node-{index}": get_node(f"step-{index % 10}", "Pending") for index in range(5000)}
+
+        progress.update(nodes)
+        for index in range(100):
+            nodes[f"node-{index}"] = get_node(f"step-{index % 10}", "Succeeded")
+
+        start = time.perf_counter()
+        progress.update(nodes)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(progress.completed, 100)
+        self.assertEqual(progress.pending_weight, 4900)
+        self.assertLess(elapsed, 0.1)
+
+    def test_format_eta(self):
+        self.assertEqual(format_eta(40.5), "40s")
+        self.assertEqual(format_eta(192), "3m12s")
+        self.assertEqual(format_eta(3720), "1h02m")
+
+    def test_history_step_durations(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            history = RunHistory(os.path.join(workdir, "history.db"))
+
+            for seconds in ["10", "20", "30"]:
+                history.record_workflow(
+                    "water-bodies",
+                    {
+                        "metadata": {"name": "wf", "namespace": "ns1"},
+                        "status": {
+                            "phase": "Succeeded",
+                            "startedAt": "2024-05-01T10:00:00Z",
+                            "finishedAt": "2024-05-01T10:01:00Z",
+                            "nodes": {
+                                "wf-1": get_node(
+                                    "calrissian",
+                                    "Succeeded",
+                                    startedAt="2024-05-01T10:00:00Z",
+                                    finishedAt=f"2024-05-01T10:00:{seconds}Z",
+                                ),
+                                "wf-2": get_node("stage-out", "Failed"),
+                            },
+                        },
+                    },
+                )
+
+            self.assertEqual(history.get_step_durations("water-bodies"), {"calrissian": 20})
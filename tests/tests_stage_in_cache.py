@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.argo_api import Execution
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.manifest import VolumeManifests
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.stage_in_cache import StageInCache, add_cache_report
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+
+class TestStageInCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = StageInCache(os.path.join(self.directory, "cache"), max_size=250)
+        self.downloads = []
+
+    def download(self, payload):
+        def download(path):
+            self.downloads.append(path)
+            with open(path, "wb") as stream:
+                stream.write(payload)
+
+        return download
+
+    def fetch(self, url, etag, payload=b"x" * 100, job="wf-1"):
+        target = os.path.join(self.directory, "asset")
+        cached = self.cache.fetch(url, etag, self.download(payload), target, job=job)
+        with open(target, "rb") as stream:
+            self.assertEqual(stream.read(), payload)
+        return cached
+
+    def test_fetch(self):
+        self.assertFalse(self.fetch("https://stac.example/B03.tif", '"v1"'))
+        self.assertTrue(self.fetch("https://stac.example/B03.tif", '"v1"'))
+        # a new version of the asset is another entry
+        self.assertFalse(self.fetch("https://stac.example/B03.tif", '"v2"', payload=b"y" * 100))
+        self.assertEqual(len(self.downloads), 2)
+
+        self.assertEqual(
+            self.cache.get_stats("wf-1"),
+            {"hits": 1, "misses": 2, "bytes_hit": 100, "bytes_missed": 200},
+        )
+        self.assertEqual(self.cache.get_stats("wf-2")["hits"], 0)
+
+    def test_lru_eviction(self):
+        for name in ["B03", "B08"]:
+            self.fetch(f"https://stac.example/{name}.tif", None)
+        # B03 is used again, B08 is now the least recently used
+        self.fetch("https://stac.example/B03.tif", None)
+        self.fetch("https://stac.example/B11.tif", None)
+
+        self.assertIsNotNone(self.cache.lookup("https://stac.example/B03.tif"))
+        self.assertIsNotNone(self.cache.lookup("https://stac.example/B11.tif"))
+        self.assertIsNone(self.cache.lookup("https://stac.example/B08.tif"))
+        self.assertEqual(len(os.listdir(self.cache.objects_dir)), 2)
+
+    def test_larger_than_cache(self):
+        self.assertFalse(self.fetch("https://stac.example/scene.tif", None, payload=b"x" * 300))
+        self.assertFalse(self.fetch("https://stac.example/scene.tif", None, payload=b"x" * 300))
+        self.assertEqual(os.listdir(self.cache.objects_dir), [])
+
+    def test_concurrent_jobs(self):
+        cache = StageInCache(self.cache.directory, max_size=10_000)
+
+        def fetch(index):
+            target = os.path.join(self.directory, f"asset-{index}")
+            cache.fetch(
+                f"https://stac.example/{index % 4}.tif",
+                None,
+                self.download(str(index % 4).encode() * 100),
+                target,
+                job=f"wf-{index % 2}",
+            )
+            with open(target, "rb") as stream:
+                return stream.read()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            payloads = list(executor.map(fetch, range(32)))
+
+        self.assertEqual(payloads, [str(index % 4).encode() * 100 for index in range(32)])
+        stats = [cache.get_stats("wf-0"), cache.get_stats("wf-1")]
+        self.assertEqual(sum(job["hits"] + job["misses"] for job in stats), 32)
+        with open(cache.index_path) as stream:
+            self.assertEqual(len(json.load(stream)), 4)
+
+    def test_usage_report(self):
+        stats = {"hits": 3, "misses": 1, "bytes_hit": 300, "bytes_missed": 100}
+        report = json.loads(add_cache_report(json.dumps({"children": []}), stats))
+        self.assertEqual(report["stage_in_cache"], {**stats, "hit_rate": 0.75})
+
+        self.assertIsNone(add_cache_report(None, stats))
+
+
+class TestStageInCacheExecution(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.2, nodes=2).start()
+        self.addCleanup(self.server.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            self.workflow = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+    def test_cache_report(self):
+        environ = {
+            "ARGO_WF_MANIFEST_BUILDER": "fast",
+            "ARGO_WF_STAGE_IN_CACHE_CLAIM": "stage-in-cache",
+            "ARGO_WF_STAGE_IN_CACHE_DIR": self.directory,
+        }
+        with mock.patch.dict(os.environ, environ):
+            execution = Execution(
+                namespace="ns1",
+                workflow=self.workflow,
+                entrypoint="water-bodies",
+                workflow_name="water-bodies-123",
+                processing_parameters={},
+                volume_size="1Gi",
+                max_cores=1,
+                max_ram="1Gi",
+                storage_class="standard",
+                handler=None,
+                endpoint=ArgoEndpoint(url=self.server.url, token="t"),
+            )
+        execution.run(
+            additional_configmaps=[],
+            additional_secrets=[VolumeManifests.create_secret_volume("usersettings-vol", "user-settings")],
+        )
+
+        submitted = self.server.workflows[("ns1", "water-bodies-123")]
+        parameters = {
+            parameter["name"]: parameter["value"]
+            for parameter in submitted["spec"]["templates"][0]["steps"][1][0]["arguments"]["parameters"]
+        }
+        self.assertEqual(
+            json.loads(parameters["pod_env_vars"]),
+            {
+                "STAGE_IN_CACHE": "/stage-in-cache",
+                "STAGE_IN_CACHE_MAX_SIZE": str(50 * 1024**3),
+                "STAGE_IN_CACHE_JOB": "water-bodies-123",
+            },
+        )
+
+        # the stage-in of the workflow consults the cache
+        with mock.patch.dict(os.environ, {"STAGE_IN_CACHE": self.directory}):
+            cache = StageInCache.from_env()
+        cache.count("water-bodies-123", hit=True, size=1024)
+        cache.count("water-bodies-123", hit=False, size=2048)
+
+        execution.monitor(schedule=PollingSchedule(interval=0.01, policy="fixed"), timeout=10)
+
+        report = json.loads(execution.get_usage_report())
+        self.assertEqual(report["stage_in_cache"]["hit_rate"], 0.5)
+        self.assertEqual(report["stage_in_cache"]["bytes_hit"], 1024)
+        self.assertIn("children", report)
+        # the lookups are reported once
+        self.assertEqual(cache.get_stats("water-bodies-123")["hits"], 0)
+        self.assertEqual(json.loads(execution.get_usage_report()), report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.timing import PhaseRecorder, timed
+
+
+class RecordingHandler(LoadTestExecutionHandler):
+    def handle_outputs(self, log, output, usage_report, tool_logs=None, **kwargs):
+        self.outputs_timings = kwargs["timings"]
+
+    def post_execution_hook(self, **kwargs):
+        self.post_timings = kwargs["timings"]
+
+
+class TestTiming(unittest.TestCase):
+    def test_nested_phases(self):
+        timings = PhaseRecorder()
+
+        with timings.phase("outer"):
+            time.sleep(0.02)
+            with timings.phase("inner"):
+                time.sleep(0.05)
+                timings.count_api_call(bytes_sent=10, bytes_received=100)
+
+        phases = {phase["name"]: phase for phase in timings.as_dict()["phases"]}
+
+        # the inner phase time is not counted in the outer phase
+        self.assertLess(phases["outer"]["wall_time"], 0.05)
+        self.assertGreaterEqual(phases["inner"]["wall_time"], 0.05)
+        self.assertEqual(phases["inner"]["api_calls"], 1)
+        self.assertEqual(phases["outer"]["api_calls"], 0)
+        self.assertEqual(timings.as_dict()["total"]["bytes_received"], 100)
+
+    def test_timed(self):
+        @timed("build")
+        def build(value, **kwargs):
+            self.assertNotIn("timings", kwargs)
+            return value
+
+        timings = PhaseRecorder()
+
+        self.assertEqual(build(1), 1)
+        self.assertEqual(build(2, timings=timings), 2)
+        self.assertEqual([phase["name"] for phase in timings.as_dict()["phases"]], ["build"])
+
+    def test_runner_phases(self):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            cwl = yaml.safe_load(stream)
+
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+        handler = RecordingHandler(conf=conf)
+
+        server = FakeArgoServer(run_duration=0.2, nodes=2).start()
+        self.addCleanup(server.stop)
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as workdir, mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MONITOR_INTERVAL": "0.02",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+            },
+        ):
+            os.chdir(workdir)
+            try:
+                runner = ZooArgoWorkflowsRunner(
+                    cwl=cwl,
+                    conf=conf,
+                    inputs={
+                        "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                        "item": {"value": "https://example.com/item"},
+                    },
+                    outputs={"Result": {"value": ""}},
+                    execution_handler=handler,
+                )
+                runner.execute()
+            finally:
+                os.chdir(cwd)
+
+        phases = {phase["name"]: phase for phase in handler.post_timings["phases"]}
+
+        for name in [
+            "pre-execution hook",
+            "parameter resolution",
+            "resource estimation",
+            "workflow build",
+            "submit",
+            "running",
+            "output retrieval",
+            "log download",
+            "handle outputs",
+        ]:
+            self.assertIn(name, phases)
+
+        self.assertEqual(phases["submit"]["api_calls"], 1)
+        self.assertGreater(phases["submit"]["bytes_sent"], 0)
+        # one log per step, the usage report comes from the completed workflow seen by monitor
+        self.assertEqual(phases["log download"]["api_calls"], 2)
+        self.assertEqual(phases["output retrieval"]["api_calls"], 0)
+        self.assertGreater(phases["running"]["wall_time"], 0.1)
+        self.assertNotIn("post-execution hook", [p["name"] for p in handler.outputs_timings["phases"]])
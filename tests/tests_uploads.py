@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest import mock
+
+from zoo_argowf_runner.testing import FakeS3Server
+from zoo_argowf_runner.timing import PhaseRecorder
+from zoo_argowf_runner.uploads import InputUploader, find_local_files, get_file_digest
+from zoo_argowf_runner.zoo_helpers import ZooInputs
+
+
+class TestInputUploader(unittest.TestCase):
+    def setUp(self):
+        self.s3 = FakeS3Server(access_key="minio").start()
+        self.addCleanup(self.s3.stop)
+        self.uploader = InputUploader(
+            access_key="minio",
+            secret_key="secret",
+            endpoint=self.s3.url,
+            bucket="inputs",
+            part_size=5 * 1024**2,
+        )
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, payload):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as stream:
+            stream.write(payload)
+        return path
+
+    def read(self, url):
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.read()
+
+    def methods(self):
+        return [method for method, _, _ in self.s3.requests]
+
+    def test_upload_inputs(self):
+        aoi = self.write("aoi.geojson", b'{"type": "FeatureCollection"}')
+        bands = self.write("bands.txt", b"green,nir")
+        inputs = ZooInputs(
+            {
+                "aoi": {"cache_file": aoi, "mimeType": "application/geo+json"},
+                "bands": {"cache_file": bands},
+                "epsg": {"dataType": "string", "value": "EPSG:4326"},
+            }
+        )
+
+        timings = PhaseRecorder()
+        with timings.phase("input upload"):
+            parameters = self.uploader.upload_inputs(inputs.get_processing_parameters(), timings=timings)
+
+        self.assertEqual(parameters["epsg"], "EPSG:4326")
+        self.assertEqual(
+            {name: value for name, value in parameters["aoi"].items() if name != "location"},
+            {"class": "File", "format": "application/geo+json"},
+        )
+        # the workflow pods read the files from the presigned URLs
+        self.assertEqual(self.read(parameters["aoi"]["location"]), b'{"type": "FeatureCollection"}')
+        self.assertEqual(self.read(parameters["bands"]["location"]), b"green,nir")
+        self.assertIn(("inputs", f"zoo-inputs/sha256/{get_file_digest(aoi)}"), self.s3.objects)
+        self.assertEqual(timings.as_dict()["total"]["bytes_sent"], 38)
+
+    def test_content_addressed(self):
+        first = self.write("first.txt", b"same content")
+        second = self.write("second.txt", b"same content")
+
+        self.uploader.upload_inputs({"a": {"class": "File", "path": first}})
+        parameters = self.uploader.upload_inputs(
+            {"b": [{"class": "File", "path": second}, {"class": "File", "path": second}]}
+        )
+
+        # one upload, then only a lookup
+        self.assertEqual(self.methods(), ["HEAD", "PUT", "HEAD"])
+        self.assertEqual(parameters["b"][0], parameters["b"][1])
+        self.assertEqual(len(self.s3.objects), 1)
+
+    def test_multipart(self):
+        payload = os.urandom(12 * 1024**2)
+        path = self.write("scene.tif", payload)
+
+        url, size = self.uploader.upload(path)
+
+        self.assertEqual(size, len(payload))
+        self.assertEqual(self.methods(), ["HEAD", "POST", "PUT", "PUT", "PUT", "POST"])
+        self.assertEqual(self.read(url), payload)
+        self.assertEqual(self.s3.uploads, {})
+
+    def test_failed_part(self):
+        path = self.write("scene.tif", os.urandom(6 * 1024**2))
+        request = self.uploader.request
+
+        def fail_part(operation, *args, **kwargs):
+            if operation == "s3_upload_part":
+                raise ConnectionResetError("connection reset while uploading a part")
+            return request(operation, *args, **kwargs)
+
+        with mock.patch.object(self.uploader, "request", side_effect=fail_part):
+            with self.assertRaises(ConnectionResetError):
+                self.uploader.upload(path)
+
+        # the upload is aborted
+        self.assertEqual(self.methods(), ["HEAD", "POST", "DELETE"])
+        self.assertEqual(self.s3.uploads, {})
+        self.assertEqual(self.s3.objects, {})
+
+    def test_local_files(self):
+        self.assertEqual(
+            find_local_files(
+                {
+                    "a": {"class": "File", "path": "/tmp/a"},
+                    "b": [{"class": "File", "path": "/tmp/b"}, {"class": "File", "path": "/tmp/a"}],
+                    "c": {"class": "File", "location": "https://example.com/c"},
+                    "d": "/tmp/d",
+                }
+            ),
+            ["/tmp/a", "/tmp/b"],
+        )
+
+    def test_from_env(self):
+        with mock.patch.dict(os.environ, {"ARGO_WF_INPUTS_BUCKET": ""}):
+            self.assertIsNone(InputUploader.from_env())
+        with mock.patch.dict(
+            os.environ, {"ARGO_WF_INPUTS_BUCKET": "inputs", "ARGO_WF_S3_ACCESS_KEY_ID": ""}
+        ):
+            with self.assertRaises(ValueError):
+                InputUploader.from_env()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import yaml
+
+from zoo_argowf_runner.loadtest import LoadTestExecutionHandler
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+from zoo_argowf_runner.testing import FakeArgoServer
+from zoo_argowf_runner.validation import InputValidationError, InputValidator, get_input_validator
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+SCHEMA = [
+    {"id": "aoi", "type": "string", "default": None},
+    {"id": "bands", "type": {"type": "array", "items": "string"}, "default": ["green", "nir"]},
+    {"id": "threshold", "type": "float", "default": None},
+    {"id": "max_items", "type": ["null", "int"], "default": None},
+    {"id": "mask", "type": "boolean", "default": False},
+    {"id": "resampling", "type": {"type": "enum", "symbols": ["nearest", "bilinear"]}, "default": None},
+    {"id": "weights", "type": {"type": "array", "items": "double"}, "default": None},
+    {"id": "item", "type": "Directory", "default": None},
+    {
+        "id": "window",
+        "type": ["null", {"type": "record", "fields": [{"name": "size", "type": "int"}]}],
+        "default": None,
+    },
+]
+
+
+class TestInputValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = InputValidator(SCHEMA)
+        self.parameters = {
+            "aoi": "-118.985,38.432,-118.183,38.938",
+            "threshold": 0.5,
+            "resampling": "nearest",
+            "weights": [0.2, 0.8],
+            "item": "https://example.com/item",
+        }
+
+    def test_valid(self):
+        parameters = {**self.parameters, "extra": {"not": "in the schema"}}
+        self.assertEqual(self.validator.validate(parameters), parameters)
+
+    def test_coercion(self):
+        parameters = self.validator.validate(
+            {
+                **self.parameters,
+                "threshold": "0.5",
+                "max_items": "10",
+                # Zoo passes the booleans as integers
+                "mask": 1,
+                # and the arrays of one element as a value
+                "bands": "green",
+                "weights": [1, "0.5"],
+                "item": {"class": "Directory", "location": "https://example.com/item"},
+                "window": {"size": "256"},
+            }
+        )
+
+        self.assertEqual(parameters["threshold"], 0.5)
+        self.assertEqual(parameters["max_items"], 10)
+        self.assertIs(parameters["mask"], True)
+        self.assertEqual(parameters["bands"], ["green"])
+        self.assertEqual(parameters["weights"], [1.0, 0.5])
+        self.assertEqual(parameters["window"], {"size": 256})
+
+    def test_errors(self):
+        with self.assertRaises(InputValidationError) as context:
+            self.validator.validate(
+                {
+                    "threshold": "high",
+                    "max_items": True,
+                    "resampling": "cubic",
+                    "weights": [0.2, None],
+                    "item": {"class": "File", "path": "/tmp/item"},
+                }
+            )
+
+        self.assertEqual(
+            context.exception.errors,
+            [
+                "aoi: missing mandatory input",
+                "threshold: expected a number, got 'high'",
+                "max_items: expected ['null', 'int'], got True",
+                "resampling: expected one of ['bilinear', 'nearest'], got 'cubic'",
+                "weights: [1]: expected a number, got None",
+                "item: expected a Directory, got {'class': 'File', 'path': '/tmp/item'}",
+            ],
+        )
+
+    def test_large_arrays(self):
+        """the arrays of tens of thousands of items are validated in milliseconds"""
+        parameters = {
+            **self.parameters,
+            "bands": [f"B{index}" for index in range(50000)],
+            "weights": [index / 50000 for index in range(50000)],
+        }
+
+        start = time.perf_counter()
+        validated = self.validator.validate(parameters)
+        elapsed = time.perf_counter() - start
+
+        self.assertIs(validated["bands"], parameters["bands"])
+        self.assertLess(elapsed, 0.1)
+
+        # a bad item is found in the same pass
+        parameters["weights"][-1] = "heavy"
+        with self.assertRaises(InputValidationError) as context:
+            self.validator.validate(parameters)
+        self.assertEqual(context.exception.errors, ["weights: [49999]: expected a number, got 'heavy'"])
+
+    def test_compiled_once(self):
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            workflow = CWLWorkflow(yaml.safe_load(stream), "water-bodies")
+
+        with mock.patch.object(workflow, "get_input_schema", wraps=workflow.get_input_schema) as schema:
+            validator = get_input_validator(workflow)
+            self.assertIs(get_input_validator(workflow), validator)
+        self.assertEqual(schema.call_count, 1)
+
+
+class TestPreflightValidation(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeArgoServer(run_duration=0.1).start()
+        self.addCleanup(self.server.stop)
+
+        with open(
+            os.path.join(os.path.dirname(__file__), "water_bodies", "app-package.cwl")
+        ) as stream:
+            self.cwl = yaml.safe_load(stream)
+
+        patcher = mock.patch.dict(
+            os.environ,
+            {
+                "ARGO_WF_ENDPOINT": self.server.url,
+                "ARGO_WF_TOKEN": "t",
+                "ARGO_WF_MANIFEST_BUILDER": "fast",
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rejected_before_submission(self):
+        conf = {
+            "lenv": {"message": "", "Identifier": "water-bodies", "usid": "abc-1234"},
+            "main": {"tmpUrl": "http://localhost/logs/"},
+            "auth_env": {"user": "ns1"},
+        }
+        runner = ZooArgoWorkflowsRunner(
+            cwl=self.cwl,
+            conf=conf,
+            inputs={
+                "aoi": {"value": "-118.985,38.432,-118.183,38.938"},
+                "item": {"value": "https://example.com/item"},
+                "bands": {"value": [{"name": "green"}]},
+            },
+            outputs={"Result": {"value": ""}},
+            execution_handler=LoadTestExecutionHandler(conf=conf),
+        )
+
+        self.assertEqual(runner.execute(), zoo.SERVICE_FAILED)
+        self.assertEqual(conf["lenv"]["message"], "invalid inputs: bands: [0]: expected a string, got {'name': 'green'}")
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,270 @@
+# Description: This file contains the runner-side admission control that limits the in-flight workflows
+# per namespace and per service, with weighted fair queuing between users, ahead of the Argo semaphore.
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be queued or waited too long for admission."""
+
+
+class AdmissionController:
+    """
+    Admission control shared by all the Zoo processes of a host.
+
+    The state lives in a SQLite database so that concurrent Zoo processes see the same
+    in-flight workflows and wait queue. Waiting jobs are ordered by priority and then by
+    their weighted fair queuing virtual finish time: each user gets a share of the
+    admissions proportional to its weight, whatever the number of jobs it submits.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_per_namespace: Optional[int] = None,
+        max_per_service: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        user_weights: Optional[Dict[str, float]] = None,
+        poll_interval: float = 1.0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Initialize the admission controller.
+
+        :param db_path: Path to the SQLite database shared by the Zoo processes.
+        :param max_per_namespace: Maximum number of in-flight workflows per namespace.
+        :param max_per_service: Maximum number of in-flight workflows per service.
+        :param max_queue: Maximum number of jobs waiting for admission.
+        :param user_weights: Fair queuing weight per user, defaults to 1.
+        :param poll_interval: Time interval (in seconds) between admission checks.
+        :param timeout: Maximum time (in seconds) a job waits for admission.
+        """
+        self.db_path = db_path
+        self.max_per_namespace = max_per_namespace
+        self.max_per_service = max_per_service
+        self.max_queue = max_queue
+        self.user_weights = user_weights or {}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.host = socket.gethostname()
+
+        with self._transaction() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tickets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    namespace TEXT NOT NULL,
+                    service TEXT NOT NULL,
+                    user TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    finish_tag REAL NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    pid INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+                """
+            )
+            # the databases created before the priorities have no priority column
+            columns = [row[1] for row in db.execute("PRAGMA table_info(tickets)")]
+            if "priority" not in columns:
+                db.execute("ALTER TABLE tickets ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS users (user TEXT PRIMARY KEY, last_finish REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS clock (id INTEGER PRIMARY KEY, virtual_time REAL NOT NULL)"
+            )
+            db.execute("INSERT OR IGNORE INTO clock (id, virtual_time) VALUES (0, 0)")
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        """returns the admission controller configured with the environment, None if disabled"""
+        db_path = os.environ.get("ADMISSION_CONTROL_DB")
+
+        if not db_path:
+            return None
+
+        def optional_int(name):
+            value = os.environ.get(name)
+            return int(value) if value else None
+
+        return cls(
+            db_path=db_path,
+            max_per_namespace=optional_int("ADMISSION_MAX_PER_NAMESPACE"),
+            max_per_service=optional_int("ADMISSION_MAX_PER_SERVICE"),
+            max_queue=optional_int("ADMISSION_MAX_QUEUE"),
+            user_weights=json.loads(os.environ.get("ADMISSION_USER_WEIGHTS", "{}")),
+            timeout=optional_int("ADMISSION_TIMEOUT"),
+        )
+
+    @contextmanager
+    def _transaction(self):
+        db = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _purge_stale(self, db) -> None:
+        """removes the tickets of the dead processes of this host"""
+        for ticket_id, pid in db.execute(
+            "SELECT id, pid FROM tickets WHERE host = ?", (self.host,)
+        ).fetchall():
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                logger.info(f"Removing stale admission ticket {ticket_id} of process {pid}")
+                db.execute("DELETE FROM tickets WHERE id = ?", (ticket_id,))
+            except PermissionError:
+                pass
+
+    def _enqueue(self, namespace: str, service: str, user: str, priority: int = 0) -> int:
+        with self._transaction() as db:
+            self._purge_stale(db)
+
+            (waiting,) = db.execute(
+                "SELECT COUNT(*) FROM tickets WHERE state = 'waiting'"
+            ).fetchone()
+
+            if self.max_queue is not None and waiting >= self.max_queue:
+                raise AdmissionRejected(
+                    f"Admission queue is full ({waiting} jobs waiting)"
+                )
+
+            (virtual_time,) = db.execute(
+                "SELECT virtual_time FROM clock WHERE id = 0"
+            ).fetchone()
+            row = db.execute(
+                "SELECT last_finish FROM users WHERE user = ?", (user,)
+            ).fetchone()
+
+            start_tag = max(virtual_time, row[0] if row else 0)
+            finish_tag = start_tag + 1.0 / float(self.user_weights.get(user, 1.0))
+
+            db.execute(
+                "INSERT OR REPLACE INTO users (user, last_finish) VALUES (?, ?)",
+                (user, finish_tag),
+            )
+
+            cursor = db.execute(
+                "INSERT INTO tickets (namespace, service, user, state, finish_tag, priority, pid, host, created) "
+                "VALUES (?, ?, ?, 'waiting', ?, ?, ?, ?, ?)",
+                (
+                    namespace,
+                    service,
+                    user,
+                    finish_tag,
+                    priority,
+                    os.getpid(),
+                    self.host,
+                    time.time(),
+                ),
+            )
+            return cursor.lastrowid
+
+    def _next_admissible(self, db) -> Optional[int]:
+        """returns the waiting ticket to admit next, if any"""
+        running_namespaces = dict(
+            db.execute(
+                "SELECT namespace, COUNT(*) FROM tickets WHERE state = 'running' GROUP BY namespace"
+            ).fetchall()
+        )
+        running_services = dict(
+            db.execute(
+                "SELECT service, COUNT(*) FROM tickets WHERE state = 'running' GROUP BY service"
+            ).fetchall()
+        )
+
+        for ticket_id, namespace, service in db.execute(
+            "SELECT id, namespace, service FROM tickets WHERE state = 'waiting' "
+            "ORDER BY priority DESC, finish_tag, id"
+        ):
+            if (
+                self.max_per_namespace is not None
+                and running_namespaces.get(namespace, 0) >= self.max_per_namespace
+            ):
+                continue
+            if (
+                self.max_per_service is not None
+                and running_services.get(service, 0) >= self.max_per_service
+            ):
+                continue
+            return ticket_id
+
+        return None
+
+    def _try_admit(self, ticket_id: int) -> bool:
+        with self._transaction() as db:
+            self._purge_stale(db)
+
+            if self._next_admissible(db) != ticket_id:
+                return False
+
+            db.execute("UPDATE tickets SET state = 'running' WHERE id = ?", (ticket_id,))
+            db.execute(
+                "UPDATE clock SET virtual_time = "
+                "(SELECT finish_tag FROM tickets WHERE id = ?) WHERE id = 0",
+                (ticket_id,),
+            )
+            return True
+
+    def acquire(self, namespace: str, service: str, user: str, priority: int = 0) -> int:
+        """
+        Queues the job and blocks until it is admitted.
+
+        :param namespace: Kubernetes namespace where the workflow is executed.
+        :param service: Zoo service (CWL workflow identifier).
+        :param user: User the fair queuing share is accounted to.
+        :param priority: Workflow priority, higher priorities are admitted first.
+        :return: The admission ticket to release once the workflow is done.
+        """
+        ticket_id = self._enqueue(namespace, service, user, priority)
+        logger.info(f"Admission ticket {ticket_id} queued for {user}/{service}")
+
+        started = time.time()
+
+        try:
+            while not self._try_admit(ticket_id):
+                if self.timeout is not None and time.time() - started > self.timeout:
+                    raise AdmissionRejected(
+                        f"Admission not granted after {self.timeout} seconds"
+                    )
+                time.sleep(self.poll_interval)
+        except BaseException:
+            self.release(ticket_id)
+            raise
+
+        logger.info(
+            f"Admission ticket {ticket_id} granted after {time.time() - started:.1f} seconds"
+        )
+        return ticket_id
+
+    def release(self, ticket_id: int) -> None:
+        """releases the admission ticket"""
+        with self._transaction() as db:
+            db.execute("DELETE FROM tickets WHERE id = ?", (ticket_id,))
+
+    @contextmanager
+    def admitted(self, namespace: str, service: str, user: str, priority: int = 0):
+        """context manager holding an admission ticket"""
+        ticket_id = self.acquire(
+            namespace=namespace, service=service, user=user, priority=priority
+        )
+        try:
+            yield ticket_id
+        finally:
+            self.release(ticket_id)
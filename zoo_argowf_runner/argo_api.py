@@ -1,13 +1,119 @@
 # this file contains the class that handles the execution of the workflow using hera-workflows and Argo Workflows API
+from contextlib import contextmanager
 from typing import Callable, Optional, Tuple
-import requests
+import attr
 import json
 import os
-from hera.workflows import WorkflowsService
+import signal
+import threading
+import zlib
 from loguru import logger
 import time
-from zoo_argowf_runner.cwl2argo import cwl_to_argo
-from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+from zoo_argowf_runner.manifest import build_workflow_manifest
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.metrics import get_metrics
+from zoo_argowf_runner.notify import get_completion_listener
+from zoo_argowf_runner.outputs_bundle import OUTPUTS_BUNDLE_TEMPLATE, OutputsBundle
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.progress import ProgressTracker
+from zoo_argowf_runner.stage_in_cache import StageInCacheVolume, add_cache_report
+from zoo_argowf_runner.timing import PhaseRecorder
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+
+class ExecutionCancelled(Exception):
+    """Raised to stop monitoring an execution and cancel its workflow (e.g. the Zoo job was dismissed)."""
+
+
+class WorkflowNotFound(Exception):
+    """Raised when the argo-server does not know the workflow (e.g. it was garbage collected)."""
+
+
+@contextmanager
+def cancel_on_signals(signals: Tuple[int, ...] = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)):
+    """
+    Raises ExecutionCancelled when the process receives one of the signals in the with block.
+
+    The signal handlers can only be set in the main thread, elsewhere the signals are left alone.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise ExecutionCancelled(signal.Signals(signum).name)
+
+    previous = {signum: signal.signal(signum, handler) for signum in signals}
+    try:
+        yield
+    finally:
+        for signum, previous_handler in previous.items():
+            signal.signal(signum, previous_handler)
+
+
+def send_request(
+    operation: str,
+    method: str,
+    url: str,
+    timings: Optional[PhaseRecorder] = None,
+    session=None,
+    **kwargs,
+):
+    """
+    Sends an Argo Workflows API call, counting it in the timings and the metrics.
+
+    :param operation: Name of the API operation in the metrics (e.g. get_workflow).
+    :param method: HTTP method.
+    :param url: URL of the API call.
+    :param timings: Recorder counting the API call.
+    :param session: requests session pooling the connections, a new connection per call if None.
+    :return: The requests response.
+    """
+    import requests
+
+    metrics = get_metrics()
+    start = time.perf_counter()
+    try:
+        response = (session or requests).request(method, url, **kwargs)
+    except requests.exceptions.RequestException:
+        metrics.inc("api_requests_total", {"operation": operation, "method": method, "status": "error"})
+        metrics.observe("api_request_duration_seconds", {"operation": operation}, time.perf_counter() - start)
+        raise
+
+    if timings is not None:
+        timings.record_response(response)
+    metrics.inc(
+        "api_requests_total",
+        {"operation": operation, "method": method, "status": str(response.status_code)},
+    )
+    metrics.observe("api_request_duration_seconds", {"operation": operation}, time.perf_counter() - start)
+
+    return response
+
+
+def read_artifact(response, chunk_size: int = 1 << 16) -> Tuple[str, int]:
+    """
+    Reads a streamed artifact, decompressing it on the fly if it is gzip compressed.
+
+    :param response: The streamed requests response.
+    :param chunk_size: Size (in bytes) of the chunks read from the response.
+    :return: The decoded artifact and the number of bytes received.
+    """
+    decompressor = None
+    chunks = []
+    received = 0
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if decompressor is None:
+            # gzip magic number, the artifact repository may store the outputs uncompressed
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+        received += len(chunk)
+        chunks.append(decompressor.decompress(chunk) if decompressor else chunk)
+
+    if decompressor:
+        chunks.append(decompressor.flush())
+
+    return b"".join(chunks).decode(), received
 
 
 class Execution:
@@ -27,6 +133,12 @@ class Execution:
         max_ram: int,
         storage_class: str,
         handler: Callable,
+        pod_placement: Optional[PodPlacement] = None,
+        priority: Optional[int] = None,
+        endpoint: Optional[ArgoEndpoint] = None,
+        timings: Optional[PhaseRecorder] = None,
+        active_deadline_seconds: Optional[int] = None,
+        labels: Optional[dict] = None,
     ) -> None:
         """
         Initialize the execution class with workflow and execution parameters.
@@ -41,6 +153,12 @@ class Execution:
         :param max_ram: Maximum RAM (in MiB) for the workflow.
         :param storage_class: Storage class for the workflow.
         :param handler: Callable to handle workflow execution updates.
+        :param pod_placement: Node selector, env vars, affinity, tolerations and priority class for the pods.
+        :param priority: Workflow priority, higher priorities are scheduled first.
+        :param endpoint: Argo Workflows endpoint, defaults to ARGO_WF_ENDPOINT and ARGO_WF_TOKEN.
+        :param timings: Recorder of the time, API calls and bytes transferred per phase.
+        :param active_deadline_seconds: Time after which Argo fails the running workflow.
+        :param labels: Workflow labels.
         """
 
         self.workflow = workflow
@@ -52,24 +170,74 @@ class Execution:
         self.max_ram = max_ram
         self.storage_class = storage_class
         self.handler = handler
+        self.pod_placement = pod_placement
+        self.priority = priority
+        self.timings = timings if timings is not None else PhaseRecorder()
+        self.active_deadline_seconds = active_deadline_seconds
+        self.labels = labels
 
-        self.token = os.environ.get("ARGO_WF_TOKEN", None)
+        if endpoint is None:
+            token = os.environ.get("ARGO_WF_TOKEN", None)
 
-        if self.token is None:
-            raise ValueError("ARGO_WF_TOKEN environment variable is not set")
+            if token is None:
+                raise ValueError("ARGO_WF_TOKEN environment variable is not set")
+
+            endpoint = ArgoEndpoint(
+                url=os.environ.get("ARGO_WF_ENDPOINT", "http://localhost:2746"),
+                token=token,
+            )
 
         self.namespace = namespace
-        self.workflows_service = os.environ.get(
-            "ARGO_WF_ENDPOINT", "http://localhost:2746"
-        )
+        self.set_endpoint(endpoint)
+
+        self.manifest_builder = os.environ.get("ARGO_WF_MANIFEST_BUILDER", "hera")
 
         self.completed = False
         self.successful = False
+        # last workflow returned by the status checks
+        self.workflow_status = None
+        # why the execution was aborted before the workflow completed
+        self.failure_reason = None
+        # uid of the created workflow, to retrieve it from the workflow archive
+        self.workflow_uid = None
+        # outputs already retrieved, the artifacts are downloaded once
+        self.output_cache = {}
+        # whether the workflow was submitted by another job (see idempotency), it is not cancelled
+        self.attached = False
+        # records the workflow of the execution to reattach to it after a restart, see write_journal
+        self.journal = None
+        self.journal_key = None
+        self.journaled_phase = None
+
+        from zoo_argowf_runner.artifacts import ArtifactReader
+
+        # reads the artifacts straight from the artifact repository, through argo-server if None
+        self.artifact_reader = ArtifactReader.from_env()
+        # notified by the exit handler of the workflow when it completes, the status is polled if None
+        self.listener = get_completion_listener()
+        # shared cache consulted by the stage-in of the workflow, not mounted if None
+        self.stage_in_cache = StageInCacheVolume.from_env()
+        # lookups of the stage-in cache, read once the workflow is completed
+        self.cache_stats = None
+
+    def set_endpoint(self, endpoint: ArgoEndpoint) -> None:
+        """
+        Set the Argo Workflows endpoint the workflow is submitted to, monitored and retrieved from.
+
+        :param endpoint: Argo Workflows endpoint.
+        """
+        self.endpoint = endpoint
+        self.token = endpoint.token
+        self.workflows_service = endpoint.url
 
     @staticmethod
     def get_workflow_status(
-        workflow_name: str, argo_server: str, namespace: str, token: str
-    ) -> Optional[Tuple[str, dict]]:
+        workflow_name: str,
+        argo_server: str,
+        namespace: str,
+        token: str,
+        timings: Optional[PhaseRecorder] = None,
+    ) -> Tuple[Optional[str], Optional[dict]]:
         """
         Fetch the current status of the workflow using the Argo Workflows API.
 
@@ -77,7 +245,9 @@ class Execution:
         :param argo_server: URL of the Argo Workflows server.
         :param namespace: Kubernetes namespace where the workflow is executed.
         :param token: Bearer token for authentication.
-        :return: Tuple containing the status and workflow information.
+        :param timings: Recorder counting the API call.
+        :return: Tuple containing the status and workflow information, (None, None) on failure.
+        :raises WorkflowNotFound: The workflow does not exist (anymore).
         """
         headers = {
             "Authorization": f"Bearer {token}",
@@ -87,8 +257,11 @@ class Execution:
             f"Getting url: {argo_server}/api/v1/workflows/{namespace}/{workflow_name}"
         )
         """Fetches the current status of the workflow."""
-        response = requests.get(
+        response = send_request(
+            "get_workflow",
+            "GET",
             f"{argo_server}/api/v1/workflows/{namespace}/{workflow_name}",
+            timings=timings,
             headers=headers,
             verify=False,  # Use verify=True with valid SSL certificates
         )
@@ -98,58 +271,238 @@ class Execution:
             workflow_info = response.json()
             status = workflow_info.get("status", {}).get("phase", "Unknown")
             return status, workflow_info
+        elif response.status_code == 404:
+            raise WorkflowNotFound(f"{namespace}/{workflow_name}")
         else:
             print(f"Failed to retrieve workflow status: {response.status_code}")
-            return None
+            return None, None
     
-    def monitor(self, interval: int = 30, update_function: Optional[Callable] = None) -> None:
+    def monitor(
+        self,
+        interval: int = 30,
+        update_function: Optional[Callable] = None,
+        schedule: Optional[PollingSchedule] = None,
+        progress: Optional[ProgressTracker] = None,
+        timeout: Optional[float] = None,
+        max_unknown_polls: int = 10,
+    ) -> None:
         """
         Monitor the execution of the workflow and update the progress.
 
-        :param interval: Time interval (in seconds) between status checks.
+        The workflow is cancelled when it does not complete within timeout, when its status
+        is unknown (or cannot be retrieved) max_unknown_polls times in a row and when
+        ExecutionCancelled is raised (e.g. by a signal handler) while monitoring.
+
+        With a completion listener, the status is only polled every safety interval until the
+        exit handler of the workflow notifies the runner, then on the schedule until it completes.
+
+        :param interval: Time interval (in seconds) between status checks, used without a schedule.
         :param update_function: Callable to handle progress updates.
+        :param schedule: Schedule of the status checks, defaults to a fixed interval.
+        :param progress: Progress model of the workflow nodes, defaults to the 20-90% band without history.
+        :param timeout: Maximum time (in seconds) the workflow is monitored.
+        :param max_unknown_polls: Maximum number of consecutive status checks without a known phase.
         """
+        import requests
 
-        def progress_to_percentage(progress: str) -> int:
-            """Convert progress string (e.g., '2/10') to percentage."""
-            completed, total = map(int, progress.split("/"))
-            return int((completed / total) * 100)
+        if schedule is None:
+            schedule = PollingSchedule(interval=interval, policy="fixed")
+        if progress is None:
+            progress = ProgressTracker()
 
-        while True:
-            status, workflow_status = self.get_workflow_status(
-                workflow_name=self.workflow_name,
-                argo_server=self.workflows_service,
-                namespace=self.namespace,
-                token=self.token,
+        # the time before the Running phase is spent queued (e.g. on the semaphore)
+        monitor_phase = "queued"
+        started = time.monotonic()
+        unknown_polls = 0
+        # whether the exit handler of the workflow notified its completion
+        notified = False
+
+        try:
+            while True:
+                with self.timings.phase(monitor_phase):
+                    try:
+                        status, workflow_status = self.get_workflow_status(
+                            workflow_name=self.workflow_name,
+                            argo_server=self.workflows_service,
+                            namespace=self.namespace,
+                            token=self.token,
+                            timings=self.timings,
+                        )
+                    except requests.exceptions.RequestException as exc:
+                        logger.warning(f"Failed to retrieve workflow status: {exc}")
+                        status, workflow_status = None, None
+                    except WorkflowNotFound:
+                        # the workflow may have been garbage collected right after completing
+                        status, workflow_status = None, None
+                        if archived := self.get_archived_workflow():
+                            status, workflow_status = archived.get("status", {}).get("phase"), archived
+                get_metrics().inc("monitor_polls_total", {"service": self.entrypoint})
+
+                if status in [None, "Unknown"]:
+                    unknown_polls += 1
+                    if unknown_polls >= max_unknown_polls:
+                        self.abort(f"workflow status unknown after {unknown_polls} status checks")
+                        break
+                else:
+                    unknown_polls = 0
+
+                if status:
+                    self.workflow_status = workflow_status
+                    logger.info(f"Workflow Status: {status}")
+                    if status != self.journaled_phase:
+                        self.write_journal(status)
+
+                    if status == "Running":
+                        monitor_phase = "running"
+
+                    if update_function and status not in [
+                        "Succeeded",
+                        "Failed",
+                        "Error",
+                        "Unknown",
+                    ]:
+                        progress.update(workflow_status.get("status", {}).get("nodes") or {})
+                        message = progress.get_message()
+                        logger.info(message)
+                        update_function(progress.get_percentage(), message)
+
+                    # Check if the workflow has completed
+                    if status in ["Succeeded"]:
+
+                        self.completed = True
+                        self.successful = True
+                        break
+
+                    elif status in ["Failed", "Error"]:
+                        self.completed = True
+                        self.successful = False
+                        logger.info(f"Workflow has completed with status: {status}")
+                        break
+
+                wait = schedule.next_interval(time.monotonic() - started, status)
+                if self.listener is not None:
+                    wait = schedule.min_interval if notified else self.listener.safety_interval
+                if timeout is not None:
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.abort(f"workflow not completed after {timeout:g} seconds")
+                        break
+                    wait = min(wait, remaining)
+
+                with self.timings.phase(monitor_phase):
+                    if self.listener is None or notified:
+                        time.sleep(wait)
+                    # the exit handler runs before the workflow completes, it is polled again right away
+                    elif self.listener.wait(self.workflow_name, wait) is not None:
+                        notified = True
+                        get_metrics().inc("monitor_notifications_total", {"service": self.entrypoint})
+        except ExecutionCancelled as exc:
+            self.abort(f"execution cancelled: {exc}")
+            raise
+        finally:
+            if self.listener is not None:
+                self.listener.discard(self.workflow_name)
+
+    def write_journal(self, phase: Optional[str] = None) -> None:
+        """
+        Records the workflow, its last phase and the small outputs retrieved so far in the journal,
+        errors are logged.
+
+        :param phase: Phase of the workflow, the last recorded phase if None.
+        """
+        if self.journal is None:
+            return
+
+        from zoo_argowf_runner.journal import MAX_JOURNALED_OUTPUT
+
+        if phase is not None:
+            self.journaled_phase = phase
+        try:
+            self.journal.write(
+                self.journal_key,
+                {
+                    "service": self.entrypoint,
+                    "workflow_name": self.workflow_name,
+                    "workflow_uid": self.workflow_uid,
+                    "namespace": self.namespace,
+                    "endpoint": {"url": self.endpoint.url, "name": self.endpoint.name},
+                    "attached": self.attached,
+                    "phase": self.journaled_phase,
+                    "outputs": {
+                        name: value
+                        for name, value in self.output_cache.items()
+                        if isinstance(value, str) and len(value) <= MAX_JOURNALED_OUTPUT
+                    },
+                },
             )
-            if status:
-                logger.info(f"Workflow Status: {status}")
-
-                if update_function and status not in [
-                    "Succeeded",
-                    "Failed",
-                    "Error",
-                    "Unknown",
-                ]:
-                    logger.info(workflow_status.get("status", {}).get("progress"))
-                    progress = workflow_status.get("status", {}).get("progress", "0/1")
-                    percentage = progress_to_percentage(progress)
-                    update_function(percentage, "Argo Workflows is handling the execution")
-
-                # Check if the workflow has completed
-                if status in ["Succeeded"]:
-
-                    self.completed = True
-                    self.successful = True
-                    break
-
-                elif status in ["Failed", "Error"]:
-                    self.completed = True
-                    self.successful = False
-                    logger.info(f"Workflow has completed with status: {status}")
-                    break
-
-            time.sleep(interval)
+        except OSError as exc:
+            logger.warning(f"Failed to write the journal of {self.journal_key}: {exc}")
+
+    def reattach(self, entry: dict) -> bool:
+        """
+        Reattaches the execution to the workflow of a journal entry.
+
+        :param entry: The journal entry of the Zoo job.
+        :return: True if the workflow still exists (or is archived), the execution is left as is otherwise.
+        """
+        workflow_name, workflow_uid = self.workflow_name, self.workflow_uid
+        self.workflow_name = entry["workflow_name"]
+        self.workflow_uid = entry.get("workflow_uid")
+
+        if self.get_workflow() is None:
+            logger.info(f"workflow {self.workflow_name} of the journal is gone")
+            self.workflow_name, self.workflow_uid = workflow_name, workflow_uid
+            return False
+
+        logger.info(f"execution reattached to workflow {self.workflow_name} ({entry.get('phase')})")
+        self.attached = entry.get("attached", False)
+        self.journaled_phase = entry.get("phase")
+        self.output_cache.update(entry.get("outputs") or {})
+        return True
+
+    def abort(self, reason: str) -> None:
+        """Stops monitoring an execution that did not complete and cancels its workflow."""
+        logger.error(reason)
+        self.failure_reason = reason
+        self.successful = False
+        if self.attached:
+            logger.info(f"workflow {self.workflow_name} of another job left running")
+            return
+        self.cancel()
+
+    def cancel(self, mode: Optional[str] = None) -> bool:
+        """
+        Stop or terminate the workflow through the Argo Workflows API, errors are logged.
+
+        Stopping runs the exit handlers of the workflow, terminating does not.
+
+        :param mode: 'stop' or 'terminate', defaults to ARGO_WF_CANCEL_MODE or 'terminate'.
+        :return: True if the workflow was cancelled.
+        """
+        import requests
+
+        mode = mode or os.environ.get("ARGO_WF_CANCEL_MODE", "terminate")
+        try:
+            response = send_request(
+                f"{mode}_workflow",
+                "PUT",
+                f"{self.workflows_service}/api/v1/workflows/{self.namespace}/{self.workflow_name}/{mode}",
+                timings=self.timings,
+                headers=self.endpoint.get_headers(),
+                data=json.dumps({"name": self.workflow_name, "namespace": self.namespace}),
+                timeout=30,
+                verify=False,
+            )
+        except requests.exceptions.RequestException as exc:
+            logger.error(f"Failed to {mode} workflow {self.workflow_name}: {exc}")
+            return False
+
+        if response.status_code != 200:
+            logger.error(f"Failed to {mode} workflow {self.workflow_name}: {response.status_code}")
+            return False
+
+        logger.info(f"workflow {self.workflow_name} {mode} requested")
+        return True
 
     def is_completed(self) -> bool:
         """Check if the execution is completed."""
@@ -165,6 +518,85 @@ class Execution:
         
         return self.successful
 
+    def get_workflow(self) -> Optional[dict]:
+        """
+        Retrieve the workflow with its status.
+
+        The completed workflow seen by monitor is reused so that the outputs are still
+        available once the workflow is garbage collected (ttlStrategy), otherwise the
+        workflow is fetched and looked up in the workflow archive if it was deleted (not
+        when the argo-server fails).
+
+        :return: The workflow or None.
+        """
+        if self.completed and self.workflow_status is not None:
+            return self.workflow_status
+
+        import requests
+
+        try:
+            _, workflow_status = self.get_workflow_status(
+                workflow_name=self.workflow_name,
+                argo_server=self.workflows_service,
+                namespace=self.namespace,
+                token=self.token,
+                timings=self.timings,
+            )
+        except requests.exceptions.RequestException as exc:
+            logger.warning(f"Failed to retrieve workflow: {exc}")
+            workflow_status = None
+        except WorkflowNotFound:
+            return self.get_archived_workflow()
+
+        return workflow_status
+
+    def get_archived_workflow(self) -> Optional[dict]:
+        """
+        Retrieve the workflow from the workflow archive of Argo Workflows.
+
+        :return: The archived workflow, None if the workflow is not archived or the archive is disabled.
+        """
+        import requests
+
+        try:
+            if self.workflow_uid is None:
+                response = send_request(
+                    "list_archived_workflows",
+                    "GET",
+                    f"{self.workflows_service}/api/v1/archived-workflows",
+                    timings=self.timings,
+                    params={
+                        "listOptions.fieldSelector": f"metadata.name={self.workflow_name},"
+                        f"metadata.namespace={self.namespace}",
+                        "namespace": self.namespace,
+                    },
+                    headers=self.endpoint.get_headers(),
+                    verify=False,
+                )
+                items = (response.json().get("items") if response.status_code == 200 else None) or []
+                if not items:
+                    return None
+                self.workflow_uid = items[0]["metadata"]["uid"]
+
+            response = send_request(
+                "get_archived_workflow",
+                "GET",
+                f"{self.workflows_service}/api/v1/archived-workflows/{self.workflow_uid}",
+                timings=self.timings,
+                params={"namespace": self.namespace},
+                headers=self.endpoint.get_headers(),
+                verify=False,
+            )
+        except requests.exceptions.RequestException as exc:
+            logger.warning(f"Failed to retrieve the archived workflow: {exc}")
+            return None
+
+        if response.status_code != 200:
+            return None
+
+        logger.info(f"workflow {self.workflow_name} retrieved from the workflow archive")
+        return response.json()
+
     def get_execution_output_parameter(self, output_parameter_name: str):
         """
         Retrieve the specified output parameter from the workflow execution.
@@ -174,46 +606,257 @@ class Execution:
         """
         logger.info(f"Retrieving output parameter: {output_parameter_name}")
 
-        _, workflow_status = self.get_workflow_status(
-            workflow_name=self.workflow_name,
-            argo_server=self.workflows_service,
-            namespace=self.namespace,
-            token=self.token,
-        )
+        workflow_status = self.get_workflow()
 
         for output_parameter in (
-            workflow_status.get("status")
-            .get("nodes")
-            .get(self.workflow_name)
+            (workflow_status or {})
+            .get("status", {})
+            .get("nodes", {})
+            .get(self.workflow_name, {})
             .get("outputs", {})
-            .get("parameters", {})  # it's a list
+            .get("parameters", [])  # it's a list
         ):
             if output_parameter.get("name") in [output_parameter_name]:
                 return output_parameter.get("value", {})
 
+    def get_artifact_location(self, node_id: str, artifact_name: str):
+        """
+        Resolve the location of an output artifact of a workflow node in the artifact repository.
+
+        :param node_id: Id of the node.
+        :param artifact_name: Name of the output artifact.
+        :return: The S3Location, None without direct artifact repository reads.
+        """
+        if self.artifact_reader is None:
+            return None
+        return self.artifact_reader.get_location(self.get_workflow(), node_id, artifact_name)
+
+    def get_execution_output_artifact(self, output_artifact_name: str) -> Optional[str]:
+        """
+        Download the specified output artifact of the workflow execution from the artifact
+        repository, or through argo-server.
+
+        The artifact is streamed and decompressed on the fly.
+
+        :param output_artifact_name: Name of the output artifact.
+        :return: Content of the output artifact or None.
+        """
+        import requests
+
+        node = (
+            (self.get_workflow() or {}).get("status", {}).get("nodes", {}).get(self.workflow_name, {})
+        )
+        if output_artifact_name not in [
+            artifact.get("name") for artifact in node.get("outputs", {}).get("artifacts", [])
+        ]:
+            return None
+
+        logger.info(f"Retrieving output artifact: {output_artifact_name}")
+        response = None
+        if (location := self.get_artifact_location(self.workflow_name, output_artifact_name)) is not None:
+            try:
+                response = self.artifact_reader.get(location, stream=True)
+            except requests.exceptions.RequestException as exc:
+                logger.warning(f"Failed to read output artifact {output_artifact_name} from the artifact repository: {exc}")
+            if response is not None and response.status_code != 200:
+                logger.warning(
+                    f"Failed to read output artifact {output_artifact_name} from the artifact repository: "
+                    f"{response.status_code}"
+                )
+                response.close()
+                response = None
+
+        try:
+            if response is None:
+                response = send_request(
+                    "get_artifact",
+                    "GET",
+                    f"{self.workflows_service}/artifact-files/{self.namespace}/workflows/"
+                    f"{self.workflow_name}/{self.workflow_name}/outputs/{output_artifact_name}",
+                    headers=self.endpoint.get_headers(),
+                    stream=True,
+                    timeout=60,
+                    verify=False,
+                )
+            with response:
+                if response.status_code != 200:
+                    logger.error(
+                        f"Failed to retrieve output artifact {output_artifact_name}: {response.status_code}"
+                    )
+                    return None
+                value, received = read_artifact(response)
+        except requests.exceptions.RequestException as exc:
+            logger.error(f"Failed to retrieve output artifact {output_artifact_name}: {exc}")
+            return None
+
+        # the streamed response is counted once read
+        self.timings.count_api_call(bytes_received=received)
+        return value
+
+    def read_artifact_range(self, node_id: str, artifact_name: str, first: int, last: int) -> bytes:
+        """
+        Read a byte range of an output artifact of a workflow node from the artifact repository,
+        or through argo-server.
+
+        :param node_id: Id of the node.
+        :param artifact_name: Name of the output artifact.
+        :param first: Offset of the first byte.
+        :param last: Offset of the last byte (included).
+        :return: The bytes, fewer at the end of the artifact.
+        """
+        import requests
+
+        if (location := self.get_artifact_location(node_id, artifact_name)) is not None:
+            try:
+                return self.artifact_reader.read(location, (first, last), timings=self.timings)
+            except requests.exceptions.RequestException as exc:
+                logger.warning(f"Failed to read artifact {artifact_name} from the artifact repository: {exc}")
+
+        response = send_request(
+            "get_artifact",
+            "GET",
+            f"{self.workflows_service}/artifact-files/{self.namespace}/workflows/"
+            f"{self.workflow_name}/{node_id}/outputs/{artifact_name}",
+            timings=self.timings,
+            headers={**self.endpoint.get_headers(), "Range": f"bytes={first}-{last}"},
+            timeout=60,
+            verify=False,
+        )
+
+        if response.status_code == 206:
+            return response.content
+        if response.status_code == 416:
+            return b""
+        response.raise_for_status()
+
+        # the range is not supported, the whole artifact is sent
+        return response.content[first:last + 1]
+
+    def get_outputs_bundle(self) -> Optional[OutputsBundle]:
+        """
+        Open the outputs bundle written by the exit handler of the workflow (ARGO_WF_OUTPUTS=bundle).
+
+        Only the head of the bundle with its index is read, the logs are read when asked for.
+
+        :return: The outputs bundle, None if the workflow has none.
+        """
+        import requests
+
+        if OUTPUTS_BUNDLE_TEMPLATE in self.output_cache:
+            return self.output_cache[OUTPUTS_BUNDLE_TEMPLATE]
+
+        nodes = (self.get_workflow() or {}).get("status", {}).get("nodes", {})
+        node_id = next(
+            (
+                node_id
+                for node_id, node in nodes.items()
+                if node.get("templateName") == OUTPUTS_BUNDLE_TEMPLATE and node.get("phase") == "Succeeded"
+            ),
+            None,
+        )
+        if node_id is None:
+            return None
+
+        logger.info("Retrieving the outputs bundle")
+        try:
+            bundle = OutputsBundle(
+                lambda first, last: self.read_artifact_range(node_id, OUTPUTS_BUNDLE_TEMPLATE, first, last)
+            )
+        except (requests.exceptions.RequestException, ValueError, OSError) as exc:
+            logger.error(f"Failed to retrieve the outputs bundle: {exc}")
+            bundle = None
+
+        self.output_cache[OUTPUTS_BUNDLE_TEMPLATE] = bundle
+        return bundle
+
+    def get_bundle_output(self, name: str) -> Optional[str]:
+        """
+        Retrieve the specified output from the outputs bundle.
+
+        :param name: Name of the output.
+        :return: Value of the output or None.
+        """
+        import requests
+
+        bundle = self.get_outputs_bundle()
+        if bundle is None:
+            return None
+
+        if name != "log":
+            return bundle.get_output(name)
+
+        try:
+            return bundle.get_log()
+        except (requests.exceptions.RequestException, OSError) as exc:
+            logger.error(f"Failed to retrieve the log from the outputs bundle: {exc}")
+            return None
+
+    def get_execution_output(self, name: str) -> Optional[str]:
+        """
+        Retrieve the specified output of the workflow execution: a parameter, from the outputs bundle
+        or an artifact (see ARGO_WF_OUTPUTS).
+
+        :param name: Name of the output.
+        :return: Value of the output or None.
+        """
+        if name not in self.output_cache:
+            value = self.get_execution_output_parameter(name)
+            if value is None:
+                value = self.get_bundle_output(name)
+            if value is None:
+                value = self.get_execution_output_artifact(name)
+            if value is None:
+                return None
+            self.output_cache[name] = value
+            self.write_journal()
+
+        return self.output_cache[name]
+
     def get_output(self):
         """Retrieve the output."""
         return self.get_feature_collection()
 
     def get_results(self):
-        """Retrieve the 'results' output parameter."""
-        return self.get_execution_output_parameter("results")
+        """Retrieve the 'results' output."""
+        return self.get_execution_output("results")
 
     def get_log(self) -> Optional[str]:
-        """Retrieve the 'log' output parameter."""
-        return self.get_execution_output_parameter("log")
+        """Retrieve the 'log' output."""
+        return self.get_execution_output("log")
 
     def get_usage_report(self):
-        """Retrieve the 'usage-report' output parameter."""
-        return self.get_execution_output_parameter("usage-report")
+        """Retrieve the 'usage-report' output, with the lookups of the stage-in cache when it is mounted on the host."""
+        usage_report = self.get_execution_output("usage-report")
+
+        if (stats := self.get_cache_stats()) is not None:
+            usage_report = add_cache_report(usage_report, stats)
+        return usage_report
+
+    def get_cache_stats(self) -> Optional[dict]:
+        """
+        Returns the lookups of the stage-in cache counted for the workflow.
+
+        :return: The hits, misses, bytes_hit and bytes_missed, None if the cache is not mounted on the Zoo host.
+        """
+        if self.cache_stats is None and self.stage_in_cache is not None:
+            cache = self.stage_in_cache.get_local_cache()
+            if cache is None:
+                return None
+
+            self.cache_stats = cache.get_stats(self.workflow_name)
+            # the lookups of a workflow shared with other jobs are left to them
+            if not self.attached:
+                cache.remove_stats(self.workflow_name)
+
+        return self.cache_stats
 
     def get_stac_catalog(self) -> Optional[str]:
-        """Retrieve the 'stac-catalog' output parameter."""
-        return self.get_execution_output_parameter("stac-catalog")
+        """Retrieve the 'stac-catalog' output."""
+        return self.get_execution_output("stac-catalog")
 
     def get_feature_collection(self) -> Optional[str]:
-        """Retrieve the 'feature-collection' output parameter."""
-        return self.get_execution_output_parameter("feature-collection")
+        """Retrieve the 'feature-collection' output."""
+        return self.get_execution_output("feature-collection")
 
     def get_tool_logs(self):
         """
@@ -221,40 +864,140 @@ class Execution:
 
         :return: List of paths to saved tool log files.
         """
+        import requests
+
         usage_report = json.loads(self.get_usage_report())
+        steps = [child.get("name") for child in usage_report.get("children")]
+
+        # the tool logs are range reads in the outputs bundle
+        contents = {}
+        if (bundle := self.get_outputs_bundle()) is not None:
+            for step in steps:
+                if (content := bundle.get_tool_log(step)) is not None:
+                    contents[step] = content
+
+        # or read concurrently from the artifact repository
+        missing = [step for step in steps if step not in contents]
+        if missing and (location := self.get_artifact_location(self.workflow_name, "tool-logs")) is not None:
+            try:
+                payloads = self.artifact_reader.read_many(
+                    [location.child(f"{step}.log") for step in missing], timings=self.timings
+                )
+                contents.update(zip(missing, (payload.decode() for payload in payloads)))
+            except requests.exceptions.RequestException as exc:
+                logger.warning(f"Failed to read the tool logs from the artifact repository: {exc}")
 
         tool_logs = []
 
-        for child in usage_report.get("children"):
-            logger.info(f"Getting tool logs for step {child.get('name')}")
-            response = requests.get(
-                f"{self.workflows_service}/artifact-files/{self.namespace}/workflows/{self.workflow_name}/{self.workflow_name}/outputs/tool-logs/{child.get('name')}.log"
-            )
-            with open(f"{child.get('name')}.log", "w") as f:
-                f.write(response.text)
-            tool_logs.append(f"{child.get('name')}.log")
+        for step in steps:
+            logger.info(f"Getting tool logs for step {step}")
+            if step not in contents:
+                response = send_request(
+                    "get_artifact",
+                    "GET",
+                    f"{self.workflows_service}/artifact-files/{self.namespace}/workflows/{self.workflow_name}/{self.workflow_name}/outputs/tool-logs/{step}.log",
+                    timings=self.timings,
+                    headers=self.endpoint.get_headers(),
+                    verify=False,
+                )
+                contents[step] = response.text
+            with open(f"{step}.log", "w") as f:
+                f.write(contents[step])
+            tool_logs.append(f"{step}.log")
 
         return tool_logs
 
-    def run(self, **kwargs) -> None:
-        """
-        Create and submit the Argo Workflow object using the CWL definition and execution parameters.
-        """
-        inputs = {"inputs": self.processing_parameters}
+    def get_pod_placement(self) -> Optional[PodPlacement]:
+        """Returns the pod placement hints, with the environment variables of the stage-in cache when it is mounted."""
+        if self.stage_in_cache is None:
+            return self.pod_placement
+
+        placement = self.pod_placement or PodPlacement()
+        return attr.evolve(
+            placement,
+            env_vars={**(placement.env_vars or {}), **self.stage_in_cache.get_env_vars(self.workflow_name)},
+        )
 
-        wf = cwl_to_argo(
+    def get_workflow_arguments(self, **kwargs) -> dict:
+        """Returns the arguments of the workflow builders."""
+        return dict(
             workflow=self.workflow,
             entrypoint=self.entrypoint,
             argo_wf_name=self.workflow_name,
-            inputs=inputs,
+            inputs={"inputs": self.processing_parameters},
             volume_size=self.volume_size,
             max_cores=self.max_cores,
             max_ram=self.max_ram,
             storage_class=self.storage_class,
             namespace=self.namespace,
+            pod_placement=self.get_pod_placement(),
+            priority=self.priority,
+            active_deadline_seconds=self.active_deadline_seconds,
+            labels=self.labels,
+            notify_url=self.listener.get_callback_url(self.workflow_name) if self.listener else None,
+            stage_in_cache=self.stage_in_cache,
+            timings=self.timings,
             **kwargs,
         )
 
+    def submit_manifest(self, manifest: dict) -> dict:
+        """
+        Submit a Workflow manifest to the Argo Workflows API.
+
+        A workflow with the same name is already created (e.g. a retried submission of an
+        idempotent workflow name), it is returned instead.
+
+        :param manifest: The Workflow manifest.
+        :return: The created Workflow.
+        """
+        response = send_request(
+            "create_workflow",
+            "POST",
+            f"{self.workflows_service}/api/v1/workflows/{self.namespace}",
+            timings=self.timings,
+            headers=self.endpoint.get_headers(),
+            data=json.dumps({"workflow": manifest}),
+            verify=False,
+        )
+        if response.status_code == 409 and (workflow := self.get_existing_workflow()) is not None:
+            return workflow
+        response.raise_for_status()
+
+        workflow = response.json()
+        self.workflow_uid = workflow.get("metadata", {}).get("uid")
+
+        return workflow
+
+    def get_existing_workflow(self) -> Optional[dict]:
+        """returns the workflow already created with the name of the execution, None if it cannot be retrieved"""
+        workflow = self.get_workflow()
+        if workflow is None:
+            return None
+
+        logger.info(f"workflow {self.workflow_name} already exists")
+        self.workflow_uid = workflow.get("metadata", {}).get("uid")
+        return workflow
+
+    def run(self, **kwargs) -> None:
+        """
+        Create and submit the Argo Workflow object using the CWL definition and execution parameters.
+
+        With ARGO_WF_MANIFEST_BUILDER set to 'fast', the manifest is built as plain dicts
+        and posted directly instead of going through the Hera models.
+        """
+        if self.manifest_builder == "fast":
+            manifest = build_workflow_manifest(**self.get_workflow_arguments(**kwargs))
+            with self.timings.phase("submit"):
+                self.submit_manifest(manifest)
+            return
+
+        # the Hera models are only imported when building with Hera
+        from hera.exceptions import AlreadyExists
+        from hera.workflows import WorkflowsService
+        from zoo_argowf_runner.cwl2argo import cwl_to_argo
+
+        wf = cwl_to_argo(**self.get_workflow_arguments(**kwargs))
+
         workflows_service = WorkflowsService(
             host=self.workflows_service,
             verify_ssl=None,
@@ -264,4 +1007,24 @@ class Execution:
 
         wf.workflows_service = workflows_service
         wf.workflows_service.namespace = self.namespace
-        wf.create()
+        with self.timings.phase("submit"):
+            start = time.perf_counter()
+            try:
+                created = wf.create()
+                self.workflow_uid = created.metadata.uid if created.metadata else None
+                status = "200"
+            except AlreadyExists:
+                if self.get_existing_workflow() is None:
+                    raise
+                status = "409"
+            # the Hera client does not expose the response
+            self.timings.count_api_call()
+            get_metrics().inc(
+                "api_requests_total",
+                {"operation": "create_workflow", "method": "POST", "status": status},
+            )
+            get_metrics().observe(
+                "api_request_duration_seconds",
+                {"operation": "create_workflow"},
+                time.perf_counter() - start,
+            )
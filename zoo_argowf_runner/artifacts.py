@@ -0,0 +1,361 @@
+# Description: This file contains the reader of the workflow artifacts straight from the S3-compatible artifact
+# repository of Argo Workflows, bypassing the argo-server artifact proxy.
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+import attr
+
+from zoo_argowf_runner.argo_api import send_request
+from zoo_argowf_runner.timing import PhaseRecorder
+
+# hash of the empty payload of the GET requests
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+
+
+@attr.s(frozen=True)
+class S3Location:
+    """Location of an artifact in an S3-compatible repository."""
+
+    endpoint = attr.ib()
+    bucket = attr.ib()
+    key = attr.ib()
+    region = attr.ib(default="us-east-1")
+
+    def get_url(self) -> str:
+        """returns the path-style URL of the object"""
+        return f"{self.endpoint}/{self.bucket}/{quote(self.key, safe='/~')}"
+
+    def child(self, path: str) -> "S3Location":
+        """returns the location of a file of a directory artifact (archive none)"""
+        return attr.evolve(self, key=f"{self.key.rstrip('/')}/{path}")
+
+
+def canonical_query(query: str) -> str:
+    """returns the canonical query string of a request: the URI-encoded parameters sorted by name"""
+    return "&".join(
+        sorted(
+            f"{quote(unquote(name), safe='-_.~')}={quote(unquote(value), safe='-_.~')}"
+            for name, _, value in (item.partition("=") for item in query.split("&") if item)
+        )
+    )
+
+
+def get_signature(secret_key: str, now: datetime, region: str, service: str, string_to_sign: str) -> str:
+    """returns the hex Signature Version 4 of a string to sign"""
+    key = f"AWS4{secret_key}".encode()
+    for part in [now.strftime("%Y%m%d"), region, service, "aws4_request"]:
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    headers: dict,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+    payload_hash: str = EMPTY_PAYLOAD_HASH,
+    service: str = "s3",
+) -> dict:
+    """
+    Signs a request with AWS Signature Version 4 (authorization header).
+
+    Args:
+        method (str): HTTP method.
+        url (str): URL of the request, its path already URI-encoded.
+        headers (dict): Headers of the request, all signed.
+        access_key (str): Access key id.
+        secret_key (str): Secret access key.
+        region (str): Region of the service.
+        now (Optional[datetime]): Time of the request, defaults to the current time.
+        payload_hash (str): Hex sha256 of the payload.
+        service (str): Signed service name.
+
+    Returns:
+        dict: The headers of the request with the host, x-amz-date, x-amz-content-sha256 and Authorization headers.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now.strftime('%Y%m%d')}/{region}/{service}/aws4_request"
+
+    parsed = urlparse(url)
+    headers = {
+        **headers,
+        "host": parsed.netloc,
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+    }
+
+    canonical_headers = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed_headers = ";".join(sorted(canonical_headers))
+    query = canonical_query(parsed.query)
+    canonical_request = "\n".join(
+        [
+            method,
+            parsed.path or "/",
+            query,
+            "".join(f"{name}:{canonical_headers[name]}\n" for name in sorted(canonical_headers)),
+            signed_headers,
+            payload_hash,
+        ]
+    )
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()]
+    )
+
+    signature = get_signature(secret_key, now, region, service, string_to_sign)
+
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+def presign_v4(
+    method: str,
+    url: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    expires: int = 604800,
+    now: Optional[datetime] = None,
+    service: str = "s3",
+) -> str:
+    """
+    Presigns a request with AWS Signature Version 4 (query parameters), e.g. a GET URL
+    handed to a client without the credentials.
+
+    Args:
+        method (str): HTTP method.
+        url (str): URL of the request, its path already URI-encoded.
+        access_key (str): Access key id.
+        secret_key (str): Secret access key.
+        region (str): Region of the service.
+        expires (int): Validity (in seconds) of the URL, 7 days at most.
+        now (Optional[datetime]): Time of the request, defaults to the current time.
+        service (str): Signed service name.
+
+    Returns:
+        str: The presigned URL.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now.strftime('%Y%m%d')}/{region}/{service}/aws4_request"
+
+    parsed = urlparse(url)
+    query = canonical_query(
+        "&".join(
+            [item for item in parsed.query.split("&") if item]
+            + [
+                "X-Amz-Algorithm=AWS4-HMAC-SHA256",
+                f"X-Amz-Credential={quote(f'{access_key}/{scope}', safe='')}",
+                f"X-Amz-Date={amz_date}",
+                f"X-Amz-Expires={expires}",
+                "X-Amz-SignedHeaders=host",
+            ]
+        )
+    )
+    canonical_request = "\n".join(
+        [method, parsed.path or "/", query, f"host:{parsed.netloc}\n", "host", "UNSIGNED-PAYLOAD"]
+    )
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()]
+    )
+    signature = get_signature(secret_key, now, region, service, string_to_sign)
+
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{query}&X-Amz-Signature={signature}"
+
+
+def get_artifact_location(
+    workflow_status: Optional[dict], node_id: str, artifact_name: str, endpoint: Optional[str] = None
+) -> Optional[S3Location]:
+    """
+    Resolves the location of an output artifact of a workflow node from the workflow status.
+
+    Args:
+        workflow_status (Optional[dict]): The workflow with its status.
+        node_id (str): Id of the node.
+        artifact_name (str): Name of the output artifact.
+        endpoint (Optional[str]): URL of the repository, overriding the endpoint of the status
+            (e.g. the repository is reached through another address from the Zoo host).
+
+    Returns:
+        Optional[S3Location]: The location, None if the artifact is not stored in an S3 repository.
+    """
+    status = (workflow_status or {}).get("status", {})
+    node = status.get("nodes", {}).get(node_id, {})
+    artifact = next(
+        (
+            artifact
+            for artifact in node.get("outputs", {}).get("artifacts", [])
+            if artifact.get("name") == artifact_name
+        ),
+        None,
+    )
+    if artifact is None or "key" not in artifact.get("s3", {}):
+        return None
+
+    repository = (status.get("artifactRepositoryRef") or {}).get("artifactRepository", {}).get("s3", {})
+    s3 = {**repository, **artifact["s3"]}
+    if not s3.get("bucket") or not (endpoint or s3.get("endpoint")):
+        return None
+
+    if endpoint is None:
+        endpoint = f"{'http' if s3.get('insecure') else 'https'}://{s3['endpoint']}"
+
+    return S3Location(
+        endpoint=endpoint.rstrip("/"),
+        bucket=s3["bucket"],
+        key=s3["key"],
+        region=s3.get("region") or "us-east-1",
+    )
+
+
+class ArtifactReader:
+    """
+    Reads the artifacts straight from the S3-compatible artifact repository.
+
+    The requests share a pool of connections and the batches of objects are read concurrently.
+    """
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        endpoint: Optional[str] = None,
+        max_connections: int = 16,
+        timeout: float = 60,
+    ) -> None:
+        """
+        :param access_key: Access key id of the artifact repository.
+        :param secret_key: Secret access key of the artifact repository.
+        :param endpoint: URL of the artifact repository, defaults to the endpoint in the workflow status.
+        :param max_connections: Maximum number of pooled connections and concurrent requests.
+        :param timeout: Timeout (in seconds) of the requests.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.endpoint = endpoint
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls) -> Optional["ArtifactReader"]:
+        """
+        Returns the reader configured with ARGO_WF_S3_ACCESS_KEY_ID and ARGO_WF_S3_SECRET_ACCESS_KEY,
+        None if not set (the artifacts are read through argo-server).
+        """
+        access_key = os.environ.get("ARGO_WF_S3_ACCESS_KEY_ID")
+        secret_key = os.environ.get("ARGO_WF_S3_SECRET_ACCESS_KEY")
+
+        if not access_key or not secret_key:
+            return None
+
+        return cls(
+            access_key=access_key,
+            secret_key=secret_key,
+            endpoint=os.environ.get("ARGO_WF_S3_ENDPOINT") or None,
+            max_connections=int(os.environ.get("ARGO_WF_S3_MAX_CONNECTIONS", 16)),
+        )
+
+    def get_location(self, workflow_status: Optional[dict], node_id: str, artifact_name: str) -> Optional[S3Location]:
+        """returns the location of an output artifact of a workflow node, see get_artifact_location"""
+        return get_artifact_location(workflow_status, node_id, artifact_name, self.endpoint)
+
+    def get(
+        self,
+        location: S3Location,
+        byte_range: Optional[Tuple[int, int]] = None,
+        stream: bool = False,
+        timings: Optional[PhaseRecorder] = None,
+    ):
+        """
+        Sends a signed GET request of an object.
+
+        :param location: Location of the object.
+        :param byte_range: First and last (included) offsets of the bytes to read.
+        :param stream: Whether the response content is streamed.
+        :param timings: Recorder counting the request, not with a streamed response.
+        :return: The requests response.
+        """
+        headers = {}
+        if byte_range is not None:
+            headers["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+
+        url = location.get_url()
+        return send_request(
+            "s3_get_object",
+            "GET",
+            url,
+            timings=timings,
+            session=self.session,
+            headers=sign_v4(
+                "GET", url, headers, self.access_key, self.secret_key, location.region
+            ),
+            stream=stream,
+            timeout=self.timeout,
+        )
+
+    def read(
+        self,
+        location: S3Location,
+        byte_range: Optional[Tuple[int, int]] = None,
+        timings: Optional[PhaseRecorder] = None,
+    ) -> bytes:
+        """
+        Reads an object or a byte range of an object.
+
+        :param location: Location of the object.
+        :param byte_range: First and last (included) offsets of the bytes to read, fewer at the end of the object.
+        :param timings: Recorder counting the request.
+        :return: The bytes read.
+        :raises requests.exceptions.RequestException: The object cannot be read.
+        """
+        response = self.get(location, byte_range, timings=timings)
+
+        if response.status_code == 416:
+            return b""
+        response.raise_for_status()
+
+        # the range is not supported, the whole object is sent
+        if byte_range is not None and response.status_code == 200:
+            return response.content[byte_range[0]:byte_range[1] + 1]
+        return response.content
+
+    def read_many(self, locations: List[S3Location], timings: Optional[PhaseRecorder] = None) -> List[bytes]:
+        """
+        Reads objects concurrently.
+
+        :param locations: Locations of the objects.
+        :param timings: Recorder counting the requests.
+        :return: The objects, in the order of the locations.
+        :raises requests.exceptions.RequestException: An object cannot be read.
+        """
+        if len(locations) <= 1:
+            payloads = [self.read(location) for location in locations]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_connections, len(locations))) as executor:
+                payloads = list(executor.map(self.read, locations))
+
+        # counted from this thread, the recorder charges the current phase
+        if timings is not None:
+            for payload in payloads:
+                timings.count_api_call(bytes_received=len(payload))
+
+        return payloads
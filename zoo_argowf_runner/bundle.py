@@ -0,0 +1,243 @@
+# Description: This file contains the precompiled service bundles: the parsed CWL process index, input schema,
+# resource plan, container images and manifest skeleton of a service written at deploy time and memory-mapped
+# at job startup.
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from functools import cached_property
+from typing import Optional
+
+from loguru import logger
+
+from zoo_argowf_runner.manifest import _skeletons, get_skeleton, get_skeleton_key
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, load_cwl_document
+
+BUNDLE_MAGIC = b"ZAWFBNDL"
+
+# bumped when the bundle contents change, older bundles are ignored
+BUNDLE_FORMAT_VERSION = 3
+
+BUNDLE_EXTENSION = ".bundle"
+
+# magic, format version, Python major and minor versions, sha256 of the CWL document
+HEADER = struct.Struct("<8sHBB32s")
+
+
+def get_cwl_digest(cwl: dict) -> bytes:
+    """
+    Returns the sha256 digest of a CWL document.
+
+    Args:
+        cwl (dict): The CWL document as loaded from YAML.
+
+    Returns:
+        bytes: The digest of the canonical JSON encoding of the document.
+    """
+    return hashlib.sha256(
+        json.dumps(cwl, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).digest()
+
+
+def get_bundle_path(bundle_dir: str, workflow_id: str) -> str:
+    """returns the path of the bundle of a service"""
+    return os.path.join(bundle_dir, f"{workflow_id}{BUNDLE_EXTENSION}")
+
+
+def to_plain(value):
+    """returns a value marshal can encode, parsed CWL objects are encoded as strings"""
+    return json.loads(json.dumps(value, default=str))
+
+
+def compile_bundle(workflow: CWLWorkflow) -> dict:
+    """
+    Compiles the static data of a service out of its parsed CWL document.
+
+    Args:
+        workflow (CWLWorkflow): The parsed CWL workflow.
+
+    Returns:
+        dict: The bundle contents.
+    """
+    return {
+        "workflow_id": workflow.workflow_id,
+        "version": workflow.get_version(),
+        "label": workflow.get_label(),
+        "doc": workflow.get_doc(),
+        "processes": [
+            {"id": elem.id.split("#")[-1], "class": elem.class_}
+            for elem in workflow.cwl
+        ],
+        "inputs": workflow.get_workflow_inputs(),
+        "mandatory_inputs": workflow.get_workflow_inputs(mandatory=True),
+        "input_schema": to_plain(workflow.get_input_schema()),
+        "images": workflow.get_docker_images(),
+        "scatter_multiplier": int(os.getenv("SCATTER_MULTIPLIER", 2)),
+        "resources": workflow.eval_resource(),
+        # the runner template and the output artifacts (ARGO_WF_OUTPUTS) the skeleton is built for
+        "skeleton_key": to_plain(get_skeleton_key(workflow.workflow_id)),
+        "skeleton": get_skeleton(workflow, workflow.workflow_id),
+    }
+
+
+def write_bundle(path: str, cwl: dict, contents: dict) -> None:
+    """
+    Writes a bundle, the file is replaced atomically so that running jobs never read a partial bundle.
+
+    Args:
+        path (str): The bundle path.
+        cwl (dict): The CWL document the bundle was compiled from.
+        contents (dict): The bundle contents.
+    """
+    header = HEADER.pack(
+        BUNDLE_MAGIC,
+        BUNDLE_FORMAT_VERSION,
+        sys.version_info.major,
+        sys.version_info.minor,
+        get_cwl_digest(cwl),
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(header)
+            stream.write(marshal.dumps(contents))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_bundle(path: str, cwl: dict) -> Optional[dict]:
+    """
+    Reads a bundle, memory-mapped.
+
+    Args:
+        path (str): The bundle path.
+        cwl (dict): The CWL document of the service.
+
+    Returns:
+        Optional[dict]: The bundle contents, None if the bundle is missing, was written by another
+        format or Python version or does not match the CWL document.
+    """
+    try:
+        stream = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < HEADER.size:
+            return None
+
+        magic, format_version, major, minor, digest = HEADER.unpack_from(mapped)
+
+        if magic != BUNDLE_MAGIC or format_version != BUNDLE_FORMAT_VERSION:
+            logger.info(f"bundle {path} has an unsupported format")
+            return None
+        if (major, minor) != sys.version_info[:2]:
+            logger.info(f"bundle {path} was written by Python {major}.{minor}")
+            return None
+        if digest != get_cwl_digest(cwl):
+            logger.info(f"bundle {path} does not match the CWL document")
+            return None
+
+        with memoryview(mapped) as view:
+            return marshal.loads(view[HEADER.size :])
+
+
+class BundledCWLWorkflow(CWLWorkflow):
+    """
+    A CWLWorkflow answering from a precompiled bundle, the CWL document is only parsed
+    when a method not covered by the bundle needs it.
+    """
+
+    def __init__(self, cwl, workflow_id, bundle: dict):
+        self.raw_cwl = cwl
+        self.workflow_id = workflow_id
+        self.bundle = bundle
+
+        entrypoint, runner_template, runner_entrypoint, output_artifacts = bundle["skeleton_key"]
+        key = (entrypoint, runner_template, runner_entrypoint, tuple(output_artifacts))
+        _skeletons.setdefault(self, {})[key] = bundle["skeleton"]
+
+    @cached_property
+    def cwl(self):
+        logger.info(f"parsing the CWL document of {self.workflow_id}")
+        return load_cwl_document(self.raw_cwl, "io://")
+
+    def get_version(self):
+        return self.bundle["version"]
+
+    def get_label(self):
+        return self.bundle["label"]
+
+    def get_doc(self):
+        return self.bundle["doc"]
+
+    def get_workflow_inputs(self, mandatory=False):
+        return list(self.bundle["mandatory_inputs" if mandatory else "inputs"])
+
+    def get_input_schema(self):
+        return self.bundle["input_schema"]
+
+    def get_docker_images(self):
+        return list(self.bundle["images"])
+
+    def eval_resource(self):
+        # the scatter multiplier is read at compile time
+        if int(os.getenv("SCATTER_MULTIPLIER", 2)) != self.bundle["scatter_multiplier"]:
+            return super().eval_resource()
+        return {key: list(value) for key, value in self.bundle["resources"].items()}
+
+
+def compile_service(cwl: dict, workflow_id: str, bundle_dir: str) -> str:
+    """
+    Compiles and writes the bundle of a service.
+
+    Args:
+        cwl (dict): The CWL document as loaded from YAML.
+        workflow_id (str): The CWL workflow id (the service identifier).
+        bundle_dir (str): The directory holding the bundles.
+
+    Returns:
+        str: The bundle path.
+    """
+    path = get_bundle_path(bundle_dir, workflow_id)
+    write_bundle(path, cwl, compile_bundle(CWLWorkflow(cwl, workflow_id)))
+    logger.info(f"bundle of {workflow_id} written to {path}")
+
+    return path
+
+
+def load_cwl_workflow(cwl: dict, workflow_id: str) -> CWLWorkflow:
+    """
+    Returns the CWLWorkflow of a service, from its bundle when ARGO_WF_BUNDLE_DIR
+    holds a bundle matching the CWL document.
+
+    Args:
+        cwl (dict): The CWL document as loaded from YAML.
+        workflow_id (str): The CWL workflow id (the service identifier).
+
+    Returns:
+        CWLWorkflow: The bundled or parsed CWL workflow.
+    """
+    if bundle_dir := os.environ.get("ARGO_WF_BUNDLE_DIR"):
+        path = get_bundle_path(bundle_dir, workflow_id)
+        try:
+            bundle = read_bundle(path, cwl)
+        except (OSError, ValueError, EOFError, struct.error) as exc:
+            logger.warning(f"cannot read the bundle {path}: {exc}")
+            bundle = None
+
+        if bundle is not None:
+            logger.info(f"using the bundle {path}")
+            return BundledCWLWorkflow(cwl, workflow_id, bundle)
+
+    return CWLWorkflow(cwl, workflow_id)
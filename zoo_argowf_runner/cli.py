@@ -0,0 +1,208 @@
+# Description: This file contains the zoo-argowf-runner command line interface.
+import json
+
+import click
+import yaml
+
+from zoo_argowf_runner.bundle import compile_service
+
+
+@click.group()
+def main():
+    """zoo-argowf-runner deployment tools"""
+
+
+@main.command("compile")
+@click.argument("cwl_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--workflow-id",
+    "workflow_ids",
+    required=True,
+    multiple=True,
+    help="CWL workflow id of the service, can be repeated",
+)
+@click.option(
+    "--bundle-dir",
+    envvar="ARGO_WF_BUNDLE_DIR",
+    required=True,
+    type=click.Path(file_okay=False),
+    help="Directory holding the bundles (defaults to ARGO_WF_BUNDLE_DIR)",
+)
+def compile_command(cwl_path, workflow_ids, bundle_dir):
+    """Compiles the service bundles of a CWL application package"""
+    with open(cwl_path) as stream:
+        cwl = yaml.safe_load(stream)
+
+    for workflow_id in workflow_ids:
+        click.echo(compile_service(cwl, workflow_id, bundle_dir))
+
+
+@main.command("prepull")
+@click.argument("cwl_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--workflow-id",
+    "workflow_ids",
+    required=True,
+    multiple=True,
+    help="CWL workflow id of the service, can be repeated",
+)
+@click.option("--namespace", default=None, help="Namespace of the DaemonSets")
+@click.option(
+    "--node-selector",
+    "node_selector",
+    multiple=True,
+    help="key=value label of the nodes pulling the images, can be repeated",
+)
+@click.option("--pause-image", default=None, help="Image of the idle container")
+def prepull_command(cwl_path, workflow_ids, namespace, node_selector, pause_image):
+    """Writes the DaemonSets pre-pulling the container images of the services
+
+    The pull containers idle in a shell loop, the images without a shell are pulled
+    but their containers fail to start.
+    """
+    from zoo_argowf_runner.bundle import load_cwl_workflow
+    from zoo_argowf_runner.prepull import PAUSE_IMAGE, get_prepull_daemonset
+    from zoo_argowf_runner.zoo_helpers import PodPlacement
+
+    with open(cwl_path) as stream:
+        cwl = yaml.safe_load(stream)
+
+    try:
+        selector = dict(label.split("=", 1) for label in node_selector)
+    except ValueError:
+        raise click.BadParameter("expected key=value", param_hint="--node-selector")
+
+    click.echo(
+        yaml.safe_dump_all(
+            [
+                get_prepull_daemonset(
+                    load_cwl_workflow(cwl, workflow_id),
+                    namespace=namespace,
+                    pod_placement=PodPlacement(node_selector=selector),
+                    pause_image=pause_image or PAUSE_IMAGE,
+                )
+                for workflow_id in workflow_ids
+            ],
+            sort_keys=False,
+        ),
+        nl=False,
+    )
+
+
+@main.command("reap")
+@click.option(
+    "--namespace",
+    default="",
+    help="Namespace of the workflows, all the namespaces readable with the token if not set",
+)
+@click.option(
+    "--mode",
+    type=click.Choice(["stop", "terminate"]),
+    default="terminate",
+    show_default=True,
+    help="stop runs the exit handlers of the workflows, terminate does not",
+)
+@click.option("--dry-run", is_flag=True, help="Only lists the orphan workflows")
+def reap_command(namespace, mode, dry_run):
+    """Cancels the workflows whose Zoo job ran on this host and is gone"""
+    from zoo_argowf_runner.endpoints import load_endpoints
+    from zoo_argowf_runner.reaper import reap_orphans
+
+    for endpoint in load_endpoints():
+        for name in reap_orphans(endpoint, namespace=namespace, mode=mode, dry_run=dry_run):
+            click.echo(f"{endpoint.name} {name}")
+
+
+@main.command("loadtest")
+@click.option("--jobs", default=10, show_default=True, help="Number of simulated Zoo jobs")
+@click.option("--concurrency", default=4, show_default=True, help="Number of concurrent jobs")
+@click.option(
+    "--cwl",
+    "cwl_path",
+    default="water_bodies_detection/app-package.cwl",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--params",
+    "parameters_path",
+    default="water_bodies_detection/param.json",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--workflow-id", default="water-bodies", show_default=True)
+@click.option(
+    "--endpoint",
+    envvar="ARGO_WF_ENDPOINT",
+    default=None,
+    help="Argo Workflows endpoint, an in-process fake argo-server is started if not set",
+)
+@click.option("--token", envvar="ARGO_WF_TOKEN", default="fake-token")
+@click.option("--namespace", default="ns1", show_default=True)
+@click.option(
+    "--monitor-interval", default=1.0, show_default=True, help="Status polling interval (s)"
+)
+@click.option(
+    "--monitor-policy",
+    type=click.Choice(["adaptive", "fixed"]),
+    default="adaptive",
+    show_default=True,
+    help="Status polling policy",
+)
+@click.option("--fake-latency", default=0.0, show_default=True, help="Fake argo-server latency (s)")
+@click.option(
+    "--fake-run-duration", default=5.0, show_default=True, help="Fake workflows duration (s)"
+)
+@click.option("--fake-nodes", default=4, show_default=True, help="Fake workflows pod nodes")
+@click.option("--output", type=click.File("w"), default="-", help="JSON report file")
+def loadtest_command(
+    jobs,
+    concurrency,
+    cwl_path,
+    parameters_path,
+    workflow_id,
+    endpoint,
+    token,
+    namespace,
+    monitor_interval,
+    monitor_policy,
+    fake_latency,
+    fake_run_duration,
+    fake_nodes,
+    output,
+):
+    """Runs concurrent simulated Zoo jobs and writes a JSON report"""
+    from zoo_argowf_runner.loadtest import run_loadtest
+
+    server = None
+    if endpoint is None:
+        from zoo_argowf_runner.testing import FakeArgoServer
+
+        server = FakeArgoServer(
+            latency=fake_latency, run_duration=fake_run_duration, nodes=fake_nodes
+        ).start()
+        endpoint = server.url
+
+    try:
+        report = run_loadtest(
+            jobs=jobs,
+            concurrency=concurrency,
+            cwl_path=cwl_path,
+            parameters_path=parameters_path,
+            workflow_id=workflow_id,
+            endpoint=endpoint,
+            token=token,
+            namespace=namespace,
+            monitor_interval=monitor_interval,
+            monitor_policy=monitor_policy,
+        )
+    finally:
+        if server is not None:
+            server.stop()
+
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,46 @@ import os
 from typing import Optional
 
 from hera.workflows.models import (
+    ArchiveStrategy,
+    Artifact,
+    ContinueOn,
+    EnvVar,
+    NoneStrategy,
+    Outputs,
     Parameter,
     Quantity,
     ResourceRequirements,
     ScriptTemplate,
     TemplateRef,
+    VolumeMount,
+    WorkflowStep,
 )
 
+from zoo_argowf_runner.manifest import (
+    EXIT_HANDLER_TEMPLATE,
+    PREPARE_IMAGE,
+    get_annotations,
+    get_entrypoint_outputs,
+    get_exit_handler,
+    get_gc_policy,
+    get_prepare_source,
+    placement_parameters,
+)
+from zoo_argowf_runner.notify import CALLBACK_URL_ENV, NOTIFY_SOURCE, NOTIFY_TEMPLATE
+from zoo_argowf_runner.outputs_bundle import (
+    CALRISSIAN_WDIR,
+    OUTPUTS_BUNDLE_PATH,
+    OUTPUTS_BUNDLE_TEMPLATE,
+    get_outputs_bundle_source,
+)
+from zoo_argowf_runner.stage_in_cache import CACHE_VOLUME, StageInCacheVolume
 from zoo_argowf_runner.template import WorkflowTemplates
-from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+from zoo_argowf_runner.timing import timed
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
 from zoo_argowf_runner.volume import VolumeTemplates
 
 
+@timed("workflow build")
 def cwl_to_argo(
     workflow: CWLWorkflow,
     entrypoint: str,
@@ -26,6 +54,12 @@ def cwl_to_argo(
     max_ram: Optional[str] = "4Gi",
     storage_class: Optional[str] = "standard",
     namespace: Optional[str] = "default",
+    pod_placement: Optional[PodPlacement] = None,
+    priority: Optional[int] = None,
+    active_deadline_seconds: Optional[int] = None,
+    labels: Optional[dict] = None,
+    notify_url: Optional[str] = None,
+    stage_in_cache: Optional[StageInCacheVolume] = None,
     **kwargs,
 ):
     """
@@ -41,37 +75,24 @@ def cwl_to_argo(
         max_ram (Optional[str]): Maximum memory allowed for the workflow.
         storage_class (Optional[str]): The storage class for volume claims.
         namespace (Optional[str]): Kubernetes namespace to run the workflow in.
+        pod_placement (Optional[PodPlacement]): Node selector, env vars, affinity,
+            tolerations and priority class for the workflow pods.
+        priority (Optional[int]): Workflow priority, also used to order the semaphore queue.
+        active_deadline_seconds (Optional[int]): Time after which Argo fails the running workflow.
+        labels (Optional[dict]): Workflow labels, e.g. to find the workflow of a Zoo job.
+        notify_url (Optional[str]): Callback URL the exit handler posts the workflow phase to.
+        stage_in_cache (Optional[StageInCacheVolume]): Shared stage-in cache claim mounted in the workflow.
+        timings (Optional[PhaseRecorder]): Records the build time in the 'workflow build' phase.
 
     Returns:
         dict: An Argo workflow specification generated from the CWL workflow.
     """
 
-    prepare_content = f"""
-import json
-
-content = json.loads(\"\"\"{workflow.raw_cwl}\"\"\".replace("'", '"'))
-
-inputs = "{{{{inputs.parameters.inputs}}}}"
-
-parameters = json.loads(inputs.replace("'", '"'))
-
-with open("/tmp/cwl_workflow.json", "w") as f:
-    json.dump(content, f)
-
-with open("/tmp/cwl_parameters.json", "w") as f:
-    json.dump(parameters.get("inputs"), f)
+    prepare_content = get_prepare_source(workflow)
 
-"""
+    annotations = get_annotations(workflow)
 
-    annotations = {
-        "workflows.argoproj.io/version": ">= v3.3.0",
-    }
-
-    annotations["workflows.argoproj.io/title"] = workflow.get_label()
-    annotations["workflows.argoproj.io/description"] = workflow.get_doc()
-    annotations["eoap.ogc.org/version"] = workflow.get_version()
-    annotations["eoap.ogc.org/title"] = workflow.get_label()
-    annotations["eoap.ogc.org/abstract"] = workflow.get_doc()
+    output_parameters, output_artifacts = get_entrypoint_outputs()
 
     vl_claim_t_list = [
         VolumeTemplates.create_volume_claim_template(
@@ -95,6 +116,15 @@ with open("/tmp/cwl_parameters.json", "w") as f:
     #    secret_volume(name="usersettings-vol", secretName="user-settings")
     # ]
 
+    persistent_vl_list = []
+
+    if stage_in_cache is not None:
+        persistent_vl_list.append(
+            VolumeTemplates.create_persistent_volume_claim(
+                name=CACHE_VOLUME, claim_name=stage_in_cache.claim_name
+            )
+        )
+
     workflow_sub_step = [
         WorkflowTemplates.create_workflow_step(
             name="prepare",
@@ -123,6 +153,14 @@ with open("/tmp/cwl_parameters.json", "w") as f:
                 Parameter(
                     name="cwl", value="{{ steps.prepare.outputs.parameters.workflow }}"
                 ),
+            ]
+            + [
+                Parameter(name=name, value=value)
+                for name, value in placement_parameters(pod_placement)
+            ]
+            + [
+                Parameter(name=name, value=value)
+                for name, value in (stage_in_cache.get_parameters() if stage_in_cache else [])
             ],
             continue_on={"error": "true"},
         ),
@@ -135,47 +173,17 @@ with open("/tmp/cwl_parameters.json", "w") as f:
             inputs_parameters=[{"name": key} for key in ["inputs"]],
             outputs_parameters=[
                 {
-                    "name": "results",
-                    "expression": "steps['argo-cwl'].outputs.parameters['results']",
-                },
-                {
-                    "name": "log",
-                    "expression": "steps['argo-cwl'].outputs.parameters['log']",
-                },
-                {
-                    "name": "usage-report",
-                    "expression": "steps['argo-cwl'].outputs.parameters['usage-report']",
-                },
-                {
-                    "name": "stac-catalog",
-                    "expression": "steps['argo-cwl'].outputs.parameters['stac-catalog']",
-                },
-                {
-                    "name": "feature-collection",
-                    "expression": "steps['argo-cwl'].outputs.parameters['feature-collection']",
-                },
-                {
-                    "name": "outcome",
-                    "expression": "steps['argo-cwl'].outputs.parameters['outcome']",
-                },
+                    "name": name,
+                    "expression": f"steps['argo-cwl'].outputs.parameters['{name}']",
+                }
+                for name in output_parameters
             ],
             outputs_artifacts=[
                 {
-                    "name": "tool-logs",
-                    "from_expression": "steps['argo-cwl'].outputs.artifacts['tool-logs']",
-                },
-                {
-                    "name": "calrissian-output",
-                    "from_expression": "steps['argo-cwl'].outputs.artifacts['calrissian-output']",
-                },
-                {
-                    "name": "calrissian-stderr",
-                    "from_expression": "steps['argo-cwl'].outputs.artifacts['calrissian-stderr']",
-                },
-                {
-                    "name": "calrissian-report",
-                    "from_expression": "steps['argo-cwl'].outputs.artifacts['calrissian-report']",
-                },
+                    "name": name,
+                    "from_expression": f"steps['argo-cwl'].outputs.artifacts['{name}']",
+                }
+                for name in output_artifacts
             ],
         ),
         WorkflowTemplates.create_template(
@@ -186,17 +194,74 @@ with open("/tmp/cwl_parameters.json", "w") as f:
                 {"name": "workflow", "path": "/tmp/cwl_workflow.json"},
             ],
             script=ScriptTemplate(
-                image="docker.io/library/python:3.9",
+                image=PREPARE_IMAGE,
                 resources=ResourceRequirements(
                     requests={"memory": Quantity(__root__="1Gi"), "cpu": int(1)}
                 ),
                 volume_mounts=[],
+                env=[
+                    EnvVar(name=name, value=str(value))
+                    for name, value in (pod_placement.env_vars or {}).items()
+                ]
+                if pod_placement and pod_placement.env_vars
+                else None,
                 command=["python"],
                 source=prepare_content,
             ),
         )
     ]
 
+    on_exit, exit_steps = get_exit_handler(notify_url)
+    if OUTPUTS_BUNDLE_TEMPLATE in exit_steps:
+        templates.append(
+            WorkflowTemplates.create_template(
+                name=OUTPUTS_BUNDLE_TEMPLATE,
+                outputs_artifacts=Outputs(
+                    artifacts=[
+                        Artifact(
+                            name=OUTPUTS_BUNDLE_TEMPLATE,
+                            path=OUTPUTS_BUNDLE_PATH,
+                            archive=ArchiveStrategy(none=NoneStrategy()),
+                        )
+                    ]
+                ),
+                script=ScriptTemplate(
+                    image=PREPARE_IMAGE,
+                    resources=ResourceRequirements(
+                        requests={"memory": Quantity(__root__="1Gi"), "cpu": int(1)}
+                    ),
+                    volume_mounts=[VolumeMount(name="calrissian-wdir", mount_path=CALRISSIAN_WDIR)],
+                    command=["python"],
+                    source=get_outputs_bundle_source(),
+                ),
+            )
+        )
+    if NOTIFY_TEMPLATE in exit_steps:
+        templates.append(
+            WorkflowTemplates.create_template(
+                name=NOTIFY_TEMPLATE,
+                script=ScriptTemplate(
+                    image=PREPARE_IMAGE,
+                    resources=ResourceRequirements(
+                        requests={"memory": Quantity(__root__="128Mi"), "cpu": Quantity(__root__="100m")}
+                    ),
+                    env=[EnvVar(name=CALLBACK_URL_ENV, value=notify_url)],
+                    command=["python"],
+                    source=NOTIFY_SOURCE,
+                ),
+            )
+        )
+    if on_exit == EXIT_HANDLER_TEMPLATE:
+        templates.append(
+            WorkflowTemplates.create_template(
+                name=EXIT_HANDLER_TEMPLATE,
+                sub_steps=[
+                    WorkflowStep(name=step, template=step, continue_on=ContinueOn(failed=True))
+                    for step in exit_steps
+                ],
+            )
+        )
+
     synchro = WorkflowTemplates.create_synchronization(
         sync_type="semaphore",
         config_map_ref_key="workflow",
@@ -212,6 +277,13 @@ with open("/tmp/cwl_parameters.json", "w") as f:
         volume_claim_template=vl_claim_t_list,
         secret_volume=secret_vl_list,
         config_map_volume=config_map_vl_list,
+        persistent_volume=persistent_vl_list,
         templates=templates,
         namespace=namespace,
+        pod_placement=pod_placement,
+        priority=priority,
+        active_deadline_seconds=active_deadline_seconds,
+        labels=labels,
+        gc_policy=get_gc_policy(),
+        on_exit=on_exit,
     )
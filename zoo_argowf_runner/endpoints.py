@@ -0,0 +1,226 @@
+# Description: This file contains the Argo Workflows endpoints and the selectors sharding the submissions across them.
+import bisect
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import attr
+from loguru import logger
+
+
+@attr.s
+class ArgoEndpoint:
+    url = attr.ib()
+    token = attr.ib(default=None)
+    name = attr.ib(default=None)
+
+    def __attrs_post_init__(self):
+        self.url = self.url.rstrip("/")
+        if self.name is None:
+            self.name = self.url
+
+    def get_headers(self) -> dict:
+        """returns the headers authenticating the requests to the endpoint"""
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+
+def load_endpoints() -> List[ArgoEndpoint]:
+    """
+    Returns the Argo Workflows endpoints configured with the environment.
+
+    ARGO_WF_ENDPOINTS is a JSON list of {"url": ..., "token": ..., "name": ...} objects,
+    when not set the single ARGO_WF_ENDPOINT and ARGO_WF_TOKEN endpoint is used.
+    """
+    if endpoints := os.environ.get("ARGO_WF_ENDPOINTS"):
+        return [ArgoEndpoint(**endpoint) for endpoint in json.loads(endpoints)]
+
+    token = os.environ.get("ARGO_WF_TOKEN", None)
+
+    if token is None:
+        raise ValueError("ARGO_WF_TOKEN environment variable is not set")
+
+    return [
+        ArgoEndpoint(
+            url=os.environ.get("ARGO_WF_ENDPOINT", "http://localhost:2746"),
+            token=token,
+        )
+    ]
+
+
+class EndpointSelector(ABC):
+    """
+    Picks the Argo Workflows endpoint a job is submitted to.
+
+    The selectors rank the endpoints for a namespace, the healthy endpoints come first
+    so that the submission fails over to the next endpoint when a cluster is unhealthy.
+    """
+
+    def __init__(self, endpoints: List[ArgoEndpoint], timeout: float = 5) -> None:
+        """
+        :param endpoints: List of Argo Workflows endpoints.
+        :param timeout: Timeout (in seconds) of the requests probing the endpoints.
+        """
+        if not endpoints:
+            raise ValueError("At least one Argo Workflows endpoint must be provided")
+
+        self.endpoints = endpoints
+        self.timeout = timeout
+
+    @abstractmethod
+    def rank(self, namespace: str, timings=None) -> List[ArgoEndpoint]:
+        """returns the endpoints in order of preference for the namespace"""
+
+    def is_healthy(self, endpoint: ArgoEndpoint, timings=None) -> bool:
+        """checks the argo-server of the endpoint answers"""
+        import requests
+
+        # argo_api imports the endpoints
+        from zoo_argowf_runner.argo_api import send_request
+
+        try:
+            response = send_request(
+                "get_version",
+                "GET",
+                f"{endpoint.url}/api/v1/version",
+                timings=timings,
+                headers=endpoint.get_headers(),
+                timeout=self.timeout,
+                verify=False,
+            )
+        except requests.exceptions.RequestException as exc:
+            logger.warning(f"Argo Workflows endpoint {endpoint.name} is unreachable: {exc}")
+            return False
+
+        if response.status_code != 200:
+            logger.warning(
+                f"Argo Workflows endpoint {endpoint.name} is unhealthy: {response.status_code}"
+            )
+            return False
+
+        return True
+
+    def candidates(self, namespace: str, timings=None) -> List[ArgoEndpoint]:
+        """returns the endpoints to try in order, healthy endpoints first"""
+        ranked = self.rank(namespace, timings)
+
+        if len(ranked) == 1:
+            return ranked
+
+        healthy = [endpoint for endpoint in ranked if self.is_healthy(endpoint, timings)]
+
+        return healthy + [endpoint for endpoint in ranked if endpoint not in healthy]
+
+    def select(self, namespace: str, timings=None) -> ArgoEndpoint:
+        """returns the preferred endpoint for the namespace"""
+        return self.candidates(namespace, timings)[0]
+
+
+class ConsistentHashSelector(EndpointSelector):
+    """Shards the namespaces across the endpoints with a consistent hash ring."""
+
+    replicas = 64
+
+    def __init__(self, endpoints: List[ArgoEndpoint], timeout: float = 5) -> None:
+        super().__init__(endpoints, timeout)
+
+        self.ring = sorted(
+            (self._hash(f"{endpoint.name}-{replica}"), index)
+            for index, endpoint in enumerate(self.endpoints)
+            for replica in range(self.replicas)
+        )
+        self.keys = [key for key, _ in self.ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.sha256(value.encode()).digest()[:8], "big")
+
+    def rank(self, namespace: str, timings=None) -> List[ArgoEndpoint]:
+        start = bisect.bisect(self.keys, self._hash(namespace))
+
+        ranked = []
+        for offset in range(len(self.ring)):
+            index = self.ring[(start + offset) % len(self.ring)][1]
+            if index not in ranked:
+                ranked.append(index)
+            if len(ranked) == len(self.endpoints):
+                break
+
+        return [self.endpoints[index] for index in ranked]
+
+
+class LeastInFlightSelector(EndpointSelector):
+    """Prefers the endpoint with the fewest workflows not completed in the namespace."""
+
+    def get_in_flight(self, endpoint: ArgoEndpoint, namespace: str, timings=None) -> Optional[int]:
+        """returns the number of workflows not completed, None if the endpoint cannot tell"""
+        import requests
+
+        from zoo_argowf_runner.argo_api import send_request
+
+        try:
+            response = send_request(
+                "count_in_flight_workflows",
+                "GET",
+                f"{endpoint.url}/api/v1/workflows/{namespace}",
+                params={
+                    "listOptions.labelSelector": "workflows.argoproj.io/completed!=true",
+                    "fields": "items.metadata.name",
+                },
+                timings=timings,
+                headers=endpoint.get_headers(),
+                timeout=self.timeout,
+                verify=False,
+            )
+        except requests.exceptions.RequestException:
+            return None
+
+        if response.status_code != 200:
+            return None
+
+        return len(response.json().get("items") or [])
+
+    def rank(self, namespace: str, timings=None) -> List[ArgoEndpoint]:
+        if len(self.endpoints) == 1:
+            return list(self.endpoints)
+
+        in_flight = {}
+        for endpoint in self.endpoints:
+            in_flight[endpoint.name] = self.get_in_flight(endpoint, namespace, timings)
+        logger.info(f"In-flight workflows per endpoint: {in_flight}")
+
+        return sorted(
+            self.endpoints,
+            key=lambda endpoint: (
+                in_flight[endpoint.name] is None,
+                in_flight[endpoint.name] or 0,
+            ),
+        )
+
+
+class HealthSelector(EndpointSelector):
+    """Uses the first healthy endpoint in the configured order."""
+
+    def rank(self, namespace: str, timings=None) -> List[ArgoEndpoint]:
+        return list(self.endpoints)
+
+
+SELECTORS = {
+    "hash": ConsistentHashSelector,
+    "least-in-flight": LeastInFlightSelector,
+    "health": HealthSelector,
+}
+
+
+def get_endpoint_selector() -> EndpointSelector:
+    """returns the endpoint selector configured with ARGO_WF_ENDPOINT_SELECTOR, defaults to 'hash'"""
+    strategy = os.environ.get("ARGO_WF_ENDPOINT_SELECTOR", "hash")
+
+    if strategy not in SELECTORS:
+        raise ValueError(f"Unsupported endpoint selector: {strategy}")
+
+    return SELECTORS[strategy](load_endpoints())
@@ -31,6 +31,30 @@ class ExecutionHandler(ABC):
     def get_pod_node_selector(self):
         pass
 
+    def get_pod_affinity(self):
+        # optional Kubernetes affinity (dict) for the workflow pods
+        return None
+
+    def get_pod_tolerations(self):
+        # optional list of Kubernetes tolerations (dicts) for the workflow pods
+        return None
+
+    def get_pod_priority_class(self):
+        # optional Kubernetes PriorityClass name for the workflow pods
+        return None
+
+    def get_user_tier(self):
+        # optional user tier (e.g. interactive, standard, batch) used for the workflow priority
+        return None
+
+    def get_workflow_priority(self, **kwargs):
+        # optional workflow priority overriding the computed one
+        return None
+
+    def get_workflow_deadline(self, **kwargs):
+        # optional activeDeadlineSeconds of the workflow overriding the one derived from the run history
+        return None
+
     @abstractmethod
     def handle_outputs(
         self, execution_log, output, usage_report, tool_logs=None, **kwargs
@@ -0,0 +1,220 @@
+# Description: This file contains the run history of the services, shared by the Zoo processes of a host,
+# used to estimate the duration of the next executions.
+import os
+import sqlite3
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from zoo_argowf_runner.progress import get_step_name
+
+
+def parse_time(value: str) -> datetime:
+    """parses an Argo Workflows RFC 3339 timestamp, with or without fractional seconds"""
+    for time_format in ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"]:
+        try:
+            return datetime.strptime(value, time_format).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"Unsupported timestamp: {value}")
+
+
+class RunHistory:
+    """
+    Durations of the past workflows per service, in a SQLite database shared by the Zoo processes.
+
+    The history is a hint: errors reading or writing the database are logged and never fail an execution.
+    """
+
+    def __init__(
+        self, db_path: str, window: int = 20, max_runs: int = 500, max_age: Optional[float] = None
+    ) -> None:
+        """
+        Initialize the run history.
+
+        :param db_path: Path to the SQLite database shared by the Zoo processes.
+        :param window: Number of recent successful runs the expected duration is computed on.
+        :param max_runs: Number of recent runs (and their steps) kept per service.
+        :param max_age: Time (in seconds) the runs are kept, without limit if None.
+        """
+        self.db_path = db_path
+        self.window = window
+        self.max_runs = max(max_runs, window)
+        self.max_age = max_age
+
+        with self._connect() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    service TEXT NOT NULL,
+                    namespace TEXT NOT NULL,
+                    workflow_name TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    finished REAL NOT NULL
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS runs_service ON runs (service, phase, id)")
+            db.execute("CREATE INDEX IF NOT EXISTS runs_finished ON runs (service, finished)")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS steps (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    service TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    run_id INTEGER
+                )
+                """
+            )
+            # the databases created before the retention have no run_id column
+            columns = [row[1] for row in db.execute("PRAGMA table_info(steps)")]
+            if "run_id" not in columns:
+                db.execute("ALTER TABLE steps ADD COLUMN run_id INTEGER")
+            db.execute("CREATE INDEX IF NOT EXISTS steps_service ON steps (service, id)")
+            db.execute("CREATE INDEX IF NOT EXISTS steps_run ON steps (service, run_id)")
+
+    @classmethod
+    def from_env(cls) -> Optional["RunHistory"]:
+        """
+        returns the run history configured with ARGO_WF_HISTORY_DB (and the retention ARGO_WF_HISTORY_MAX_RUNS
+        and ARGO_WF_HISTORY_MAX_AGE), None if disabled
+        """
+        db_path = os.environ.get("ARGO_WF_HISTORY_DB")
+
+        if not db_path:
+            return None
+
+        max_age = os.environ.get("ARGO_WF_HISTORY_MAX_AGE")
+        try:
+            return cls(
+                db_path=db_path,
+                max_runs=int(os.environ.get("ARGO_WF_HISTORY_MAX_RUNS", 500)),
+                max_age=float(max_age) if max_age else None,
+            )
+        except sqlite3.Error as exc:
+            logger.warning(f"Cannot open the run history {db_path}: {exc}")
+            return None
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record(
+        self,
+        service: str,
+        namespace: str,
+        workflow_name: str,
+        phase: str,
+        duration: float,
+        step_durations: Optional[List[Tuple[str, float]]] = None,
+    ) -> None:
+        """records the duration (in seconds) of a completed workflow and of its successful steps"""
+        try:
+            with self._connect() as db:
+                run_id = db.execute(
+                    "INSERT INTO runs (service, namespace, workflow_name, phase, duration, finished) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (service, namespace, workflow_name, phase, duration, time.time()),
+                ).lastrowid
+                db.executemany(
+                    "INSERT INTO steps (service, step, duration, run_id) VALUES (?, ?, ?, ?)",
+                    [(service, step, step_duration, run_id) for step, step_duration in step_durations or []],
+                )
+                self._prune(db, service)
+        except sqlite3.Error as exc:
+            logger.warning(f"Cannot record the run of {workflow_name}: {exc}")
+
+    def _prune(self, db, service: str) -> None:
+        """removes the runs (and steps) of a service beyond the max_runs recent ones or older than max_age"""
+        cutoff = db.execute(
+            "SELECT id FROM runs WHERE service = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (service, self.max_runs - 1),
+        ).fetchone()
+        if cutoff is not None:
+            db.execute("DELETE FROM runs WHERE service = ? AND id < ?", (service, cutoff[0]))
+        if self.max_age is not None:
+            db.execute(
+                "DELETE FROM runs WHERE service = ? AND finished < ?", (service, time.time() - self.max_age)
+            )
+
+        # the steps recorded before the retention have no run
+        db.execute(
+            "DELETE FROM steps WHERE service = ? AND (run_id IS NULL OR run_id < "
+            "(SELECT MIN(id) FROM runs WHERE service = ?))",
+            (service, service),
+        )
+
+    def record_workflow(self, service: str, workflow_status: dict) -> None:
+        """records a completed workflow from its Argo Workflows status"""
+        metadata = workflow_status.get("metadata", {})
+        status = workflow_status.get("status", {})
+
+        if not status.get("startedAt") or not status.get("finishedAt"):
+            return
+
+        def get_duration(item: dict) -> float:
+            return (parse_time(item["finishedAt"]) - parse_time(item["startedAt"])).total_seconds()
+
+        self.record(
+            service=service,
+            namespace=metadata.get("namespace", ""),
+            workflow_name=metadata.get("name", ""),
+            phase=status.get("phase", "Unknown"),
+            duration=get_duration(status),
+            step_durations=[
+                (get_step_name(node), get_duration(node))
+                for node in status.get("nodes", {}).values()
+                if node.get("type") == "Pod"
+                and node.get("phase") == "Succeeded"
+                and node.get("startedAt")
+                and node.get("finishedAt")
+            ],
+        )
+
+    def expected_duration(self, service: str) -> Optional[float]:
+        """returns the median duration (in seconds) of the recent successful runs of the service"""
+        try:
+            with self._connect() as db:
+                durations = [
+                    row[0]
+                    for row in db.execute(
+                        "SELECT duration FROM runs WHERE service = ? AND phase = 'Succeeded' "
+                        "ORDER BY id DESC LIMIT ?",
+                        (service, self.window),
+                    )
+                ]
+        except sqlite3.Error as exc:
+            logger.warning(f"Cannot read the run history of {service}: {exc}")
+            return None
+
+        return statistics.median(durations) if durations else None
+
+    def get_step_durations(self, service: str) -> Dict[str, float]:
+        """returns the median duration (in seconds) per step in the recent runs of the service"""
+        try:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT step, duration FROM steps WHERE service = ? ORDER BY id DESC LIMIT ?",
+                    (service, self.window * 100),
+                ).fetchall()
+        except sqlite3.Error as exc:
+            logger.warning(f"Cannot read the run history of {service}: {exc}")
+            return {}
+
+        durations = {}
+        for step, duration in rows:
+            durations.setdefault(step, []).append(duration)
+
+        return {step: statistics.median(values) for step, values in durations.items()}
@@ -0,0 +1,131 @@
+# Description: This file contains the deduplication of the submissions: the idempotency keys naming the
+# workflow of a Zoo job, and the single-flight lock attaching concurrent identical jobs to one workflow.
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+
+from loguru import logger
+
+from zoo_argowf_runner.argo_api import send_request
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+from zoo_argowf_runner.reaper import LABEL_PREFIX
+
+IDEMPOTENCY_KEY_LABEL = f"{LABEL_PREFIX}/idempotency-key"
+INPUTS_HASH_LABEL = f"{LABEL_PREFIX}/inputs-hash"
+
+DEDUPLICATION_MODES = ["off", "idempotent", "single-flight"]
+
+# characters of the hashes kept in the labels and the workflow names
+KEY_LENGTH = 32
+NAME_KEY_LENGTH = 16
+
+
+def get_deduplication_mode() -> str:
+    """
+    Returns how the submissions are deduplicated, configured with ARGO_WF_DEDUPLICATION.
+
+    'off' (the default): every execution submits a new workflow.
+    'idempotent': the workflow of a Zoo job is named after the job id and the inputs, a retried
+    job (or submission) gets the workflow already created instead of a new one.
+    'single-flight': as 'idempotent', plus the jobs with the same inputs in the same namespace
+    attach to the workflow of the job already running instead of submitting their own.
+    """
+    mode = os.environ.get("ARGO_WF_DEDUPLICATION", "off")
+
+    if mode not in DEDUPLICATION_MODES:
+        raise ValueError(f"Unsupported ARGO_WF_DEDUPLICATION: {mode}")
+    return mode
+
+
+def canonical_hash(value) -> str:
+    """returns the hex sha256 of the canonical JSON form (sorted keys, no whitespace) of a value"""
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+    ).hexdigest()
+
+
+def get_inputs_hash(service: str, processing_parameters: dict) -> str:
+    """returns the key of the jobs of a service with the same inputs"""
+    return canonical_hash({"service": service, "inputs": processing_parameters})[:KEY_LENGTH]
+
+
+def get_idempotency_key(service: str, usid: str, processing_parameters: dict) -> str:
+    """returns the key of a Zoo job: the same job retried with the same inputs gets the same key"""
+    return canonical_hash(
+        {"service": service, "usid": usid, "inputs": processing_parameters}
+    )[:KEY_LENGTH]
+
+
+def get_idempotent_workflow_name(service: str, idempotency_key: str) -> str:
+    """returns the workflow name of an idempotency key, 43 characters at most like the random names"""
+    suffix = idempotency_key[:NAME_KEY_LENGTH]
+    prefix = str(service).replace("_", "-")[: 43 - len(suffix) - 1].rstrip("-")
+    return f"{prefix}-{suffix}"
+
+
+@contextmanager
+def single_flight_lock(key: str, lock_dir: Optional[str] = None):
+    """
+    Holds an exclusive lock shared by the processes of the host for a key.
+
+    The lock is held while a process looks for the in-flight workflow of the key and submits
+    its own, the other processes with the same key then find it.
+
+    :param key: The key (e.g. an inputs hash).
+    :param lock_dir: Directory of the lock files, defaults to ARGO_WF_LOCK_DIR.
+    """
+    lock_dir = lock_dir or os.environ.get(
+        "ARGO_WF_LOCK_DIR", os.path.join(tempfile.gettempdir(), "zoo-argowf-runner-locks")
+    )
+    os.makedirs(lock_dir, exist_ok=True)
+
+    with open(os.path.join(lock_dir, f"{key}.lock"), "a") as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(stream, fcntl.LOCK_UN)
+
+
+def find_in_flight(endpoint: ArgoEndpoint, namespace: str, inputs_hash: str, timings=None) -> Optional[str]:
+    """
+    Returns the oldest workflow not completed of the jobs with an inputs hash.
+
+    Args:
+        endpoint (ArgoEndpoint): The Argo Workflows endpoint.
+        namespace (str): The namespace of the workflows.
+        inputs_hash (str): The inputs hash of the job.
+        timings (Optional[PhaseRecorder]): Recorder counting the API call.
+
+    Returns:
+        Optional[str]: The name of the workflow, None if there is none.
+    """
+    response = send_request(
+        "list_workflows",
+        "GET",
+        f"{endpoint.url}/api/v1/workflows/{namespace}",
+        timings=timings,
+        params={
+            "listOptions.labelSelector": f"{INPUTS_HASH_LABEL}={inputs_hash},"
+            "workflows.argoproj.io/completed!=true",
+            "fields": "items.metadata",
+        },
+        headers=endpoint.get_headers(),
+        timeout=30,
+        verify=False,
+    )
+    response.raise_for_status()
+
+    items = sorted(
+        (item["metadata"] for item in response.json().get("items") or []),
+        key=lambda metadata: metadata.get("creationTimestamp", ""),
+    )
+    if not items:
+        return None
+
+    logger.info(f"workflow {items[0]['name']} runs the same inputs")
+    return items[0]["name"]
@@ -0,0 +1,101 @@
+# Description: This file contains the journal of the executions: one small file per Zoo job recording its
+# workflow, so that a restarted runner reattaches to the workflow instead of submitting it again.
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from loguru import logger
+
+from zoo_argowf_runner.reaper import label_value
+
+JOURNAL_VERSION = 1
+
+# outputs larger than this (e.g. the logs) are not journaled, they are retrieved again
+MAX_JOURNALED_OUTPUT = 64 * 1024
+
+# seconds after its last update an entry of a dead job stops protecting its workflow from the reaper
+DEFAULT_TTL = 3600
+
+
+class ExecutionJournal:
+    """
+    Journal of the executions in a local directory, one JSON file per Zoo job (usid).
+
+    The files are replaced atomically: a reader sees the previous or the new entry, never a
+    partial one, even if the process is killed while writing.
+    """
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL) -> None:
+        """
+        :param directory: Directory of the journal files, on durable storage.
+        :param ttl: Seconds after its last update an entry is stale, see is_fresh.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["ExecutionJournal"]:
+        """returns the journal in ARGO_WF_JOURNAL_DIR with the ttl ARGO_WF_JOURNAL_TTL, None if not set"""
+        directory = os.environ.get("ARGO_WF_JOURNAL_DIR")
+        if not directory:
+            return None
+        return cls(directory, ttl=float(os.environ.get("ARGO_WF_JOURNAL_TTL", DEFAULT_TTL)))
+
+    def get_path(self, usid: str) -> str:
+        return os.path.join(self.directory, f"{label_value(usid)}.json")
+
+    def write(self, usid: str, entry: dict) -> None:
+        """
+        Writes the entry of a job atomically: to a temporary file synced to disk, then renamed.
+
+        :param usid: The Zoo job id.
+        :param entry: The entry, JSON serializable.
+        """
+        entry = {**entry, "version": JOURNAL_VERSION, "usid": usid, "updated_at": time.time()}
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".journal-", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w") as stream:
+                json.dump(entry, stream)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.replace(temporary_path, self.get_path(usid))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        # the rename is durable once the directory is synced
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def read(self, usid: str) -> Optional[dict]:
+        """returns the entry of a job, None if there is none or it cannot be read"""
+        try:
+            with open(self.get_path(usid)) as stream:
+                entry = json.load(stream)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Failed to read the journal of {usid}: {exc}")
+            return None
+
+        if entry.get("version") != JOURNAL_VERSION:
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        """returns whether an entry was updated within the ttl, a job not restarted since is given up"""
+        return time.time() - entry.get("updated_at", 0) <= self.ttl
+
+    def remove(self, usid: str) -> None:
+        """removes the entry of a job once its outputs are delivered"""
+        try:
+            os.unlink(self.get_path(usid))
+        except FileNotFoundError:
+            pass
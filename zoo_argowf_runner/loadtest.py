@@ -0,0 +1,301 @@
+# Description: This file contains the load generator simulating concurrent Zoo jobs running ZooArgoWorkflowsRunner.execute
+# against an Argo Workflows endpoint (or the in-process fake argo-server) and reporting per-job latencies.
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import List, Optional
+
+import yaml
+from loguru import logger
+
+from zoo_argowf_runner.__about__ import __version__
+from zoo_argowf_runner.handlers import ExecutionHandler
+from zoo_argowf_runner.history import parse_time
+from zoo_argowf_runner.runner import ZooArgoWorkflowsRunner, zoo
+
+TERMINAL_PHASES = ["Succeeded", "Failed", "Error"]
+
+# per-job metrics summarized in the report
+METRICS = ["submit_latency", "time_to_running", "completion_lag", "api_calls", "duration"]
+
+
+class LoadTestExecutionHandler(ExecutionHandler):
+    """Execution handler of the simulated jobs: no hooks, secrets or pod settings."""
+
+    def pre_execution_hook(self, **kwargs):
+        pass
+
+    def post_execution_hook(self, **kwargs):
+        pass
+
+    def get_secrets(self):
+        pass
+
+    def get_pod_env_vars(self):
+        return None
+
+    def get_pod_node_selector(self):
+        return None
+
+    def handle_outputs(self, log, output, usage_report, tool_logs=None, **kwargs):
+        pass
+
+    def get_additional_parameters(self):
+        return {}
+
+
+class JobProbe:
+    """Records the submission, the phases observed by the runner and the API calls of a job."""
+
+    def __init__(self) -> None:
+        self.api_calls = 0
+        self.submitted = None
+        self.submit_latency = None
+        self.running = None
+        self.terminal = None
+        self.finished_at = None
+
+    def observe(self, get_workflow_status):
+        """wraps Execution.get_workflow_status to record when the phases are seen"""
+
+        def wrapper(**kwargs):
+            result = get_workflow_status(**kwargs)
+            if result:
+                status, workflow = result
+                now = time.time()
+                if status == "Running" and self.running is None:
+                    self.running = now
+                if status in TERMINAL_PHASES and self.terminal is None:
+                    self.terminal = now
+                    if finished_at := workflow.get("status", {}).get("finishedAt"):
+                        self.finished_at = parse_time(finished_at).timestamp()
+            return result
+
+        return wrapper
+
+    @contextmanager
+    def count_api_calls(self):
+        """counts the HTTP requests sent while the context is active"""
+        import requests
+
+        request = requests.Session.request
+
+        def counting_request(session, *args, **kwargs):
+            self.api_calls += 1
+            return request(session, *args, **kwargs)
+
+        requests.Session.request = counting_request
+        try:
+            yield
+        finally:
+            requests.Session.request = request
+
+    def get_metrics(self) -> dict:
+        """returns the job metrics in seconds, None when the event was not observed"""
+        return {
+            "submit_latency": self.submit_latency,
+            "time_to_running": (
+                self.running - self.submitted
+                if self.running is not None and self.submitted is not None
+                else None
+            ),
+            "completion_lag": (
+                self.terminal - self.finished_at
+                if self.terminal is not None and self.finished_at is not None
+                else None
+            ),
+            "api_calls": self.api_calls,
+        }
+
+
+class ProbedRunner(ZooArgoWorkflowsRunner):
+    """ZooArgoWorkflowsRunner recording the job metrics with a JobProbe."""
+
+    def __init__(self, *args, probe: JobProbe, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.probe = probe
+
+    def submit(self, endpoints, **kwargs):
+        self.execution.get_workflow_status = self.probe.observe(
+            self.execution.get_workflow_status
+        )
+        start = time.time()
+        endpoint = super().submit(endpoints, **kwargs)
+        self.probe.submitted = time.time()
+        self.probe.submit_latency = self.probe.submitted - start
+        return endpoint
+
+
+def get_zoo_inputs(parameters: dict) -> dict:
+    """returns the Zoo inputs of a job out of the CWL parameters"""
+    return {key: {"value": value} for key, value in parameters.items()}
+
+
+def run_job(index: int, cwl: dict, parameters: dict, workflow_id: str, namespace: str) -> dict:
+    """
+    Runs a simulated Zoo job in the current process.
+
+    Args:
+        index (int): The job index.
+        cwl (dict): The CWL document.
+        parameters (dict): The CWL parameters.
+        workflow_id (str): The CWL workflow id.
+        namespace (str): The namespace (Zoo user) of the job.
+
+    Returns:
+        dict: The job metrics.
+    """
+    conf = {
+        "lenv": {"message": "", "Identifier": workflow_id, "usid": str(uuid.uuid4())},
+        "tmpPath": tempfile.gettempdir(),
+        "main": {"tmpUrl": "http://localhost/logs/"},
+        "auth_env": {"user": namespace},
+    }
+
+    probe = JobProbe()
+    start = time.time()
+    exit_value = None
+    error = None
+    runner = None
+
+    # the tool logs are written in the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, probe.count_api_calls():
+        os.chdir(workdir)
+        try:
+            runner = ProbedRunner(
+                cwl=cwl,
+                conf=conf,
+                inputs=get_zoo_inputs(parameters),
+                outputs={"Result": {"value": ""}},
+                execution_handler=LoadTestExecutionHandler(conf=conf),
+                probe=probe,
+            )
+            exit_value = runner.execute()
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "job": index,
+        "exit_value": exit_value,
+        "error": error,
+        "duration": time.time() - start,
+        **probe.get_metrics(),
+        "phases": runner.timings.as_dict()["phases"] if runner is not None else None,
+    }
+
+
+def _init_job_process(env: dict) -> None:
+    os.environ.update(env)
+    # keep the job logs and the Zoo status updates out of the report
+    logger.remove()
+    sys.stdout = open(os.devnull, "w")
+
+
+def summarize(values: List[float]) -> Optional[dict]:
+    """returns the min, p50, p99, mean and max of the values"""
+    if not values:
+        return None
+    percentiles = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return {
+        "min": min(values),
+        "p50": statistics.median(values),
+        "p99": percentiles[98],
+        "mean": statistics.mean(values),
+        "max": max(values),
+    }
+
+
+def run_loadtest(
+    jobs: int,
+    concurrency: int,
+    cwl_path: str,
+    parameters_path: str,
+    workflow_id: str,
+    endpoint: str,
+    token: str,
+    namespace: str = "ns1",
+    monitor_interval: float = 1.0,
+    monitor_policy: str = "adaptive",
+    env: Optional[dict] = None,
+) -> dict:
+    """
+    Runs jobs simulated Zoo jobs, concurrency at a time, each in its own process.
+
+    Args:
+        jobs (int): The number of jobs.
+        concurrency (int): The number of concurrent jobs.
+        cwl_path (str): The path of the CWL document.
+        parameters_path (str): The path of the CWL parameters (JSON or YAML).
+        workflow_id (str): The CWL workflow id.
+        endpoint (str): The Argo Workflows endpoint.
+        token (str): The Argo Workflows token.
+        namespace (str): The namespace (Zoo user) of the jobs.
+        monitor_interval (float): The runner status polling interval (seconds).
+        monitor_policy (str): The runner status polling policy, 'adaptive' or 'fixed'.
+        env (Optional[dict]): Additional environment variables of the jobs.
+
+    Returns:
+        dict: The report with the per-job metrics and their summary.
+    """
+    with open(cwl_path) as stream:
+        cwl = yaml.safe_load(stream)
+    with open(parameters_path) as stream:
+        parameters = yaml.safe_load(stream)
+
+    job_env = {
+        "ARGO_WF_ENDPOINT": endpoint,
+        "ARGO_WF_TOKEN": token,
+        "ARGO_WF_MONITOR_INTERVAL": str(monitor_interval),
+        "ARGO_WF_MONITOR_POLICY": monitor_policy,
+        **(env or {}),
+    }
+
+    start = time.time()
+    with ProcessPoolExecutor(
+        max_workers=concurrency,
+        mp_context=get_context("spawn"),
+        initializer=_init_job_process,
+        initargs=(job_env,),
+    ) as executor:
+        results = list(
+            executor.map(
+                run_job,
+                range(jobs),
+                [cwl] * jobs,
+                [parameters] * jobs,
+                [workflow_id] * jobs,
+                [namespace] * jobs,
+            )
+        )
+    wall_time = time.time() - start
+
+    return {
+        "version": __version__,
+        "endpoint": endpoint,
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "monitor_interval": monitor_interval,
+        "monitor_policy": monitor_policy,
+        "wall_time": wall_time,
+        "throughput": jobs / wall_time,
+        "succeeded": sum(
+            1 for result in results if result["exit_value"] == zoo.SERVICE_SUCCEEDED
+        ),
+        "errors": sum(1 for result in results if result["error"]),
+        "summary": {
+            metric: summarize(
+                [result[metric] for result in results if result[metric] is not None]
+            )
+            for metric in METRICS
+        },
+        "results": results,
+    }
@@ -0,0 +1,656 @@
+# Description: This file contains the fast Argo Workflow manifest builder: it emits the same manifest as
+# cwl_to_argo as plain dicts from a per-service skeleton, without building the Hera/pydantic models.
+from __future__ import annotations
+import json
+import os
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+from zoo_argowf_runner.notify import CALLBACK_URL_ENV, NOTIFY_SOURCE, NOTIFY_TEMPLATE
+from zoo_argowf_runner.outputs_bundle import (
+    CALRISSIAN_WDIR,
+    OUTPUTS_BUNDLE_PATH,
+    OUTPUTS_BUNDLE_TEMPLATE,
+    get_outputs_bundle_source,
+)
+from zoo_argowf_runner.stage_in_cache import CACHE_VOLUME, StageInCacheVolume
+from zoo_argowf_runner.timing import timed
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+# outputs of the entrypoint template, read from the argo-cwl step
+ENTRYPOINT_OUTPUT_PARAMETERS = [
+    "results",
+    "log",
+    "usage-report",
+    "stac-catalog",
+    "feature-collection",
+    "outcome",
+]
+
+ENTRYPOINT_OUTPUT_ARTIFACTS = [
+    "tool-logs",
+    "calrissian-output",
+    "calrissian-stderr",
+    "calrissian-report",
+]
+
+# large outputs delivered as compressed artifacts instead of parameters, see get_outputs_mode
+ARTIFACT_OUTPUTS = ["log", "usage-report", "feature-collection"]
+
+OUTPUTS_MODES = ["parameters", "artifacts", "bundle"]
+
+PREPARE_IMAGE = "docker.io/library/python:3.9"
+
+# exit handler template running the outputs bundle and the completion notification one after the other
+EXIT_HANDLER_TEMPLATE = "exit-handler"
+
+# keys of the Kubernetes objects holding free-form dicts (kept in insertion order)
+FREE_FORM_KEYS = ["matchLabels", "nodeSelector"]
+
+_skeletons = weakref.WeakKeyDictionary()
+
+
+def get_prepare_source(workflow: CWLWorkflow) -> str:
+    """
+    Returns the source of the script writing the CWL document and its parameters.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow.
+
+    Returns:
+        str: The Python script source.
+    """
+    return f"""
+import json
+
+content = json.loads(\"\"\"{workflow.raw_cwl}\"\"\".replace("'", '"'))
+
+inputs = "{{{{inputs.parameters.inputs}}}}"
+
+parameters = json.loads(inputs.replace("'", '"'))
+
+with open("/tmp/cwl_workflow.json", "w") as f:
+    json.dump(content, f)
+
+with open("/tmp/cwl_parameters.json", "w") as f:
+    json.dump(parameters.get("inputs"), f)
+
+"""
+
+
+def get_annotations(workflow: CWLWorkflow) -> Dict[str, str]:
+    """
+    Returns the Workflow annotations describing the application package.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow.
+
+    Returns:
+        Dict[str, str]: The annotations.
+    """
+    return {
+        "workflows.argoproj.io/version": ">= v3.3.0",
+        "workflows.argoproj.io/title": workflow.get_label(),
+        "workflows.argoproj.io/description": workflow.get_doc(),
+        "eoap.ogc.org/version": workflow.get_version(),
+        "eoap.ogc.org/title": workflow.get_label(),
+        "eoap.ogc.org/abstract": workflow.get_doc(),
+    }
+
+
+def placement_parameters(pod_placement: Optional[PodPlacement]) -> list:
+    """
+    Returns the argo-cwl-runner parameters carrying the pod placement hints.
+
+    Only the hints that are set are passed so that WorkflowTemplates not
+    declaring these inputs keep working.
+
+    Args:
+        pod_placement (Optional[PodPlacement]): The pod placement hints.
+
+    Returns:
+        list: List of (name, value) tuples, values are JSON encoded.
+    """
+    if pod_placement is None:
+        return []
+
+    parameters = []
+
+    for name, value in [
+        ("pod_env_vars", pod_placement.env_vars),
+        ("pod_node_selector", pod_placement.node_selector),
+        ("pod_affinity", pod_placement.affinity),
+        ("pod_tolerations", pod_placement.tolerations),
+    ]:
+        if value:
+            parameters.append((name, json.dumps(value)))
+
+    if pod_placement.priority_class:
+        parameters.append(("pod_priority_class", pod_placement.priority_class))
+
+    return parameters
+
+
+def get_gc_policy() -> Dict[str, dict]:
+    """
+    Returns the garbage collection policies of the workflows configured with the environment.
+
+    ARGO_WF_TTL_AFTER_COMPLETION, ARGO_WF_TTL_AFTER_SUCCESS and ARGO_WF_TTL_AFTER_FAILURE set
+    the ttlStrategy (seconds), ARGO_WF_POD_GC and ARGO_WF_VOLUME_CLAIM_GC the podGC and
+    volumeClaimGC strategies.
+
+    Returns:
+        Dict[str, dict]: The ttlStrategy, podGC and volumeClaimGC manifests that are set.
+    """
+    policy = {}
+
+    ttl_strategy = {
+        key: int(os.environ[name])
+        for key, name in [
+            ("secondsAfterCompletion", "ARGO_WF_TTL_AFTER_COMPLETION"),
+            ("secondsAfterFailure", "ARGO_WF_TTL_AFTER_FAILURE"),
+            ("secondsAfterSuccess", "ARGO_WF_TTL_AFTER_SUCCESS"),
+        ]
+        if os.environ.get(name)
+    }
+    if ttl_strategy:
+        policy["ttlStrategy"] = ttl_strategy
+
+    if pod_gc := os.environ.get("ARGO_WF_POD_GC"):
+        policy["podGC"] = {"strategy": pod_gc}
+
+    if volume_claim_gc := os.environ.get("ARGO_WF_VOLUME_CLAIM_GC"):
+        policy["volumeClaimGC"] = {"strategy": volume_claim_gc}
+
+    return policy
+
+
+def get_outputs_mode() -> str:
+    """
+    Returns how the workflow outputs are delivered, configured with ARGO_WF_OUTPUTS.
+
+    'parameters' (the default): output parameters of the entrypoint template.
+    'artifacts': the large outputs (ARTIFACT_OUTPUTS) are compressed artifacts of the runner template.
+    'bundle': as 'artifacts', plus an outputs bundle written by the exit handler of the workflow
+    with the outcome, the outputs, the usage report and the logs (see outputs_bundle).
+    """
+    mode = os.environ.get("ARGO_WF_OUTPUTS", "parameters")
+
+    if mode not in OUTPUTS_MODES:
+        raise ValueError(f"Unsupported ARGO_WF_OUTPUTS: {mode}")
+    return mode
+
+
+def get_entrypoint_outputs() -> Tuple[List[str], List[str]]:
+    """
+    Returns the output parameters and artifacts of the entrypoint template.
+
+    Unless the outputs are delivered as parameters, the large outputs (ARTIFACT_OUTPUTS) are
+    read from the artifacts of the runner template: they are stored compressed in the artifact
+    repository instead of the workflow status, only the small scalars (e.g. outcome) remain parameters.
+
+    Returns:
+        Tuple[List[str], List[str]]: The names of the output parameters and artifacts.
+    """
+    if get_outputs_mode() == "parameters":
+        return ENTRYPOINT_OUTPUT_PARAMETERS, ENTRYPOINT_OUTPUT_ARTIFACTS
+
+    return (
+        [name for name in ENTRYPOINT_OUTPUT_PARAMETERS if name not in ARTIFACT_OUTPUTS],
+        ENTRYPOINT_OUTPUT_ARTIFACTS + ARTIFACT_OUTPUTS,
+    )
+
+
+def get_outputs_bundle_template() -> dict:
+    """returns the manifest of the exit handler template writing the outputs bundle"""
+    return {
+        "name": OUTPUTS_BUNDLE_TEMPLATE,
+        "outputs": {
+            "artifacts": [
+                {"archive": {"none": {}}, "name": OUTPUTS_BUNDLE_TEMPLATE, "path": OUTPUTS_BUNDLE_PATH}
+            ]
+        },
+        "script": {
+            "command": ["python"],
+            "image": PREPARE_IMAGE,
+            "resources": {"requests": {"memory": "1Gi", "cpu": "1"}},
+            "source": get_outputs_bundle_source(),
+            "volumeMounts": [{"mountPath": CALRISSIAN_WDIR, "name": "calrissian-wdir"}],
+        },
+    }
+
+
+def get_notify_template(notify_url: str) -> dict:
+    """returns the manifest of the exit handler template posting the workflow phase to the runner"""
+    return {
+        "name": NOTIFY_TEMPLATE,
+        "script": {
+            "command": ["python"],
+            "env": [{"name": CALLBACK_URL_ENV, "value": notify_url}],
+            "image": PREPARE_IMAGE,
+            "resources": {"requests": {"memory": "128Mi", "cpu": "100m"}},
+            "source": NOTIFY_SOURCE,
+        },
+    }
+
+
+def get_exit_handler(notify_url: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Returns the exit handler of the workflow and the templates it runs, in order.
+
+    The outputs bundle (ARGO_WF_OUTPUTS=bundle) is written before the runner is notified
+    at notify_url, both run in an EXIT_HANDLER_TEMPLATE steps template.
+
+    Args:
+        notify_url (Optional[str]): Callback URL of the runner, not notified if None.
+
+    Returns:
+        Tuple[Optional[str], List[str]]: The onExit template, None without exit handler, and the templates.
+    """
+    steps = []
+    if get_outputs_mode() == "bundle":
+        steps.append(OUTPUTS_BUNDLE_TEMPLATE)
+    if notify_url:
+        steps.append(NOTIFY_TEMPLATE)
+
+    if len(steps) > 1:
+        return EXIT_HANDLER_TEMPLATE, steps
+    return (steps[0] if steps else None), steps
+
+
+def get_exit_handler_template(steps: List[str]) -> dict:
+    """returns the manifest of the steps template of the exit handler, a failed step does not stop the next ones"""
+    return {
+        "name": EXIT_HANDLER_TEMPLATE,
+        "steps": [
+            [{"continueOn": {"failed": True}, "name": step, "template": step}] for step in steps
+        ],
+    }
+
+
+def normalize(obj, free_form: bool = False):
+    """
+    Orders the keys of a Kubernetes object like its Argo schema model and drops the None values.
+
+    Args:
+        obj: The object (dict, list or scalar).
+        free_form (bool): Whether the object is a free-form dict keeping its key order.
+
+    Returns:
+        The normalized object.
+    """
+    if isinstance(obj, dict):
+        items = obj.items() if free_form else sorted(obj.items())
+        return {
+            key: normalize(value, key in FREE_FORM_KEYS)
+            for key, value in items
+            if value is not None
+        }
+    if isinstance(obj, list):
+        return [normalize(elem) for elem in obj]
+    return obj
+
+
+class VolumeManifests:
+    """
+    The VolumeTemplates counterpart returning the volumes as plain dicts.
+    """
+
+    @staticmethod
+    def create_volume_claim_template(
+        name: str,
+        storage_class_name: Optional[str] = None,
+        storage_size: Optional[str] = None,
+        access_modes: Optional[List[str]] = None,
+    ) -> dict:
+        """
+        Creates a PersistentVolumeClaim template.
+
+        Args:
+            name (str): Name of the volume claim.
+            storage_class_name (Optional[str]): Storage class name.
+            storage_size (Optional[str]): Requested storage size (e.g., '1Gi').
+            access_modes (Optional[List[str]]): List of access modes (e.g., ['ReadWriteOnce']).
+
+        Returns:
+            dict: A volume claim manifest.
+        """
+        if not storage_size:
+            raise ValueError("Storage size must be specified.")
+
+        return normalize(
+            {
+                "metadata": {"name": name},
+                "spec": {
+                    "accessModes": access_modes,
+                    "resources": {"requests": {"storage": storage_size}},
+                    "storageClassName": storage_class_name,
+                },
+            }
+        )
+
+    @staticmethod
+    def create_secret_volume(name: str, secret_name: str) -> dict:
+        """
+        Creates a volume from a Kubernetes secret.
+
+        Args:
+            name (str): Name of the volume.
+            secret_name (str): Name of the Kubernetes secret.
+
+        Returns:
+            dict: A secret volume manifest.
+        """
+        if not secret_name:
+            raise ValueError("Secret name must be specified.")
+
+        return {"name": name, "secret": {"secretName": secret_name}}
+
+    @staticmethod
+    def create_config_map_volume(
+        name: str, config_map_name: str, items: List[Dict[str, str]], default_mode: int, optional: bool
+    ) -> dict:
+        """
+        Creates a volume from a Kubernetes ConfigMap.
+
+        Args:
+            name (str): Name of the volume.
+            config_map_name (str): Name of the ConfigMap.
+            items (List[Dict[str, str]]): List of key-path-mode mappings for the ConfigMap.
+            default_mode (int): Default file permission mode.
+            optional (bool): Whether the ConfigMap is optional.
+
+        Returns:
+            dict: A ConfigMap volume manifest.
+        """
+        if not config_map_name:
+            raise ValueError("ConfigMap name must be specified.")
+
+        for item in items:
+            if "key" not in item or "path" not in item:
+                raise ValueError("Each item must have a 'key' and 'path'.")
+
+        return normalize(
+            {
+                "configMap": {
+                    "defaultMode": default_mode,
+                    "items": [
+                        {"key": item["key"], "mode": item.get("mode"), "path": item["path"]}
+                        for item in items
+                    ],
+                    "name": config_map_name,
+                    "optional": optional,
+                },
+                "name": name,
+            }
+        )
+
+    @staticmethod
+    def create_persistent_volume_claim(name: str, claim_name: str) -> dict:
+        """
+        Creates a volume from an existing PersistentVolumeClaim.
+
+        Args:
+            name (str): Name of the volume.
+            claim_name (str): Name of the PersistentVolumeClaim.
+
+        Returns:
+            dict: A PersistentVolumeClaim volume manifest.
+        """
+        if not claim_name:
+            raise ValueError("Claim name must be specified.")
+
+        return {"name": name, "persistentVolumeClaim": {"claimName": claim_name}}
+
+
+def get_skeleton_key(entrypoint: str) -> tuple:
+    """returns the key of the skeleton of an entrypoint: the runner template and output artifacts it is built for"""
+    _, output_artifacts = get_entrypoint_outputs()
+    return (
+        entrypoint,
+        os.environ.get("ARGO_CWL_RUNNER_TEMPLATE", "argo-cwl-runner"),
+        os.environ.get("ARGO_CWL_RUNNER_ENTRYPOINT", "calrissian-runner"),
+        tuple(output_artifacts),
+    )
+
+
+def get_skeleton(workflow: CWLWorkflow, entrypoint: str) -> dict:
+    """
+    Returns the static parts of the manifest of a service, built once per CWLWorkflow.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow.
+        entrypoint (str): The entrypoint step in the CWL workflow.
+
+    Returns:
+        dict: The annotations and the entrypoint and prepare templates.
+    """
+    output_parameters, output_artifacts = get_entrypoint_outputs()
+
+    key = get_skeleton_key(entrypoint)
+    _, runner_template, runner_entrypoint, _ = key
+    skeletons = _skeletons.setdefault(workflow, {})
+
+    if key not in skeletons:
+        skeletons[key] = {
+            "annotations": {
+                name: value
+                for name, value in get_annotations(workflow).items()
+                if value is not None
+            },
+            "entrypoint": {
+                "inputs": {"parameters": [{"name": "inputs"}]},
+                "name": entrypoint,
+                "outputs": {
+                    "artifacts": [
+                        {
+                            "fromExpression": f"steps['argo-cwl'].outputs.artifacts['{name}']",
+                            "name": name,
+                        }
+                        for name in output_artifacts
+                    ],
+                    "parameters": [
+                        {
+                            "name": name,
+                            "valueFrom": {
+                                "expression": f"steps['argo-cwl'].outputs.parameters['{name}']"
+                            },
+                        }
+                        for name in output_parameters
+                    ],
+                },
+            },
+            "prepare_step": {
+                "arguments": {
+                    "parameters": [
+                        {"name": "inputs", "value": "{{inputs.parameters.inputs}}"}
+                    ]
+                },
+                "name": "prepare",
+                "template": "prepare",
+            },
+            "template_ref": {"name": runner_template, "template": runner_entrypoint},
+            "prepare": {
+                "inputs": {"parameters": [{"name": "inputs"}]},
+                "name": "prepare",
+                "outputs": {
+                    "parameters": [
+                        {"name": "inputs", "valueFrom": {"path": "/tmp/cwl_parameters.json"}},
+                        {"name": "workflow", "valueFrom": {"path": "/tmp/cwl_workflow.json"}},
+                    ]
+                },
+            },
+            "prepare_source": get_prepare_source(workflow),
+        }
+
+    return skeletons[key]
+
+
+def as_manifest(volume) -> dict:
+    """returns the manifest of a volume given as a dict or a Hera model"""
+    if isinstance(volume, dict):
+        return volume
+    return volume.dict(exclude_none=True, by_alias=True)
+
+
+@timed("workflow build")
+def build_workflow_manifest(
+    workflow: CWLWorkflow,
+    entrypoint: str,
+    argo_wf_name: str,
+    inputs: Optional[dict] = None,
+    volume_size: Optional[str] = "10Gi",
+    max_cores: Optional[int] = 4,
+    max_ram: Optional[str] = "4Gi",
+    storage_class: Optional[str] = "standard",
+    namespace: Optional[str] = "default",
+    pod_placement: Optional[PodPlacement] = None,
+    priority: Optional[int] = None,
+    active_deadline_seconds: Optional[int] = None,
+    labels: Optional[dict] = None,
+    notify_url: Optional[str] = None,
+    stage_in_cache: Optional[StageInCacheVolume] = None,
+    **kwargs,
+) -> dict:
+    """
+    Builds the Argo Workflow manifest of cwl_to_argo as plain dicts.
+
+    The output is the same as cwl_to_argo(...).to_dict() for the same arguments.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow to be converted.
+        entrypoint (str): The entrypoint step in the CWL workflow.
+        argo_wf_name (str): The name for the Argo workflow.
+        inputs (Optional[dict]): Input parameters for the workflow execution.
+        volume_size (Optional[str]): Size of the volume to be used by the workflow.
+        max_cores (Optional[int]): Maximum CPU cores allowed for the workflow.
+        max_ram (Optional[str]): Maximum memory allowed for the workflow.
+        storage_class (Optional[str]): The storage class for volume claims.
+        namespace (Optional[str]): Kubernetes namespace to run the workflow in.
+        pod_placement (Optional[PodPlacement]): Node selector, env vars, affinity,
+            tolerations and priority class for the workflow pods.
+        priority (Optional[int]): Workflow priority, also used to order the semaphore queue.
+        active_deadline_seconds (Optional[int]): Time after which Argo fails the running workflow.
+        labels (Optional[dict]): Workflow labels, e.g. to find the workflow of a Zoo job.
+        notify_url (Optional[str]): Callback URL the exit handler posts the workflow phase to.
+        stage_in_cache (Optional[StageInCacheVolume]): Shared stage-in cache claim mounted in the workflow.
+        timings (Optional[PhaseRecorder]): Records the build time in the 'workflow build' phase.
+
+    Returns:
+        dict: The Argo Workflow manifest.
+    """
+    skeleton = get_skeleton(workflow, entrypoint)
+    placement = pod_placement or PodPlacement()
+
+    argo_cwl_step = {
+        "arguments": {
+            "parameters": [
+                {"name": "entry_point", "value": entrypoint},
+                {"name": "max_ram", "value": str(max_ram)},
+                {"name": "max_cores", "value": str(max_cores)},
+                {
+                    "name": "parameters",
+                    "value": "{{ steps.prepare.outputs.parameters.inputs }}",
+                },
+                {"name": "cwl", "value": "{{ steps.prepare.outputs.parameters.workflow }}"},
+            ]
+            + [
+                {"name": name, "value": value}
+                for name, value in placement_parameters(pod_placement)
+            ]
+            + [
+                {"name": name, "value": value}
+                for name, value in (stage_in_cache.get_parameters() if stage_in_cache else [])
+            ]
+        },
+        "continueOn": {"error": True},
+        "name": "argo-cwl",
+        "templateRef": skeleton["template_ref"],
+    }
+
+    script = {
+        "command": ["python"],
+        "env": [
+            {"name": name, "value": str(value)}
+            for name, value in (placement.env_vars or {}).items()
+        ]
+        or None,
+        "image": PREPARE_IMAGE,
+        "resources": {"requests": {"memory": "1Gi", "cpu": "1"}},
+        "source": skeleton["prepare_source"],
+        "volumeMounts": [],
+    }
+
+    templates = [
+        {**skeleton["entrypoint"], "steps": [[skeleton["prepare_step"]], [argo_cwl_step]]},
+        {
+            **skeleton["prepare"],
+            "script": {key: value for key, value in script.items() if value is not None},
+        },
+    ]
+
+    on_exit, exit_steps = get_exit_handler(notify_url)
+    if OUTPUTS_BUNDLE_TEMPLATE in exit_steps:
+        templates.append(get_outputs_bundle_template())
+    if NOTIFY_TEMPLATE in exit_steps:
+        templates.append(get_notify_template(notify_url))
+    if on_exit == EXIT_HANDLER_TEMPLATE:
+        templates.append(get_exit_handler_template(exit_steps))
+
+    gc_policy = get_gc_policy()
+
+    semaphore_ref = {"key": "workflow"}
+    if config_map_name := os.environ.get("ARGO_WF_SYNCHRONIZATION_CM"):
+        semaphore_ref["name"] = config_map_name
+
+    volumes = [as_manifest(volume) for volume in kwargs.get("additional_secrets", [])] + [
+        as_manifest(volume) for volume in kwargs.get("additional_configmaps", [])
+    ]
+    if stage_in_cache is not None:
+        volumes.append(
+            VolumeManifests.create_persistent_volume_claim(
+                name=CACHE_VOLUME, claim_name=stage_in_cache.claim_name
+            )
+        )
+
+    spec = {
+        "activeDeadlineSeconds": active_deadline_seconds,
+        "affinity": normalize(placement.affinity) if placement.affinity else None,
+        "arguments": {
+            "parameters": [{"name": "inputs", "value": str(inputs)}]
+        },
+        "entrypoint": entrypoint,
+        "nodeSelector": placement.node_selector or None,
+        "onExit": on_exit,
+        "podGC": gc_policy.get("podGC"),
+        "podPriorityClassName": placement.priority_class or None,
+        "priority": priority,
+        "synchronization": {"semaphore": {"configMapKeyRef": semaphore_ref}},
+        "templates": templates,
+        "tolerations": normalize(placement.tolerations) if placement.tolerations else None,
+        "ttlStrategy": gc_policy.get("ttlStrategy"),
+        "volumeClaimGC": gc_policy.get("volumeClaimGC"),
+        "volumeClaimTemplates": [
+            VolumeManifests.create_volume_claim_template(
+                name="calrissian-wdir",
+                storage_class_name=storage_class,
+                storage_size=volume_size,
+                access_modes=["ReadWriteMany"],
+            )
+        ],
+        "volumes": volumes or None,
+    }
+
+    metadata = {
+        "annotations": skeleton["annotations"],
+        "labels": labels or None,
+        "name": argo_wf_name,
+        "namespace": namespace,
+    }
+
+    return {
+        "apiVersion": "argoproj.io/v1alpha1",
+        "kind": "Workflow",
+        "metadata": {key: value for key, value in metadata.items() if value is not None},
+        "spec": {key: value for key, value in spec.items() if value is not None},
+    }
@@ -0,0 +1,269 @@
+# Description: This file contains the optional Prometheus metrics of the runner written to a node-exporter
+# textfile collector directory or pushed to a Pushgateway, so that short-lived Zoo processes can report.
+import fcntl
+import functools
+import json
+import os
+import re
+import socket
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+PREFIX = "zoo_argowf_runner"
+
+# histogram buckets (seconds) covering API calls as well as hour-long phases
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 1800, 3600, 10800)
+
+METRICS = {
+    "api_requests_total": ("counter", "Argo Workflows API calls by operation and status code"),
+    "api_request_duration_seconds": ("histogram", "Argo Workflows API call duration"),
+    "submissions_total": ("counter", "Workflows submitted by service"),
+    "attachments_total": ("counter", "Executions attached to the in-flight workflow of the same inputs by service"),
+    "reattachments_total": ("counter", "Executions reattached to the workflow of their journal by service"),
+    "monitor_polls_total": ("counter", "Workflow status polls by service"),
+    "monitor_notifications_total": ("counter", "Workflow completion notifications received by service"),
+    "phase_duration_seconds": ("histogram", "Execution phase duration by service and phase"),
+    "executions_total": ("counter", "Executions by service and outcome"),
+}
+
+
+def labels_key(labels: Dict[str, str]) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = [
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in items
+    ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class NullMetrics:
+    """The metrics when neither a textfile directory nor a Pushgateway is configured: nothing is recorded."""
+
+    enabled = False
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1) -> None:
+        pass
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        pass
+
+    def flush(self, **grouping) -> None:
+        pass
+
+
+class Metrics(NullMetrics):
+    """
+    Counters and histograms of a Zoo process, written at the end of the execution.
+
+    The textfile collector file is shared by the Zoo processes of a host: the metrics are
+    merged, under a file lock, with the ones written by the previous processes.
+    The Pushgateway receives the metrics of the host in a group per instance and service,
+    merged the same way in a state file.
+    """
+
+    enabled = True
+
+    def __init__(
+        self,
+        textfile_dir: Optional[str] = None,
+        pushgateway: Optional[str] = None,
+        state_dir: Optional[str] = None,
+    ) -> None:
+        self.textfile_dir = textfile_dir
+        self.pushgateway = pushgateway.rstrip("/") if pushgateway else None
+        # where the metrics pushed by the processes of the host are accumulated
+        self.state_dir = state_dir or textfile_dir or os.path.join(tempfile.gettempdir(), PREFIX)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1) -> None:
+        key = (name, labels_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        key = (name, labels_key(labels))
+        histogram = self.histograms.setdefault(
+            key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        )
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+    @staticmethod
+    def render(counters: dict, histograms: dict) -> str:
+        """returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, (metric_type, description) in METRICS.items():
+            series = counters if metric_type == "counter" else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+
+            lines.append(f"# HELP {PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+
+            for key in keys:
+                labels = key[1]
+                if metric_type == "counter":
+                    lines.append(f"{PREFIX}_{name}{format_labels(labels)} {series[key]}")
+                    continue
+
+                histogram = series[key]
+                for bound, count in zip(BUCKETS, histogram["buckets"]):
+                    lines.append(
+                        f"{PREFIX}_{name}_bucket{format_labels(labels, (('le', str(bound)),))} {count}"
+                    )
+                lines.append(
+                    f"{PREFIX}_{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {histogram['count']}"
+                )
+                lines.append(f"{PREFIX}_{name}_sum{format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{PREFIX}_{name}_count{format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def merge_state(self, state_path: str, prom_path: Optional[str] = None) -> Tuple[dict, dict]:
+        """
+        Merges the metrics with the state file of the host, under a file lock.
+
+        Args:
+            state_path: The state file, holding the metrics of the previous processes.
+            prom_path: The file the merged metrics are rendered to, under the same lock.
+
+        Returns:
+            Tuple[dict, dict]: The merged counters and histograms, saved to the state file.
+        """
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+
+        with open(f"{state_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            counters, histograms = {}, {}
+            if os.path.exists(state_path):
+                with open(state_path) as stream:
+                    state = json.load(stream)
+                counters = {
+                    (name, tuple(map(tuple, labels))): value
+                    for name, labels, value in state["counters"]
+                }
+                histograms = {
+                    (name, tuple(map(tuple, labels))): value
+                    for name, labels, value in state["histograms"]
+                }
+
+            for key, value in self.counters.items():
+                counters[key] = counters.get(key, 0) + value
+            for key, value in self.histograms.items():
+                merged = histograms.setdefault(
+                    key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+                )
+                merged["buckets"] = [a + b for a, b in zip(merged["buckets"], value["buckets"])]
+                merged["sum"] += value["sum"]
+                merged["count"] += value["count"]
+
+            self.replace(
+                state_path,
+                json.dumps(
+                    {
+                        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+                        "histograms": [
+                            [name, labels, value] for (name, labels), value in histograms.items()
+                        ],
+                    }
+                ),
+            )
+            if prom_path is not None:
+                self.replace(prom_path, self.render(counters, histograms))
+
+        return counters, histograms
+
+    def write_textfile(self) -> None:
+        """merges the metrics with the textfile collector file of the host"""
+        # the collector only reads the *.prom files
+        self.merge_state(
+            os.path.join(self.textfile_dir, f".{PREFIX}.json"),
+            prom_path=os.path.join(self.textfile_dir, f"{PREFIX}.prom"),
+        )
+
+    @staticmethod
+    def replace(path: str, content: str) -> None:
+        """writes a file atomically"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as stream:
+            stream.write(content)
+        os.replace(tmp_path, path)
+
+    def push(self, **grouping) -> None:
+        """
+        Pushes the metrics of the host to a Pushgateway group.
+
+        A push replaces the group: the metrics are merged with the ones pushed to the group by the
+        previous processes of the host (in a state file of state_dir), so that the counters accumulate
+        in a bounded number of groups (one per instance and grouping, e.g. service).
+        """
+        import requests
+
+        grouping = {"instance": socket.gethostname(), **grouping}
+        path = "/".join(f"{key}/{value}" for key, value in grouping.items())
+
+        counters, histograms = self.merge_state(
+            os.path.join(self.state_dir, f".{PREFIX}-{re.sub(r'[^A-Za-z0-9_.-]', '_', path)}.json")
+        )
+
+        requests.put(
+            f"{self.pushgateway}/metrics/job/{PREFIX}/{path}",
+            data=self.render(counters, histograms),
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+            timeout=5,
+        ).raise_for_status()
+
+    def flush(self, **grouping) -> None:
+        """
+        Writes the metrics recorded since the last flush, errors are logged and do not fail the execution.
+
+        Args:
+            grouping: The Pushgateway grouping labels (e.g. service), besides the instance.
+        """
+        if not self.counters and not self.histograms:
+            return
+
+        try:
+            if self.textfile_dir:
+                self.write_textfile()
+            if self.pushgateway:
+                self.push(**grouping)
+        except Exception as exc:
+            logger.warning(f"Cannot write the metrics: {exc}")
+
+        self.reset()
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics() -> NullMetrics:
+    """
+    Returns the metrics of the process configured with ARGO_WF_METRICS_TEXTFILE_DIR and/or
+    ARGO_WF_METRICS_PUSHGATEWAY (and ARGO_WF_METRICS_STATE_DIR), a NullMetrics when none is set.
+    """
+    textfile_dir = os.environ.get("ARGO_WF_METRICS_TEXTFILE_DIR")
+    pushgateway = os.environ.get("ARGO_WF_METRICS_PUSHGATEWAY")
+
+    if not textfile_dir and not pushgateway:
+        return NullMetrics()
+
+    return Metrics(
+        textfile_dir=textfile_dir,
+        pushgateway=pushgateway,
+        state_dir=os.environ.get("ARGO_WF_METRICS_STATE_DIR") or None,
+    )
@@ -0,0 +1,158 @@
+# Description: This file contains the listener of the completion notifications pushed by the exit handler
+# of the workflows, so that the runner waits for its workflow without polling the Argo Workflows API.
+import json
+import os
+import re
+import secrets
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from loguru import logger
+
+# name of the exit handler template notifying the runner
+NOTIFY_TEMPLATE = "notify-completion"
+
+# environment variable of the exit handler holding the callback URL
+CALLBACK_URL_ENV = "CALLBACK_URL"
+
+# exit handler script, a failed notification must not fail the workflow: the runner polls as a backup
+NOTIFY_SOURCE = """import json, os, time, urllib.request
+request = urllib.request.Request(
+    os.environ["CALLBACK_URL"],
+    data=json.dumps(
+        {"name": "{{workflow.name}}", "uid": "{{workflow.uid}}", "phase": "{{workflow.status}}"}
+    ).encode(),
+    headers={"Content-Type": "application/json"},
+    method="POST",
+)
+for attempt in range(5):
+    try:
+        urllib.request.urlopen(request, timeout=10).close()
+        break
+    except OSError as exc:
+        print(f"notification failed: {exc}")
+        time.sleep(2**attempt)
+"""
+
+
+class CompletionListener:
+    """
+    HTTP server receiving the completion notifications of the workflows submitted by the process.
+
+    Each workflow gets a callback URL holding the (secret) token of the listener and the workflow
+    name, the exit handler of the workflow posts its phase to it when the workflow completes.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        host: str = "0.0.0.0",
+        port: int = 0,
+        safety_interval: float = 900,
+    ) -> None:
+        """
+        :param url: URL of the listener reached from the workflow pods, '{port}' is replaced with the bound port.
+        :param host: Address the listener binds to.
+        :param port: Port the listener binds to, any free port if 0.
+        :param safety_interval: Time (in seconds) between the status polls run in case a notification is lost.
+        """
+        self.token = secrets.token_urlsafe(16)
+        self.safety_interval = safety_interval
+        # phase pushed per workflow name
+        self.notifications: Dict[str, str] = {}
+        self.condition = threading.Condition()
+
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                match = re.fullmatch(r"/([^/]+)/([^/]+)", self.path)
+                if match is None or not secrets.compare_digest(match.group(1), listener.token):
+                    return self.reply(404)
+                try:
+                    phase = json.loads(body).get("phase") or "Unknown"
+                except (ValueError, AttributeError):
+                    return self.reply(400)
+
+                listener.notify(match.group(2), phase)
+                self.reply(204)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = url.replace("{port}", str(self.server.server_address[1])).rstrip("/")
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["CompletionListener"]:
+        """
+        Returns the listener configured with ARGO_WF_CALLBACK_URL, None if not set
+        (the workflow status is polled).
+        """
+        url = os.environ.get("ARGO_WF_CALLBACK_URL")
+        if not url:
+            return None
+
+        return cls(
+            url=url,
+            host=os.environ.get("ARGO_WF_CALLBACK_HOST", "0.0.0.0"),
+            port=int(os.environ.get("ARGO_WF_CALLBACK_PORT", 0)),
+            safety_interval=float(os.environ.get("ARGO_WF_CALLBACK_SAFETY_INTERVAL", 900)),
+        )
+
+    def start(self) -> "CompletionListener":
+        self.thread.start()
+        logger.info(f"listening to the workflow notifications on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_callback_url(self, workflow_name: str) -> str:
+        """returns the URL the exit handler of a workflow posts its phase to"""
+        return f"{self.url}/{self.token}/{workflow_name}"
+
+    def notify(self, workflow_name: str, phase: str) -> None:
+        """records the phase pushed by a workflow and wakes up its waiters"""
+        logger.info(f"workflow {workflow_name} notified: {phase}")
+        with self.condition:
+            self.notifications[workflow_name] = phase
+            self.condition.notify_all()
+
+    def wait(self, workflow_name: str, timeout: float) -> Optional[str]:
+        """
+        Waits for the notification of a workflow.
+
+        :param workflow_name: Name of the workflow.
+        :param timeout: Maximum time (in seconds) to wait.
+        :return: The phase pushed by the workflow, None if it was not notified within timeout.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: workflow_name in self.notifications, timeout=timeout)
+            return self.notifications.get(workflow_name)
+
+    def discard(self, workflow_name: str) -> None:
+        """forgets the notification of a workflow that is no longer monitored"""
+        with self.condition:
+            self.notifications.pop(workflow_name, None)
+
+
+@lru_cache(maxsize=None)
+def get_completion_listener() -> Optional[CompletionListener]:
+    """returns the started completion listener shared by the executions of the process, None if not configured"""
+    listener = CompletionListener.from_env()
+    return listener.start() if listener is not None else None
@@ -0,0 +1,186 @@
+# Description: This file contains the outputs bundle written by the onExit handler of the workflows: one indexed
+# file with the outcome, the outputs, the usage report and the compressed logs, read with range requests.
+import gzip
+import json
+import os
+import shutil
+import struct
+import tempfile
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+OUTPUTS_BUNDLE_MAGIC = b"ZAWFOUTS"
+
+# bumped when the bundle layout changes
+OUTPUTS_BUNDLE_VERSION = 1
+
+# magic, format version, size of the compressed index
+HEADER = struct.Struct("<8sHQ")
+
+# name of the exit handler template and of its output artifact
+OUTPUTS_BUNDLE_TEMPLATE = "outputs-bundle"
+
+OUTPUTS_BUNDLE_PATH = "/tmp/outputs-bundle"
+
+# files written by Calrissian (and the feature-collection step) in the calrissian-wdir volume
+# (see example/argo-cwl-runner.yaml)
+CALRISSIAN_WDIR = "/calrissian"
+CALRISSIAN_OUTPUTS = {
+    "results": "output.json",
+    "usage-report": "report.json",
+    "feature-collection": "feature-collection.json",
+}
+CALRISSIAN_LOG = "stderr.log"
+CALRISSIAN_TOOL_LOGS = "logs"
+
+# first bytes read from a bundle: the header, the index and, for small bundles, the logs
+HEAD_SIZE = 64 * 1024
+
+
+def write_outputs_bundle(
+    bundle_path: str, outcome: str, outputs: Dict[str, str], log_path: str, tool_logs_dir: str
+) -> None:
+    """
+    Writes an outputs bundle: the header, the gzip compressed JSON index and the logs blob.
+
+    The index holds the outcome and the (small) outputs, and the offset in the blob, compressed
+    and uncompressed sizes of the log and of each tool log. Every log is a separate gzip member
+    so that it is read and decompressed on its own.
+
+    This function runs in the exit handler pod (see get_outputs_bundle_source), it only uses
+    the standard library and the module constants.
+
+    Args:
+        bundle_path (str): Path of the bundle.
+        outcome (str): The workflow status.
+        outputs (Dict[str, str]): Path of the files of the outputs, missing files are skipped.
+        log_path (str): Path of the workflow log.
+        tool_logs_dir (str): Directory of the tool logs, one <step>.log file per step.
+    """
+    index = {"outcome": outcome, "outputs": {}, "log": None, "tool_logs": {}}
+
+    for name, path in outputs.items():
+        if os.path.isfile(path):
+            with open(path) as stream:
+                index["outputs"][name] = stream.read()
+
+    logs = [(None, log_path)]
+    if os.path.isdir(tool_logs_dir):
+        logs += [
+            (file_name[: -len(".log")], os.path.join(tool_logs_dir, file_name))
+            for file_name in sorted(os.listdir(tool_logs_dir))
+            if file_name.endswith(".log")
+        ]
+
+    with tempfile.TemporaryFile() as blob:
+        for step, path in logs:
+            if not os.path.isfile(path):
+                continue
+            offset = blob.tell()
+            with open(path, "rb") as stream, gzip.GzipFile(fileobj=blob, mode="wb", mtime=0) as member:
+                shutil.copyfileobj(stream, member)
+                size = stream.tell()
+            entry = [offset, blob.tell() - offset, size]
+            if step is None:
+                index["log"] = entry
+            else:
+                index["tool_logs"][step] = entry
+
+        compressed_index = gzip.compress(json.dumps(index).encode(), mtime=0)
+
+        blob.seek(0)
+        with open(bundle_path, "wb") as stream:
+            stream.write(HEADER.pack(OUTPUTS_BUNDLE_MAGIC, OUTPUTS_BUNDLE_VERSION, len(compressed_index)))
+            stream.write(compressed_index)
+            shutil.copyfileobj(blob, stream)
+
+
+@lru_cache(maxsize=None)
+def get_outputs_bundle_source() -> str:
+    """returns the source of the exit handler script writing the outputs bundle from the calrissian-wdir volume"""
+    import inspect
+
+    return "\n".join(
+        [
+            "import gzip, json, os, shutil, struct, tempfile",
+            "from typing import Dict",
+            f"OUTPUTS_BUNDLE_MAGIC = {OUTPUTS_BUNDLE_MAGIC!r}",
+            f"OUTPUTS_BUNDLE_VERSION = {OUTPUTS_BUNDLE_VERSION}",
+            f"HEADER = struct.Struct({HEADER.format!r})",
+            "",
+            inspect.getsource(write_outputs_bundle),
+            "write_outputs_bundle(",
+            f"    {OUTPUTS_BUNDLE_PATH!r},",
+            '    "{{workflow.status}}",',
+            f"    {dict((name, os.path.join(CALRISSIAN_WDIR, path)) for name, path in CALRISSIAN_OUTPUTS.items())!r},",
+            f"    {os.path.join(CALRISSIAN_WDIR, CALRISSIAN_LOG)!r},",
+            f"    {os.path.join(CALRISSIAN_WDIR, CALRISSIAN_TOOL_LOGS)!r},",
+            ")",
+            "",
+        ]
+    )
+
+
+class OutputsBundle:
+    """
+    Reader of an outputs bundle through a range read function.
+
+    The first HEAD_SIZE bytes are read once with the index, the logs they hold are served
+    from memory and the others are read with one range request each.
+    """
+
+    def __init__(self, read_range: Callable[[int, int], bytes]) -> None:
+        """
+        :param read_range: Returns the bytes of the bundle from the first to the last offset (included),
+            fewer at the end of the bundle.
+        """
+        self.read_range = read_range
+
+        self.head = read_range(0, HEAD_SIZE - 1)
+        if len(self.head) < HEADER.size:
+            raise ValueError("Truncated outputs bundle")
+
+        magic, version, index_size = HEADER.unpack_from(self.head)
+        if magic != OUTPUTS_BUNDLE_MAGIC or version != OUTPUTS_BUNDLE_VERSION:
+            raise ValueError("Unsupported outputs bundle")
+
+        self.blob_offset = HEADER.size + index_size
+        if len(self.head) < self.blob_offset:
+            self.head += read_range(len(self.head), self.blob_offset - 1)
+
+        self.index = json.loads(gzip.decompress(self.head[HEADER.size:self.blob_offset]))
+
+    @property
+    def outcome(self) -> str:
+        """the workflow status when the exit handler ran"""
+        return self.index["outcome"]
+
+    def get_output(self, name: str) -> Optional[str]:
+        """returns an output, None if the bundle does not hold it"""
+        return self.index["outputs"].get(name)
+
+    def get_tool_log_names(self) -> List[str]:
+        """returns the steps with a tool log"""
+        return list(self.index["tool_logs"])
+
+    def read_log(self, entry: Optional[list]) -> Optional[str]:
+        """returns the decompressed log at an index entry"""
+        if entry is None:
+            return None
+
+        offset, length, _ = entry
+        start = self.blob_offset + offset
+        if start + length <= len(self.head):
+            member = self.head[start:start + length]
+        else:
+            member = self.read_range(start, start + length - 1)
+
+        return gzip.decompress(member).decode()
+
+    def get_log(self) -> Optional[str]:
+        """returns the workflow log, None if the bundle does not hold it"""
+        return self.read_log(self.index["log"])
+
+    def get_tool_log(self, step: str) -> Optional[str]:
+        """returns the tool log of a step, None if the bundle does not hold it"""
+        return self.read_log(self.index["tool_logs"].get(step))
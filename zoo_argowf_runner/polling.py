@@ -0,0 +1,101 @@
+# Description: This file contains the schedule of the workflow status polls: fast polls after the submission
+# and near the expected completion, exponential back-off while the workflow runs, with jitter.
+import os
+import random
+from typing import Optional
+
+
+class PollingSchedule:
+    """
+    Returns the time to wait before the next workflow status poll.
+
+    With the adaptive policy the polls start at min_interval after the submission and back off
+    up to interval while the workflow is not Running, then up to max_interval while it runs.
+    When the expected duration of the workflow is known, the back-off stops short of the
+    expected completion and the polls get faster around it. The fixed policy always waits interval.
+    """
+
+    def __init__(
+        self,
+        interval: float = 30,
+        min_interval: float = 2,
+        max_interval: float = 300,
+        backoff: float = 1.5,
+        jitter: float = 0.1,
+        expected_duration: Optional[float] = None,
+        completion_window: float = 0.1,
+        policy: str = "adaptive",
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        """
+        Initialize the polling schedule.
+
+        :param interval: Fixed interval, and longest interval before the workflow is Running (in seconds).
+        :param min_interval: Shortest interval (in seconds), capped to interval.
+        :param max_interval: Longest interval while the workflow is Running (in seconds), at least interval.
+        :param backoff: Factor applied to the interval at each poll.
+        :param jitter: Relative random variation of the intervals, spreading the polls of concurrent jobs.
+        :param expected_duration: Expected duration of the workflow (in seconds), e.g. from the run history.
+        :param completion_window: Part of the expected duration around the expected completion polled faster.
+        :param policy: 'adaptive' or 'fixed'.
+        :param rng: Random generator of the jitter.
+        """
+        if policy not in ["adaptive", "fixed"]:
+            raise ValueError(f"Unsupported polling policy: {policy}")
+
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.max_interval = max(max_interval, interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.expected_duration = expected_duration
+        self.completion_window = completion_window
+        self.policy = policy
+        self.rng = rng or random.Random()
+        self.current = None
+
+    @classmethod
+    def from_env(
+        cls, interval: float = 30, expected_duration: Optional[float] = None
+    ) -> "PollingSchedule":
+        """returns the polling schedule configured with the environment"""
+        return cls(
+            interval=interval,
+            min_interval=float(os.environ.get("ARGO_WF_MONITOR_MIN_INTERVAL", 2)),
+            max_interval=float(os.environ.get("ARGO_WF_MONITOR_MAX_INTERVAL", 300)),
+            jitter=float(os.environ.get("ARGO_WF_MONITOR_JITTER", 0.1)),
+            expected_duration=expected_duration,
+            policy=os.environ.get("ARGO_WF_MONITOR_POLICY", "adaptive"),
+        )
+
+    def next_interval(self, elapsed: float, status: Optional[str]) -> float:
+        """
+        Returns the time to wait before the next poll.
+
+        :param elapsed: Time elapsed since the submission (in seconds).
+        :param status: Workflow phase returned by the last poll, None if the poll failed.
+        """
+        if self.policy == "fixed":
+            return self.interval
+
+        if self.current is None:
+            interval = self.min_interval
+        elif status != "Running":
+            interval = min(self.current * self.backoff, self.interval)
+        else:
+            interval = min(self.current * self.backoff, self.max_interval)
+
+            if self.expected_duration is not None:
+                window = max(self.min_interval, self.completion_window * self.expected_duration)
+                remaining = self.expected_duration - elapsed
+
+                if remaining > window:
+                    # wake up at the start of the completion window
+                    interval = min(interval, remaining - window)
+                elif remaining > -window:
+                    interval = min(interval, max(self.min_interval, window / 4))
+                # past the completion window the back-off goes on
+
+        self.current = interval
+
+        return interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
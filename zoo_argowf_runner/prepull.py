@@ -0,0 +1,108 @@
+# Description: This file contains the container images of a service, collected once from the DockerRequirements
+# of its CWL processes, and the DaemonSet pre-pulling them on the nodes before the jobs run.
+import copy
+import re
+import weakref
+from typing import List, Optional
+
+from zoo_argowf_runner.reaper import SERVICE_LABEL, label_value
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow, PodPlacement
+
+PAUSE_IMAGE = "registry.k8s.io/pause:3.9"
+
+# command of the pull containers, idles once the image is on the node
+PULL_COMMAND = ["sh", "-c", "while true; do sleep 3600; done"]
+
+# requests of the containers, the pre-pull pods do not take room from the tool pods
+PULL_RESOURCES = {"requests": {"cpu": "1m", "memory": "8Mi"}, "limits": {"cpu": "50m", "memory": "32Mi"}}
+
+_images = weakref.WeakKeyDictionary()
+
+
+def get_workflow_images(workflow: CWLWorkflow) -> List[str]:
+    """
+    Returns the container images of a service, collected at the first call and kept with the workflow.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow (or its bundle).
+
+    Returns:
+        List[str]: The dockerPull images of the processes the workflow runs, each once.
+    """
+    if (images := _images.get(workflow)) is None:
+        images = _images[workflow] = workflow.get_docker_images()
+    return images
+
+
+def get_prepull_name(workflow_id: str) -> str:
+    """returns the name of the pre-pull DaemonSet of a service, a valid Kubernetes name"""
+    return f"prepull-{re.sub(r'[^a-z0-9-]', '-', workflow_id.lower())}"[:63].strip("-")
+
+
+def get_prepull_daemonset(
+    workflow: CWLWorkflow,
+    name: Optional[str] = None,
+    namespace: Optional[str] = None,
+    pod_placement: Optional[PodPlacement] = None,
+    pause_image: str = PAUSE_IMAGE,
+    command: Optional[List[str]] = None,
+) -> dict:
+    """
+    Returns the DaemonSet pre-pulling the container images of a service on the nodes.
+
+    Each image is a container idling once started, so the kubelet of every node (selected
+    by the pod placement) pulls the images when the DaemonSet is applied or a node joins,
+    and the steps of the jobs find them on the node. The containers start independently:
+    an image without a shell (distroless, scratch) is pulled all the same, only its container
+    fails to start and is reported in the pod events, the other images are not held back.
+    The pause container keeps the pod running when the service has no image.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow (or its bundle).
+        name (Optional[str]): Name of the DaemonSet, defaults to prepull-<workflow id>.
+        namespace (Optional[str]): Namespace of the DaemonSet.
+        pod_placement (Optional[PodPlacement]): Node selector, affinity and tolerations of the workflow pods.
+        pause_image (str): Image of the idle container.
+        command (Optional[List[str]]): Command of the pull containers, defaults to PULL_COMMAND.
+
+    Returns:
+        dict: The DaemonSet manifest.
+    """
+    name = name or get_prepull_name(workflow.workflow_id)
+    placement = pod_placement or PodPlacement()
+    labels = {"app.kubernetes.io/name": name, SERVICE_LABEL: label_value(workflow.workflow_id)}
+
+    pod_spec = {
+        "containers": [
+            {
+                "name": f"pull-{index}",
+                "image": image,
+                "imagePullPolicy": "IfNotPresent",
+                "command": list(command or PULL_COMMAND),
+                "resources": copy.deepcopy(PULL_RESOURCES),
+            }
+            for index, image in enumerate(get_workflow_images(workflow))
+        ]
+        + [{"name": "pause", "image": pause_image, "resources": copy.deepcopy(PULL_RESOURCES)}],
+        "terminationGracePeriodSeconds": 0,
+        "nodeSelector": placement.node_selector or None,
+        "affinity": placement.affinity or None,
+        "tolerations": placement.tolerations or None,
+    }
+
+    metadata = {"name": name, "namespace": namespace, "labels": labels}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "DaemonSet",
+        "metadata": {key: value for key, value in metadata.items() if value is not None},
+        "spec": {
+            "selector": {"matchLabels": {"app.kubernetes.io/name": name}},
+            # the nodes pull the new images at once when the service is updated
+            "updateStrategy": {"type": "RollingUpdate", "rollingUpdate": {"maxUnavailable": "100%"}},
+            "template": {
+                # copies, the manifest is written to YAML without anchors
+                "metadata": {"labels": dict(labels)},
+                "spec": {key: value for key, value in pod_spec.items() if value is not None},
+            },
+        },
+    }
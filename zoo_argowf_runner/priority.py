@@ -0,0 +1,111 @@
+# Description: This file contains the functions to compute the scheduling priority of a workflow
+# from its estimated resource plan, the user tier and the input size.
+import json
+import os
+import re
+from typing import Optional
+
+from zoo_argowf_runner.zoo_helpers import ResourcePlan
+
+# base priority per user tier, overridden with PRIORITY_TIERS
+DEFAULT_TIERS = {"interactive": 1000, "standard": 500, "batch": 0}
+
+QUANTITY_UNITS = {
+    "": 1 / 2**20,
+    "Ki": 1 / 2**10,
+    "Mi": 1,
+    "Gi": 2**10,
+    "Ti": 2**20,
+    "k": 1e3 / 2**20,
+    "M": 1e6 / 2**20,
+    "G": 1e9 / 2**20,
+    "T": 1e12 / 2**20,
+}
+
+
+def quantity_to_mi(quantity) -> float:
+    """
+    Converts a Kubernetes quantity (e.g. '512Mi', '12Gi', '4G') to MiB.
+
+    Args:
+        quantity (str or int): The quantity, plain numbers are bytes.
+
+    Returns:
+        float: The quantity in MiB.
+    """
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([A-Za-z]*)\s*", str(quantity))
+    if not match or match.group(2) not in QUANTITY_UNITS:
+        raise ValueError(f"Invalid quantity: {quantity}")
+    return float(match.group(1)) * QUANTITY_UNITS[match.group(2)]
+
+
+def get_input_size(processing_parameters: dict) -> int:
+    """
+    Returns the number of input items, array inputs count one item per element.
+
+    Args:
+        processing_parameters (dict): The processing parameters.
+
+    Returns:
+        int: The number of input items.
+    """
+    return sum(
+        len(value) if isinstance(value, list) else 1
+        for value in processing_parameters.values()
+    )
+
+
+def compute_priority(
+    resource_plan: ResourcePlan,
+    user_tier: Optional[str] = None,
+    input_size: int = 0,
+) -> int:
+    """
+    Computes the workflow priority, higher values are scheduled first.
+
+    The user tier sets the base priority, small resource plans and small inputs get a
+    bonus so that short interactive jobs are not queued behind long batch jobs.
+
+    Args:
+        resource_plan (ResourcePlan): The estimated resource plan.
+        user_tier (Optional[str]): The user tier (e.g. 'interactive', 'standard', 'batch').
+        input_size (int): The number of input items.
+
+    Returns:
+        int: The workflow priority.
+    """
+    tiers = {**DEFAULT_TIERS, **json.loads(os.environ.get("PRIORITY_TIERS", "{}"))}
+    base = tiers.get(user_tier or "standard", tiers["standard"])
+
+    # cost in "core-GiB" of the plan, each input item counts as a scattered step
+    cost = (
+        int(resource_plan.max_cores)
+        * quantity_to_mi(resource_plan.max_ram)
+        / 1024
+        * max(input_size, 1)
+    )
+    cost += quantity_to_mi(resource_plan.volume_size) / 10240
+
+    return int(base + max(0, 400 - cost))
+
+
+def get_priority_class(priority: int) -> Optional[str]:
+    """
+    Returns the pod PriorityClass for the priority.
+
+    The PriorityClasses are configured with PRIORITY_CLASSES, a JSON object mapping the
+    PriorityClass name to the minimum workflow priority using it.
+
+    Args:
+        priority (int): The workflow priority.
+
+    Returns:
+        Optional[str]: The PriorityClass name, None if none applies.
+    """
+    priority_classes = json.loads(os.environ.get("PRIORITY_CLASSES", "{}"))
+
+    candidates = [
+        (minimum, name) for name, minimum in priority_classes.items() if priority >= minimum
+    ]
+
+    return max(candidates)[1] if candidates else None
@@ -0,0 +1,154 @@
+# Description: This file contains the execution progress model computed from the workflow nodes, mapped on the
+# progress band of the runner, with the estimated time of completion.
+import statistics
+import time
+from typing import Dict, Optional
+
+COMPLETED_NODE_PHASES = ["Succeeded", "Failed", "Error", "Skipped", "Omitted"]
+
+
+def get_step_name(node: dict) -> str:
+    """returns the name of the step of a node, the same across the runs of a service"""
+    return node.get("templateName") or node.get("displayName") or node.get("name", "")
+
+
+def format_eta(seconds: float) -> str:
+    """formats a duration as e.g. 1h02m, 3m12s or 40s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressTracker:
+    """
+    Execution progress from the pod nodes of the workflow status.
+
+    Each node weighs the duration of its step in the past runs of the service (the median
+    step duration when the step is unknown, 1 without history). The steps of the past runs
+    not created yet are counted as pending. The node changes are applied incrementally:
+    an update costs the comparison of the node phases plus the running nodes.
+    The progress never goes backwards and is mapped on the [start, end] band.
+    """
+
+    def __init__(
+        self,
+        start: int = 20,
+        end: int = 90,
+        step_durations: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        Initialize the progress tracker.
+
+        :param start: Progress (%) when no node completed.
+        :param end: Progress (%) when all the nodes completed.
+        :param step_durations: Expected duration (in seconds) per step, e.g. from the run history.
+        """
+        self.start = start
+        self.end = end
+        self.step_durations = step_durations or {}
+        self.default_weight = (
+            statistics.median(self.step_durations.values()) if self.step_durations else 1.0
+        )
+
+        # phase of the nodes seen so far
+        self.nodes = {}
+        # start (monotonic) and weight of the running nodes
+        self.running = {}
+        self.seen_steps = set()
+        self.completed = 0
+        self.completed_weight = 0.0
+        self.pending_weight = 0.0
+        self.unseen_weight = sum(self.step_durations.values())
+        self.started = None
+        self.fraction = 0.0
+
+    def get_weight(self, node: dict) -> float:
+        return self.step_durations.get(get_step_name(node), self.default_weight)
+
+    def _remove(self, node_id: str, phase: str, weight: float) -> None:
+        if phase == "Running":
+            self.running.pop(node_id)
+        elif phase in COMPLETED_NODE_PHASES:
+            self.completed -= 1
+            self.completed_weight -= weight
+        else:
+            self.pending_weight -= weight
+
+    def _add(self, node_id: str, phase: str, weight: float, now: float) -> None:
+        if phase == "Running":
+            self.running[node_id] = (now, weight)
+        elif phase in COMPLETED_NODE_PHASES:
+            self.completed += 1
+            self.completed_weight += weight
+        else:
+            self.pending_weight += weight
+
+    def update(self, nodes: dict, now: Optional[float] = None) -> float:
+        """
+        Applies the node changes of a workflow status and returns the progress fraction.
+
+        :param nodes: The status.nodes of the workflow.
+        :param now: The current time (monotonic), for the tests.
+        """
+        now = time.monotonic() if now is None else now
+        if self.started is None:
+            self.started = now
+
+        for node_id, node in nodes.items():
+            phase = node.get("phase", "Pending")
+            previous = self.nodes.get(node_id)
+
+            if previous is not None and previous[0] == phase:
+                continue
+            if node.get("type") != "Pod":
+                continue
+
+            if previous is None:
+                weight = self.get_weight(node)
+                step = get_step_name(node)
+                if step in self.step_durations and step not in self.seen_steps:
+                    self.seen_steps.add(step)
+                    self.unseen_weight -= self.step_durations[step]
+            else:
+                weight = previous[1]
+                self._remove(node_id, previous[0], weight)
+
+            self._add(node_id, phase, weight, now)
+            self.nodes[node_id] = (phase, weight)
+
+        # the running nodes are expected to complete after their step duration
+        running_weight, running_done = 0.0, 0.0
+        for started, weight in self.running.values():
+            running_weight += weight
+            running_done += min((now - started) / weight, 0.95) * weight if weight else 0
+
+        total = self.completed_weight + running_weight + self.pending_weight + self.unseen_weight
+        if total > 0:
+            self.fraction = max(self.fraction, min((self.completed_weight + running_done) / total, 1.0))
+
+        return self.fraction
+
+    def get_percentage(self) -> int:
+        """returns the progress mapped on the [start, end] band"""
+        return int(self.start + self.fraction * (self.end - self.start))
+
+    def get_eta(self, now: Optional[float] = None) -> Optional[float]:
+        """returns the estimated time (in seconds) to the completion, None before any progress"""
+        now = time.monotonic() if now is None else now
+        if self.started is None or self.fraction <= 0:
+            return None
+        elapsed = now - self.started
+        return elapsed / self.fraction - elapsed
+
+    def get_message(self, now: Optional[float] = None) -> str:
+        """returns the step counts and the estimated time to the completion"""
+        message = (
+            f"{self.completed}/{len(self.nodes)} steps completed, {len(self.running)} running"
+        )
+        eta = self.get_eta(now=now)
+        if eta is not None:
+            message += f", ETA {format_eta(eta)}"
+        return message
@@ -0,0 +1,157 @@
+# Description: This file contains the labels identifying the Zoo job of a workflow and the reaper cancelling
+# the workflows whose Zoo job is gone (e.g. the Zoo process was killed).
+import os
+import re
+import socket
+from typing import List, Optional
+
+from loguru import logger
+
+from zoo_argowf_runner.argo_api import send_request
+from zoo_argowf_runner.endpoints import ArgoEndpoint
+
+LABEL_PREFIX = "zoo-argowf-runner"
+SERVICE_LABEL = f"{LABEL_PREFIX}/service"
+USID_LABEL = f"{LABEL_PREFIX}/usid"
+HOST_LABEL = f"{LABEL_PREFIX}/host"
+PID_LABEL = f"{LABEL_PREFIX}/pid"
+# start time of the process, tells a process from a later one reusing its pid
+PID_START_LABEL = f"{LABEL_PREFIX}/pid-start"
+
+
+def label_value(value) -> str:
+    """returns a valid Kubernetes label value: 63 alphanumeric, '-', '_' or '.' characters at most"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "-", str(value))[:63].strip("-_.")
+
+
+def get_process_start(pid: int) -> Optional[str]:
+    """returns the start time (in clock ticks since boot) of a process, None if unknown"""
+    try:
+        with open(f"/proc/{pid}/stat") as stream:
+            stat = stream.read()
+    except OSError:
+        return None
+    # the fields after the command name, starttime is the 22nd field of the line
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def get_job_labels(service: str, usid: Optional[str] = None) -> dict:
+    """returns the labels identifying the Zoo job (service, job id, host and process) of a workflow"""
+    pid = os.getpid()
+    labels = {
+        SERVICE_LABEL: label_value(service),
+        USID_LABEL: label_value(usid or ""),
+        HOST_LABEL: label_value(socket.gethostname()),
+        PID_LABEL: str(pid),
+        PID_START_LABEL: get_process_start(pid) or "",
+    }
+    return {key: value for key, value in labels.items() if value}
+
+
+def is_job_alive(labels: dict) -> Optional[bool]:
+    """returns whether the Zoo job process of a workflow is running, None if it runs on another host"""
+    if labels.get(HOST_LABEL) != label_value(socket.gethostname()) or PID_LABEL not in labels:
+        return None
+
+    pid = int(labels[PID_LABEL])
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    start = get_process_start(pid)
+    if labels.get(PID_START_LABEL) and start is not None and start != labels[PID_START_LABEL]:
+        return False
+
+    return True
+
+
+def find_orphans(endpoint: ArgoEndpoint, namespace: str = "") -> List[dict]:
+    """
+    Returns the workflows not completed whose Zoo job ran on this host and is gone.
+
+    The workflows recorded in the execution journal (ARGO_WF_JOURNAL_DIR) are not orphans:
+    the job is expected to be restarted and to reattach to its workflow.
+
+    Args:
+        endpoint (ArgoEndpoint): The Argo Workflows endpoint.
+        namespace (str): The namespace of the workflows, all the namespaces if empty.
+
+    Returns:
+        List[dict]: The metadata of the orphan workflows.
+    """
+    response = send_request(
+        "list_workflows",
+        "GET",
+        f"{endpoint.url}/api/v1/workflows/{namespace}",
+        params={
+            "listOptions.labelSelector": f"{HOST_LABEL}={label_value(socket.gethostname())},"
+            "workflows.argoproj.io/completed!=true",
+            "fields": "items.metadata",
+        },
+        headers=endpoint.get_headers(),
+        timeout=30,
+        verify=False,
+    )
+    response.raise_for_status()
+
+    from zoo_argowf_runner.journal import ExecutionJournal
+
+    journal = ExecutionJournal.from_env()
+
+    def is_journaled(metadata: dict) -> bool:
+        usid = (metadata.get("labels") or {}).get(USID_LABEL)
+        entry = journal.read(usid) if journal is not None and usid else None
+        return (
+            entry is not None
+            and entry.get("workflow_name") == metadata["name"]
+            and journal.is_fresh(entry)
+        )
+
+    return [
+        item["metadata"]
+        for item in response.json().get("items") or []
+        if is_job_alive(item["metadata"].get("labels") or {}) is False and not is_journaled(item["metadata"])
+    ]
+
+
+def reap_orphans(
+    endpoint: ArgoEndpoint, namespace: str = "", mode: str = "terminate", dry_run: bool = False
+) -> List[str]:
+    """
+    Stops or terminates the orphan workflows, releasing their semaphore slot, volume and pods.
+
+    Args:
+        endpoint (ArgoEndpoint): The Argo Workflows endpoint.
+        namespace (str): The namespace of the workflows, all the namespaces if empty.
+        mode (str): 'stop' (runs the exit handlers) or 'terminate'.
+        dry_run (bool): Only lists the orphan workflows.
+
+    Returns:
+        List[str]: The namespace/name of the orphan workflows.
+    """
+    reaped = []
+    for metadata in find_orphans(endpoint, namespace):
+        name = f"{metadata['namespace']}/{metadata['name']}"
+        reaped.append(name)
+
+        if dry_run:
+            logger.info(f"orphan workflow {name}")
+            continue
+
+        response = send_request(
+            f"{mode}_workflow",
+            "PUT",
+            f"{endpoint.url}/api/v1/workflows/{name}/{mode}",
+            headers=endpoint.get_headers(),
+            timeout=30,
+            verify=False,
+        )
+        if response.status_code == 200:
+            logger.info(f"orphan workflow {name}: {mode} requested")
+        else:
+            logger.error(f"Failed to {mode} orphan workflow {name}: {response.status_code}")
+
+    return reaped
@@ -3,11 +3,40 @@ from datetime import datetime
 import uuid
 from loguru import logger
 import os
-from typing import Union
+from typing import Optional, Tuple, Union
 from zoo_argowf_runner.handlers import ExecutionHandler
-from zoo_argowf_runner.argo_api import Execution
-from zoo_argowf_runner.zoo_helpers import ZooConf, ZooInputs, ZooOutputs, CWLWorkflow
-from zoo_argowf_runner.volume import VolumeTemplates
+from zoo_argowf_runner.admission import AdmissionController, AdmissionRejected
+from zoo_argowf_runner.endpoints import get_endpoint_selector
+from zoo_argowf_runner.priority import compute_priority, get_input_size, get_priority_class
+from zoo_argowf_runner.argo_api import Execution, ExecutionCancelled, cancel_on_signals
+from zoo_argowf_runner.bundle import load_cwl_workflow
+from zoo_argowf_runner.history import RunHistory
+from zoo_argowf_runner.journal import ExecutionJournal
+from zoo_argowf_runner.idempotency import (
+    IDEMPOTENCY_KEY_LABEL,
+    INPUTS_HASH_LABEL,
+    find_in_flight,
+    get_deduplication_mode,
+    get_idempotency_key,
+    get_idempotent_workflow_name,
+    get_inputs_hash,
+    single_flight_lock,
+)
+from zoo_argowf_runner.metrics import get_metrics
+from zoo_argowf_runner.polling import PollingSchedule
+from zoo_argowf_runner.progress import ProgressTracker
+from zoo_argowf_runner.reaper import get_job_labels
+from zoo_argowf_runner.timing import PhaseRecorder
+from zoo_argowf_runner.uploads import InputUploader
+from zoo_argowf_runner.validation import InputValidationError, get_input_validator
+from zoo_argowf_runner.zoo_helpers import (
+    ZooConf,
+    ZooInputs,
+    ZooOutputs,
+    PodPlacement,
+    ResourcePlan,
+)
+from zoo_argowf_runner.manifest import VolumeManifests
 
 try:
     import zoo
@@ -26,6 +55,9 @@ except ImportError:
 
     zoo = ZooStub()
 
+# shortest activeDeadlineSeconds derived from the run history (seconds)
+MIN_DERIVED_DEADLINE = 600
+
 
 class ZooArgoWorkflowsRunner:
     def __init__(
@@ -39,12 +71,21 @@ class ZooArgoWorkflowsRunner:
         self.zoo_conf = ZooConf(conf)
         self.inputs = ZooInputs(inputs)
         self.outputs = ZooOutputs(outputs)
-        self.cwl = CWLWorkflow(cwl, self.zoo_conf.workflow_id)
+        self.cwl = load_cwl_workflow(cwl, self.zoo_conf.workflow_id)
 
         self.handler = execution_handler
 
         self.storage_class = os.environ.get("STORAGE_CLASS", "standard")
-        self.monitor_interval = 30
+        self.monitor_interval = float(os.environ.get("ARGO_WF_MONITOR_INTERVAL", 30))
+        self.admission = AdmissionController.from_env()
+        self.endpoint_selector = get_endpoint_selector()
+        self.history = RunHistory.from_env()
+        self.deduplication = get_deduplication_mode()
+        self.journal = ExecutionJournal.from_env()
+        self.uploader = InputUploader.from_env()
+        self.timings = PhaseRecorder()
+        # outcome of the execution in the metrics, None until reported
+        self.outcome = None
 
     def get_volume_size(self) -> str:
         """returns volume size that the pods share"""
@@ -90,6 +131,67 @@ class ZooArgoWorkflowsRunner:
 
         return f"{max_ram}Mi"
 
+    def get_resource_plan(self) -> ResourcePlan:
+        """returns the estimated resource plan (volume size, max cores and max RAM)"""
+        resource_plan = ResourcePlan(
+            volume_size=self.get_volume_size(),
+            max_cores=self.get_max_cores(),
+            max_ram=self.get_max_ram(),
+        )
+        resource_plan.active_deadline_seconds = self.get_active_deadline(resource_plan)
+
+        return resource_plan
+
+    def get_active_deadline(self, resource_plan: ResourcePlan) -> Union[int, None]:
+        """
+        returns the workflow activeDeadlineSeconds: the handler one, ARGO_WF_ACTIVE_DEADLINE or
+        ARGO_WF_DEADLINE_FACTOR times the expected duration of the service, None if unknown
+        """
+        deadline = self.handler.get_workflow_deadline(resource_plan=resource_plan)
+
+        if deadline is None and os.environ.get("ARGO_WF_ACTIVE_DEADLINE"):
+            deadline = int(os.environ["ARGO_WF_ACTIVE_DEADLINE"])
+
+        if deadline is None and self.history is not None:
+            expected_duration = self.history.expected_duration(self.get_workflow_id())
+            if expected_duration is not None:
+                deadline = max(
+                    int(expected_duration * float(os.environ.get("ARGO_WF_DEADLINE_FACTOR", 3))),
+                    MIN_DERIVED_DEADLINE,
+                )
+
+        logger.info(f"active deadline: {deadline}")
+        return deadline
+
+    def get_priority(self, resource_plan: ResourcePlan, processing_parameters: dict) -> int:
+        """returns the workflow priority, the handler may override the computed one"""
+        priority = self.handler.get_workflow_priority(
+            resource_plan=resource_plan, processing_parameters=processing_parameters
+        )
+
+        if priority is None:
+            priority = compute_priority(
+                resource_plan=resource_plan,
+                user_tier=self.handler.get_user_tier(),
+                input_size=get_input_size(processing_parameters),
+            )
+        logger.info(f"priority: {priority}")
+
+        return priority
+
+    def get_pod_placement(self) -> PodPlacement:
+        """returns the pod placement hints (node selector, env vars, affinity, tolerations, priority class)"""
+        pod_placement = PodPlacement(
+            node_selector=self.handler.get_pod_node_selector(),
+            env_vars=self.handler.get_pod_env_vars(),
+            affinity=self.handler.get_pod_affinity(),
+            tolerations=self.handler.get_pod_tolerations(),
+            priority_class=self.handler.get_pod_priority_class(),
+        )
+        logger.info(f"pod placement: {pod_placement}")
+
+        return pod_placement
+
     def update_status(self, progress: int, message: str = None) -> None:
         """updates the execution progress (%) and provides an optional message"""
         if message:
@@ -132,42 +234,266 @@ class ZooArgoWorkflowsRunner:
             f"{str(datetime.now().timestamp()).replace('.', '')}-{uuid.uuid4()}"
         )
 
-    def execute(self):
-        self.update_status(progress=3, message="Pre-execution hook")
-        self.handler.pre_execution_hook()
+    def get_job_identity(self, inputs: dict) -> Tuple[str, dict, Optional[str]]:
+        """
+        Returns the workflow name, the workflow labels and the single-flight key of the job.
 
-        if not (self.assert_parameters()):
-            logger.error("Mandatory parameters missing")
-            return zoo.SERVICE_FAILED
+        Unless ARGO_WF_DEDUPLICATION is 'off', the workflow of a job is named after its idempotency
+        key (the job id and the inputs) and labelled with the inputs hash of its service.
+
+        :param inputs: The validated processing parameters submitted, with the additional parameters of the handler.
+        """
+        usid = self.zoo_conf.conf["lenv"].get("usid")
+        labels = get_job_labels(service=self.get_workflow_id(), usid=usid)
+
+        if self.deduplication == "off":
+            return self.get_workflow_uid(), labels, None
+
+        inputs_hash = get_inputs_hash(self.get_workflow_id(), inputs)
+        labels[INPUTS_HASH_LABEL] = inputs_hash
+
+        workflow_name = self.get_workflow_uid()
+        # without a job id the retries cannot be told from new jobs
+        if usid:
+            idempotency_key = get_idempotency_key(self.get_workflow_id(), usid, inputs)
+            labels[IDEMPOTENCY_KEY_LABEL] = idempotency_key
+            workflow_name = get_idempotent_workflow_name(self.get_workflow_id(), idempotency_key)
+
+        return (
+            workflow_name,
+            labels,
+            inputs_hash if self.deduplication == "single-flight" else None,
+        )
+
+    def attach(self, endpoints, single_flight_key: str):
+        """
+        Attaches the execution to the workflow not completed of a job with the same single-flight key.
+
+        :return: The endpoint of the workflow, None if there is no such workflow.
+        """
+        import requests
+
+        for endpoint in endpoints:
+            try:
+                workflow_name = find_in_flight(
+                    endpoint, self.execution.namespace, single_flight_key, timings=self.timings
+                )
+            except requests.exceptions.RequestException as exc:
+                logger.warning(f"Failed to look for the in-flight workflows on {endpoint.name}: {exc}")
+                continue
+
+            if workflow_name is not None:
+                logger.info(f"execution attached to workflow {workflow_name} on {endpoint.name}")
+                self.execution.set_endpoint(endpoint)
+                self.execution.workflow_name = workflow_name
+                self.execution.attached = True
+                # the exit handler of the workflow notifies the process that submitted it
+                self.execution.listener = None
+                get_metrics().inc("attachments_total", {"service": self.get_workflow_id()})
+                return endpoint
+
+        return None
+
+    def submit_or_attach(self, endpoints, single_flight_key: Optional[str] = None, **kwargs):
+        """
+        Submits the execution, or attaches it to the workflow not completed of a job with the same
+        single-flight key. The processes of the host look for the workflow and submit one at a time.
+        """
+        if single_flight_key is None:
+            return self.submit(endpoints, **kwargs)
+
+        # the submission is a nested phase of its own
+        with self.timings.phase("single-flight"), single_flight_lock(
+            f"{self.execution.namespace}-{single_flight_key}"
+        ):
+            return self.attach(endpoints, single_flight_key) or self.submit(endpoints, **kwargs)
+
+    def reattach(self, endpoints) -> bool:
+        """
+        Reattaches the execution to the workflow of the journal entry of the Zoo job, e.g. after
+        the process running the job was killed.
+
+        :param endpoints: The candidate endpoints of the job, the workflow endpoint must be one of them.
+        :return: True if the execution is reattached to a workflow, False if it must be submitted.
+        """
+        usid = self.zoo_conf.conf["lenv"].get("usid")
+        if self.journal is None or not usid:
+            return False
+
+        self.execution.journal = self.journal
+        self.execution.journal_key = usid
+
+        entry = self.journal.read(usid)
+        if entry is None or entry.get("service") != self.get_workflow_id():
+            return False
+
+        endpoint = next(
+            (endpoint for endpoint in endpoints if endpoint.url == entry["endpoint"]["url"]), None
+        )
+        if endpoint is None or entry.get("namespace") != self.execution.namespace:
+            logger.warning(f"workflow {entry['workflow_name']} of the journal is not on the job endpoints")
+            return False
+
+        self.execution.set_endpoint(endpoint)
+        if not self.execution.reattach(entry):
+            self.execution.set_endpoint(endpoints[0])
+            return False
+
+        # the exit handler of the workflow notifies the previous process
+        self.execution.listener = None
+        get_metrics().inc("reattachments_total", {"service": self.get_workflow_id()})
+        return True
+
+    def submit(self, endpoints, **kwargs):
+        """submits the execution, failing over to the next endpoint when one is unreachable"""
+        import requests
+
+        for index, endpoint in enumerate(endpoints):
+            self.execution.set_endpoint(endpoint)
+            try:
+                self.execution.run(**kwargs)
+            except requests.exceptions.ConnectionError as exc:
+                if index == len(endpoints) - 1:
+                    raise
+                logger.warning(f"Submission to {endpoint.name} failed: {exc}")
+                continue
+
+            logger.info(f"execution submitted to {endpoint.name}")
+            get_metrics().inc("submissions_total", {"service": self.get_workflow_id()})
+            return endpoint
+
+    def get_polling_schedule(self) -> PollingSchedule:
+        """returns the workflow status polling schedule, expecting the duration of the past runs of the service"""
+        expected_duration = None
+        if self.history is not None:
+            expected_duration = self.history.expected_duration(self.get_workflow_id())
+            logger.info(f"expected duration: {expected_duration}")
+
+        return PollingSchedule.from_env(
+            interval=self.monitor_interval, expected_duration=expected_duration
+        )
 
-        logger.info("execution started")
-        self.update_status(progress=5, message="starting execution")
+    def get_progress_tracker(self) -> ProgressTracker:
+        """returns the progress model of the workflow nodes, weighted by the step durations of the past runs"""
+        step_durations = None
+        if self.history is not None:
+            step_durations = self.history.get_step_durations(self.get_workflow_id())
+
+        # the progress of the workflow between the submission (20%) and the outputs retrieval (90%)
+        return ProgressTracker(start=20, end=90, step_durations=step_durations)
+
+    def report_metrics(self, outcome: str) -> None:
+        """records the phase durations and the outcome of the execution and writes the metrics"""
+        self.outcome = outcome
+        metrics = get_metrics()
+        if not metrics.enabled:
+            return
+
+        service = self.get_workflow_id()
+        for phase in self.timings.as_dict()["phases"]:
+            metrics.observe(
+                "phase_duration_seconds",
+                {"service": service, "phase": phase["name"]},
+                phase["wall_time"],
+            )
+        metrics.inc("executions_total", {"service": service, "outcome": outcome})
+
+        # a Pushgateway group per service (and instance), not per job: the groups are never deleted
+        metrics.flush(service=service)
+
+    def remove_journal(self) -> None:
+        """removes the journal entry of the Zoo job once it is over"""
+        if self.execution.journal is not None:
+            self.journal.remove(self.execution.journal_key)
 
-        processing_parameters = {
-            **self.handler.get_additional_parameters(),
-            **self.get_processing_parameters(),
-        }
+    def execute(self):
+        try:
+            return self._execute()
+        except Exception:
+            # the unexpected errors (upload, submission, monitoring, outputs) are counted too
+            if self.outcome is None:
+                self.report_metrics("failed")
+            raise
+
+    def _execute(self):
+        self.update_status(progress=3, message="Pre-execution hook")
+        with self.timings.phase("pre-execution hook"):
+            self.handler.pre_execution_hook()
+
+        with self.timings.phase("parameter resolution"):
+            if not (self.assert_parameters()):
+                logger.error("Mandatory parameters missing")
+                self.report_metrics("invalid")
+                return zoo.SERVICE_FAILED
+
+            logger.info("execution started")
+            self.update_status(progress=5, message="starting execution")
+
+            inputs = self.get_processing_parameters()
+            processing_parameters = {
+                **self.handler.get_additional_parameters(),
+                **inputs,
+            }
+
+            # the bad inputs are rejected before anything is submitted
+            if os.environ.get("ARGO_WF_VALIDATE_INPUTS", "true").lower() == "true":
+                try:
+                    processing_parameters = get_input_validator(self.cwl).validate(processing_parameters)
+                except InputValidationError as exc:
+                    logger.error(f"Invalid inputs: {exc}")
+                    self.update_status(progress=100, message=f"invalid inputs: {exc}")
+                    self.report_metrics("invalid")
+                    return zoo.SERVICE_FAILED
+
+            # the key covers what is submitted, the additional parameters of the handler included
+            workflow_name, labels, single_flight_key = self.get_job_identity(processing_parameters)
 
         logger.info("Processing parameters")
         logger.info(processing_parameters)
 
         self.update_status(progress=15, message="upload required files")
 
+        with self.timings.phase("resource estimation"):
+            resource_plan = self.get_resource_plan()
+            priority = self.get_priority(resource_plan, processing_parameters)
+
+            pod_placement = self.get_pod_placement()
+            if pod_placement.priority_class is None:
+                pod_placement.priority_class = get_priority_class(priority)
+
+        namespace = self.zoo_conf.conf["auth_env"]["user"]
+        with self.timings.phase("endpoint selection"):
+            endpoints = self.endpoint_selector.candidates(namespace, self.timings)
+
         self.execution = Execution(
-            namespace=self.zoo_conf.conf["auth_env"]["user"],
+            namespace=namespace,
             workflow=self.cwl,
             entrypoint=self.get_workflow_id(),
-            workflow_name=self.get_workflow_uid(),
+            workflow_name=workflow_name,
             processing_parameters=processing_parameters,
-            volume_size=self.get_volume_size(),
-            max_cores=self.get_max_cores(),
-            max_ram=self.get_max_ram(),
+            volume_size=resource_plan.volume_size,
+            max_cores=resource_plan.max_cores,
+            max_ram=resource_plan.max_ram,
             storage_class=self.storage_class,
             handler=self.handler,
+            pod_placement=pod_placement,
+            priority=priority,
+            endpoint=endpoints[0],
+            timings=self.timings,
+            active_deadline_seconds=resource_plan.active_deadline_seconds,
+            labels=labels,
         )
 
+        # the fast manifest builder takes the volumes as plain dicts
+        if os.environ.get("ARGO_WF_MANIFEST_BUILDER", "hera") == "fast":
+            volume_templates = VolumeManifests
+        else:
+            from zoo_argowf_runner.volume import VolumeTemplates
+
+            volume_templates = VolumeTemplates
+
         additional_configmaps = [
-            VolumeTemplates.create_config_map_volume(
+            volume_templates.create_config_map_volume(
                 name="cwl-wrapper-config-vol",
                 config_map_name="cwl-wrapper-config",
                 items=[
@@ -182,22 +508,100 @@ class ZooArgoWorkflowsRunner:
         ]
 
         additional_secrets = [
-            VolumeTemplates.create_secret_volume(name="usersettings-vol", secret_name="user-settings")
+            volume_templates.create_secret_volume(name="usersettings-vol", secret_name="user-settings")
         ]
 
-        self.execution.run(
-            additional_configmaps=additional_configmaps,
-            additional_secrets=additional_secrets,
-        )
-
-        self.update_status(progress=20, message="execution submitted")
+        reattached = self.reattach(endpoints)
+
+        # the workflow pods cannot read the file inputs on the Zoo host
+        if self.uploader is not None and not reattached:
+            import requests
+
+            try:
+                with self.timings.phase("input upload"):
+                    self.execution.processing_parameters = self.uploader.upload_inputs(
+                        self.execution.processing_parameters, timings=self.timings
+                    )
+            except (OSError, requests.exceptions.RequestException) as exc:
+                logger.error(f"Failed to upload the file inputs: {exc}")
+                self.update_status(progress=100, message=f"failed to upload the file inputs: {exc}")
+                self.report_metrics("failed")
+                return zoo.SERVICE_FAILED
+
+        # a job attaching to a workflow in flight takes no admission slot
+        if self.admission is not None and single_flight_key is not None and not reattached:
+            with self.timings.phase("single-flight"):
+                self.attach(endpoints, single_flight_key)
+
+        admission_ticket = None
+        # a reattached workflow was admitted by the previous process
+        if self.admission is not None and not reattached and not self.execution.attached:
+            self.update_status(progress=17, message="waiting for admission")
+            try:
+                with self.timings.phase("admission"):
+                    admission_ticket = self.admission.acquire(
+                        namespace=self.execution.namespace,
+                        service=self.get_workflow_id(),
+                        user=self.zoo_conf.conf["auth_env"]["user"],
+                        priority=priority,
+                    )
+            except AdmissionRejected as exc:
+                logger.error(f"Execution not admitted: {exc}")
+                self.update_status(progress=100, message=f"execution not admitted: {exc}")
+                self.report_metrics("rejected")
+                return zoo.SERVICE_FAILED
+
+        try:
+            # a dismissed Zoo job cancels its workflow
+            with cancel_on_signals():
+                if not reattached:
+                    # a restart between the journal write and the submission finds the workflow if it was created
+                    self.execution.write_journal("Submitting")
+                    if not self.execution.attached:
+                        self.submit_or_attach(
+                            endpoints,
+                            single_flight_key,
+                            additional_configmaps=additional_configmaps,
+                            additional_secrets=additional_secrets,
+                        )
+                    self.execution.write_journal("Submitted")
+
+                # the workflow submitted while the job waited for admission is admitted already
+                if admission_ticket is not None and self.execution.attached:
+                    self.admission.release(admission_ticket)
+                    admission_ticket = None
+
+                self.update_status(progress=20, message="execution submitted")
+
+                logger.info("execution")
+
+                # add self.update_status to tell Zoo the execution is running and the progress
+                self.execution.monitor(
+                    update_function=self.update_status,
+                    schedule=self.get_polling_schedule(),
+                    progress=self.get_progress_tracker(),
+                    timeout=float(os.environ["ARGO_WF_RUNNER_TIMEOUT"])
+                    if os.environ.get("ARGO_WF_RUNNER_TIMEOUT")
+                    else None,
+                    max_unknown_polls=int(os.environ.get("ARGO_WF_MAX_UNKNOWN_POLLS", 10)),
+                )
+        except ExecutionCancelled as exc:
+            # cancelled while submitting, monitor cancels the workflow itself
+            if self.execution.failure_reason is None:
+                self.execution.abort(f"execution cancelled: {exc}")
+        finally:
+            if admission_ticket is not None:
+                self.admission.release(admission_ticket)
+
+        if self.execution.failure_reason is not None:
+            self.update_status(progress=100, message=self.execution.failure_reason)
+            self.report_metrics("cancelled")
+            self.remove_journal()
+            return zoo.SERVICE_FAILED
 
-        logger.info("execution")
-
-        # add self.update_status to tell Zoo the execution is running and the progress
-        self.execution.monitor(
-            interval=self.monitor_interval, update_function=self.update_status
-        )
+        # the workflow of another job is recorded by that job
+        if self.history is not None and self.execution.is_completed() and not self.execution.attached:
+            self.history.record_workflow(self.get_workflow_id(), self.execution.workflow_status)
 
         if self.execution.is_completed():
             logger.info("execution complete")
@@ -214,32 +618,41 @@ class ZooArgoWorkflowsRunner:
         )
 
         logger.info("handle outputs execution logs")
-        output = self.execution.get_output()
-        logger.info(f"output: {output}")
-        log = self.execution.get_log()
-        usage_report = self.execution.get_usage_report()
-        tool_logs = self.execution.get_tool_logs()
-        stac_catalog = self.execution.get_stac_catalog()
-        feature_collection = self.execution.get_feature_collection()
+        with self.timings.phase("output retrieval"):
+            output = self.execution.get_output()
+            logger.info(f"output: {output}")
+            log = self.execution.get_log()
+            usage_report = self.execution.get_usage_report()
+            with self.timings.phase("log download"):
+                tool_logs = self.execution.get_tool_logs()
+            stac_catalog = self.execution.get_stac_catalog()
+            feature_collection = self.execution.get_feature_collection()
 
         self.outputs.set_output(output)
 
-        self.handler.handle_outputs(
-            log=log,
-            output=output,
-            usage_report=usage_report,
-            tool_logs=tool_logs,
-            execution=self.execution,
-        )
+        with self.timings.phase("handle outputs"):
+            self.handler.handle_outputs(
+                log=log,
+                output=output,
+                usage_report=usage_report,
+                tool_logs=tool_logs,
+                execution=self.execution,
+                timings=self.timings.as_dict(),
+            )
 
         self.update_status(progress=97, message="Post-execution hook")
 
-        self.handler.post_execution_hook(
-            log=log,
-            output=output,
-            usage_report=usage_report,
-            tool_logs=tool_logs,
-        )
+        with self.timings.phase("post-execution hook"):
+            self.handler.post_execution_hook(
+                log=log,
+                output=output,
+                usage_report=usage_report,
+                tool_logs=tool_logs,
+                timings=self.timings.as_dict(),
+            )
+        logger.info(f"timings: {self.timings.as_dict()['total']}")
+        self.report_metrics("succeeded" if exit_value == zoo.SERVICE_SUCCEEDED else "failed")
+        self.remove_journal()
 
         self.update_status(
             progress=100,
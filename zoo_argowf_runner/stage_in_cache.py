@@ -0,0 +1,304 @@
+# Description: This file contains the shared stage-in cache: remote assets (e.g. the STAC assets staged in by
+# each job) kept on a volume shared by the workflows, keyed by URL and ETag and evicted least recently used first.
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attr
+
+# name of the workflow volume of the cache claim
+CACHE_VOLUME = "stage-in-cache"
+
+# environment variables of the tool pods consulting the cache, see StageInCache.from_env
+CACHE_PATH_ENV = "STAGE_IN_CACHE"
+CACHE_MAX_SIZE_ENV = "STAGE_IN_CACHE_MAX_SIZE"
+CACHE_JOB_ENV = "STAGE_IN_CACHE_JOB"
+
+DEFAULT_MAX_SIZE = 50 * 1024**3
+
+STATS_KEYS = ["hits", "misses", "bytes_hit", "bytes_missed"]
+
+
+def get_cache_key(url: str, etag: Optional[str] = None) -> str:
+    """returns the key of an asset: a new ETag (or no ETag) is another entry"""
+    return hashlib.sha256(f"{url}\n{etag or ''}".encode()).hexdigest()
+
+
+def get_hit_rate(stats: Dict[str, int]) -> Optional[float]:
+    """returns the share of the lookups found in the cache, None without lookups"""
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    return round(stats.get("hits", 0) / lookups, 4) if lookups else None
+
+
+class StageInCache:
+    """
+    Cache of remote assets in a directory shared by the jobs (e.g. a ReadWriteMany volume).
+
+    The entries are files named after their key in 'objects', the index ('index.json') lists
+    them least recently used first with their URL, ETag and size. The index is read and
+    replaced under an exclusive lock file, the entries are written to a temporary file and
+    renamed so that a reader never sees a partial asset. The lookups of each job are counted
+    in 'stats/<job>.json'.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """
+        :param directory: Directory of the cache.
+        :param max_size: Size (in bytes) above which the least recently used entries are evicted.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = os.path.join(directory, "objects")
+        self.stats_dir = os.path.join(directory, "stats")
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.stats_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["StageInCache"]:
+        """
+        Returns the cache of STAGE_IN_CACHE (set in the tool pods by the runner), None if not set:
+        the stage-in downloads the assets.
+        """
+        directory = os.environ.get(CACHE_PATH_ENV)
+        if not directory:
+            return None
+        return cls(directory, max_size=int(os.environ.get(CACHE_MAX_SIZE_ENV, DEFAULT_MAX_SIZE)))
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key)
+
+    @contextmanager
+    def locked_index(self):
+        """holds the lock of the index and yields it, the changes are saved when the block exits"""
+        with open(f"{self.index_path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.index_path) as stream:
+                        index = json.load(stream)
+                except (OSError, ValueError):
+                    index = {}
+
+                yield index
+
+                self.replace(self.index_path, json.dumps(index).encode())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def replace(self, path: str, payload: bytes) -> None:
+        """writes a file atomically"""
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".cache-", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as stream:
+                stream.write(payload)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def lookup(self, url: str, etag: Optional[str] = None, job: Optional[str] = None) -> Optional[str]:
+        """
+        Looks up an asset and marks it as the most recently used.
+
+        :param url: URL of the asset.
+        :param etag: ETag of the asset.
+        :param job: Job (workflow name) the lookup is counted for.
+        :return: The path of the cached asset, None if it is not cached.
+        """
+        key = get_cache_key(url, etag)
+        with self.locked_index() as index:
+            entry = index.pop(key, None)
+            if entry is not None and os.path.exists(self.get_path(key)):
+                # the entries are kept least recently used first
+                index[key] = entry
+
+        if key not in index:
+            self.count(job, hit=False)
+            return None
+
+        self.count(job, hit=True, size=index[key]["size"])
+        return self.get_path(key)
+
+    def add(self, url: str, etag: Optional[str], path: str, job: Optional[str] = None) -> str:
+        """
+        Adds a downloaded asset, evicting the least recently used entries above the maximum size.
+
+        :param url: URL of the asset.
+        :param etag: ETag of the asset.
+        :param path: Path of the downloaded asset, copied into the cache.
+        :param job: Job (workflow name) the download is counted for.
+        :return: The path of the cached asset, path itself if it is larger than the cache.
+        """
+        size = os.path.getsize(path)
+        self.count(job, hit=False, size=size, lookup=False)
+        if size > self.max_size:
+            return path
+
+        key = get_cache_key(url, etag)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as target, open(path, "rb") as source:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(temporary_path, self.get_path(key))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        with self.locked_index() as index:
+            index.pop(key, None)
+            index[key] = {"url": url, "etag": etag, "size": size}
+            evicted = self.evict(index)
+
+        for evicted_key in evicted:
+            try:
+                os.unlink(self.get_path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+        return self.get_path(key)
+
+    def evict(self, index: dict) -> List[str]:
+        """removes the least recently used entries of the index above the maximum size and returns their keys"""
+        total = sum(entry["size"] for entry in index.values())
+        evicted = []
+        for key in list(index):
+            if total <= self.max_size:
+                break
+            total -= index.pop(key)["size"]
+            evicted.append(key)
+        return evicted
+
+    def fetch(
+        self,
+        url: str,
+        etag: Optional[str],
+        download: Callable[[str], None],
+        target: str,
+        job: Optional[str] = None,
+    ) -> bool:
+        """
+        Copies an asset from the cache, or downloads it and adds it to the cache.
+
+        :param url: URL of the asset.
+        :param etag: ETag of the asset (e.g. from a HEAD request).
+        :param download: Function downloading the asset to a path.
+        :param target: Path the asset is written to.
+        :param job: Job (workflow name) the lookup is counted for.
+        :return: Whether the asset was cached.
+        """
+        if (path := self.lookup(url, etag, job)) is not None:
+            try:
+                shutil.copyfile(path, target)
+                return True
+            except FileNotFoundError:
+                # evicted by another job in the meantime
+                pass
+
+        download(target)
+        self.add(url, etag, target, job)
+        return False
+
+    def get_stats_path(self, job: str) -> str:
+        return os.path.join(self.stats_dir, f"{job}.json")
+
+    def count(self, job: Optional[str], hit: bool, size: int = 0, lookup: bool = True) -> None:
+        """counts a lookup (and the bytes hit or downloaded) of a job"""
+        job = job or os.environ.get(CACHE_JOB_ENV)
+        if not job:
+            return
+
+        with open(f"{self.get_stats_path(job)}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                stats = self.get_stats(job)
+                if lookup:
+                    stats["hits" if hit else "misses"] += 1
+                stats["bytes_hit" if hit else "bytes_missed"] += size
+                self.replace(self.get_stats_path(job), json.dumps(stats).encode())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def get_stats(self, job: str) -> Dict[str, int]:
+        """returns the lookups of a job: hits, misses, bytes_hit and bytes_missed"""
+        try:
+            with open(self.get_stats_path(job)) as stream:
+                stats = json.load(stream)
+        except (OSError, ValueError):
+            stats = {}
+        return {key: int(stats.get(key, 0)) for key in STATS_KEYS}
+
+    def remove_stats(self, job: str) -> None:
+        """removes the lookups of a job once they are reported"""
+        for path in [self.get_stats_path(job), f"{self.get_stats_path(job)}.lock"]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+@attr.s(frozen=True)
+class StageInCacheVolume:
+    """The cache claim mounted in the workflows and, optionally, on the Zoo host to report the hit rates."""
+
+    claim_name = attr.ib()
+    mount_path = attr.ib(default="/stage-in-cache")
+    max_size = attr.ib(default=DEFAULT_MAX_SIZE)
+    # where the Zoo host mounts the claim, the hit rates are not reported if None
+    local_path = attr.ib(default=None)
+
+    @classmethod
+    def from_env(cls) -> Optional["StageInCacheVolume"]:
+        """returns the cache of ARGO_WF_STAGE_IN_CACHE_CLAIM, None if not set"""
+        claim_name = os.environ.get("ARGO_WF_STAGE_IN_CACHE_CLAIM")
+        if not claim_name:
+            return None
+
+        return cls(
+            claim_name=claim_name,
+            mount_path=os.environ.get("ARGO_WF_STAGE_IN_CACHE_PATH", "/stage-in-cache"),
+            max_size=int(os.environ.get("ARGO_WF_STAGE_IN_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE)),
+            local_path=os.environ.get("ARGO_WF_STAGE_IN_CACHE_DIR") or None,
+        )
+
+    def get_env_vars(self, workflow_name: str) -> Dict[str, str]:
+        """returns the environment variables telling the stage-in of a workflow to consult the cache"""
+        return {
+            CACHE_PATH_ENV: self.mount_path,
+            CACHE_MAX_SIZE_ENV: str(self.max_size),
+            CACHE_JOB_ENV: workflow_name,
+        }
+
+    def get_parameters(self) -> List[Tuple[str, str]]:
+        """returns the argo-cwl-runner parameters mounting the claim in the Calrissian pod"""
+        return [("stage_in_cache_claim", self.claim_name), ("stage_in_cache_path", self.mount_path)]
+
+    def get_local_cache(self) -> Optional[StageInCache]:
+        """returns the cache mounted on the Zoo host, None if it is not"""
+        if self.local_path is None:
+            return None
+        return StageInCache(self.local_path, max_size=self.max_size)
+
+
+def add_cache_report(usage_report: Optional[str], stats: Dict[str, int]) -> Optional[str]:
+    """
+    Adds the lookups of the stage-in cache to a Calrissian usage report.
+
+    :param usage_report: The usage report in JSON.
+    :param stats: The lookups of the job, see StageInCache.get_stats.
+    :return: The usage report with a 'stage_in_cache' entry, unchanged if it cannot be parsed.
+    """
+    try:
+        report = json.loads(usage_report)
+    except (TypeError, ValueError):
+        return usage_report
+    if not isinstance(report, dict):
+        return usage_report
+
+    report["stage_in_cache"] = {**stats, "hit_rate": get_hit_rate(stats)}
+    return json.dumps(report)
@@ -6,6 +6,7 @@ from hera.workflows import (
 )
 
 from hera.workflows.models import (
+    Affinity,
     Arguments,
     Artifact,
     ConfigMapKeySelector,
@@ -14,19 +15,25 @@ from hera.workflows.models import (
     ParallelSteps,
     Parameter,
     PersistentVolumeClaim,
+    PodGC,
     ScriptTemplate,
     SemaphoreRef,
     Synchronization,
     Template,
     TemplateRef,
+    Toleration,
+    TTLStrategy,
     ValueFrom,
     Volume,
+    VolumeClaimGC,
     WorkflowStep,
 )
 
 from typing import Optional, Union
 from typing import List, Dict
 
+from zoo_argowf_runner.zoo_helpers import PodPlacement
+
 
 class WorkflowTemplates:
     """
@@ -181,8 +188,15 @@ class WorkflowTemplates:
         volume_claim_template: Optional[List[PersistentVolumeClaim]] = None,
         secret_volume: Optional[List[Volume]] = None,
         config_map_volume: Optional[List[Volume]] = None,
+        persistent_volume: Optional[List[Volume]] = None,
         templates: Optional[List[Template]] = None,
         namespace: Optional[str] = None,
+        pod_placement: Optional[PodPlacement] = None,
+        priority: Optional[int] = None,
+        active_deadline_seconds: Optional[int] = None,
+        labels: Optional[Dict] = None,
+        gc_policy: Optional[Dict] = None,
+        on_exit: Optional[str] = None,
     ) -> Workflow:
         """
         Generates an Argo Workflow.
@@ -197,8 +211,15 @@ class WorkflowTemplates:
             volume_claim_template (Optional[List[PersistentVolumeClaim]]): PVC templates.
             secret_volume (Optional[List[Volume]]): Secret volumes.
             config_map_volume (Optional[List[Volume]]): ConfigMap volumes.
+            persistent_volume (Optional[List[Volume]]): Volumes of existing PersistentVolumeClaims.
             templates (Optional[List[Template]]): Workflow templates.
             namespace (Optional[str]): Kubernetes namespace for the workflow.
+            pod_placement (Optional[PodPlacement]): Placement hints applied to all the workflow pods.
+            priority (Optional[int]): Workflow priority, Argo also uses it to order the semaphore queue.
+            active_deadline_seconds (Optional[int]): Time after which Argo fails the running workflow.
+            labels (Optional[Dict]): Workflow labels.
+            gc_policy (Optional[Dict]): ttlStrategy, podGC and volumeClaimGC manifests of the workflow.
+            on_exit (Optional[str]): Exit handler template, run when the workflow completes.
 
         Returns:
             Workflow: A fully constructed workflow object.
@@ -210,11 +231,17 @@ class WorkflowTemplates:
             volumes.extend(secret_volume)
         if config_map_volume:
             volumes.extend(config_map_volume)
+        if persistent_volume:
+            volumes.extend(persistent_volume)
+
+        placement = pod_placement or PodPlacement()
+        gc_policy = gc_policy or {}
 
         return Workflow(
             name=name,
             entrypoint=entrypoint,
             annotations=annotations,
+            labels=labels or None,
             namespace=namespace,
             service_account_name=service_account_name,
             synchronization=synchronization,
@@ -222,4 +249,20 @@ class WorkflowTemplates:
             volume_claim_templates=volume_claim_template,
             volumes=volumes,
             templates=templates,
+            node_selector=placement.node_selector or None,
+            affinity=Affinity.parse_obj(placement.affinity) if placement.affinity else None,
+            tolerations=[Toleration.parse_obj(toleration) for toleration in placement.tolerations]
+            if placement.tolerations
+            else None,
+            pod_priority_class_name=placement.priority_class or None,
+            priority=priority,
+            active_deadline_seconds=active_deadline_seconds,
+            ttl_strategy=TTLStrategy.parse_obj(gc_policy["ttlStrategy"])
+            if "ttlStrategy" in gc_policy
+            else None,
+            pod_gc=PodGC.parse_obj(gc_policy["podGC"]) if "podGC" in gc_policy else None,
+            volume_claim_gc=VolumeClaimGC.parse_obj(gc_policy["volumeClaimGC"])
+            if "volumeClaimGC" in gc_policy
+            else None,
+            on_exit=on_exit,
         )
\ No newline at end of file
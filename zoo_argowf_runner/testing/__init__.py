@@ -0,0 +1,4 @@
+from zoo_argowf_runner.testing.fake_argo import FakeArgoServer
+from zoo_argowf_runner.testing.fake_s3 import FakeS3Server
+
+__all__ = ["FakeArgoServer", "FakeS3Server"]
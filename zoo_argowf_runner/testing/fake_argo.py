@@ -0,0 +1,627 @@
+# Description: This file contains an in-process fake argo-server used by the tests and the benchmarks.
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+from zoo_argowf_runner.manifest import ARTIFACT_OUTPUTS
+from zoo_argowf_runner.notify import CALLBACK_URL_ENV, NOTIFY_TEMPLATE
+from zoo_argowf_runner.outputs_bundle import (
+    CALRISSIAN_LOG,
+    CALRISSIAN_OUTPUTS,
+    CALRISSIAN_TOOL_LOGS,
+    OUTPUTS_BUNDLE_TEMPLATE,
+    write_outputs_bundle,
+)
+from zoo_argowf_runner.testing.fake_s3 import FakeS3Server, get_range
+
+ARTIFACTS_BUCKET = "argo-artifacts"
+
+COMPLETED_PHASES = ["Succeeded", "Failed", "Error"]
+
+
+def get_template(workflow: dict, name: str) -> Optional[dict]:
+    """returns a template of a workflow, None if it does not have it"""
+    return next(
+        (template for template in workflow.get("spec", {}).get("templates", []) if template.get("name") == name),
+        None,
+    )
+
+
+def format_time(value: datetime) -> str:
+    """returns an RFC 3339 timestamp, with microseconds unlike argo-server to measure sub-second lags"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def match_labels(selector: str, labels: dict) -> bool:
+    """matches the labels with a label selector of equality (=, ==, !=) and existence requirements"""
+    for requirement in filter(None, selector.split(",")):
+        if "!=" in requirement:
+            key, value = requirement.split("!=")
+            if labels.get(key) == value:
+                return False
+        elif "=" in requirement:
+            key, value = requirement.replace("==", "=").split("=")
+            if labels.get(key) != value:
+                return False
+        elif requirement.startswith("!"):
+            if requirement[1:] in labels:
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+
+class FakeArgoServer:
+    """
+    Minimal in-process argo-server.
+
+    It serves the version, create, get and list workflows, workflow events stream,
+    workflow logs and artifact-files endpoints of the Argo Workflows API.
+
+    A created workflow is Running for run_duration seconds with its nodes completing one
+    after the other, then reaches the final phase with the outputs of the argo-cwl-runner
+    WorkflowTemplate. With outputs set to 'artifacts', the large outputs are gzip compressed
+    artifacts stored in the s3 artifact repository and served by the artifact-files endpoint.
+    The workflows with the outputs-bundle exit handler get an exit handler node whose outputs
+    bundle is stored in the s3 artifact repository too. The workflows with the notify-completion
+    exit handler post their phase to its callback URL when they complete (or are stopped).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        run_duration: float = 0.0,
+        nodes: int = 1,
+        payload_size: int = 1024,
+        final_phase: str = "Succeeded",
+        archive: bool = False,
+        outputs: str = "parameters",
+        s3: Optional[FakeS3Server] = None,
+        token: Optional[str] = None,
+    ) -> None:
+        """
+        :param latency: Delay (in seconds) added to every response.
+        :param run_duration: Time (in seconds) a workflow is Running before completing.
+        :param nodes: Number of pod nodes (CWL steps) of a workflow.
+        :param payload_size: Size (in bytes) of the outputs, logs and artifacts.
+        :param final_phase: Phase reached by the workflows at completion.
+        :param archive: Whether the workflows deleted by their ttlStrategy are kept in the workflow archive.
+        :param outputs: How the large outputs are delivered, 'parameters' or 'artifacts' (see ARGO_WF_OUTPUTS).
+        :param s3: Artifact repository of the workflows, required with artifacts outputs and outputs bundles.
+        :param token: Bearer token the requests must send, not checked if None.
+        """
+        if outputs == "artifacts" and s3 is None:
+            raise ValueError("An s3 artifact repository is required with artifacts outputs")
+
+        self.healthy = True
+        self.latency = latency
+        self.run_duration = run_duration
+        self.nodes = nodes
+        self.payload_size = payload_size
+        self.final_phase = final_phase
+        self.archive = archive
+        self.outputs = outputs
+        self.s3 = s3
+        self.token = token
+        self.archived = {}
+        self.workflows = {}
+        self.requests = []
+
+        self.started = {}
+        # notifications posted by the exit handlers: workflow name, phase and response status
+        self.notifications = []
+        self.timers = {}
+        self.lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, content_type="application/json", headers=None):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def is_authorized(self):
+                return fake.token is None or self.headers.get("Authorization") == f"Bearer {fake.token}"
+
+            def do_GET(self):
+                fake.requests.append(("GET", self.path))
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+                if not fake.healthy:
+                    return self.reply(503, {"message": "unavailable"})
+                if not self.is_authorized():
+                    return self.reply(401, {"message": "Unauthorized"})
+
+                if url.path == "/api/v1/version":
+                    return self.reply(200, {"version": "v3.5.0"})
+
+                # an empty namespace lists the workflows of all the namespaces
+                if match := re.fullmatch(r"/api/v1/workflows/([^/]*)", url.path):
+                    selector = query.get("listOptions.labelSelector", "")
+                    items = [
+                        {"metadata": wf["metadata"], "status": {"phase": wf["status"]["phase"]}}
+                        for (namespace, name), wf in fake.snapshot().items()
+                        if match.group(1) in ["", namespace]
+                        and match_labels(selector, wf["metadata"]["labels"])
+                    ]
+                    return self.reply(200, {"items": items})
+
+                if match := re.fullmatch(r"/api/v1/workflows/([^/]+)/([^/]+)", url.path):
+                    workflow = fake.get_workflow(*match.groups())
+                    if workflow is None:
+                        return self.reply(404, {"message": "not found"})
+                    return self.reply(200, workflow)
+
+                if match := re.fullmatch(r"/api/v1/workflows/([^/]+)/([^/]+)/log", url.path):
+                    if fake.get_workflow(*match.groups()) is None:
+                        return self.reply(404, {"message": "not found"})
+                    return self.reply(
+                        200,
+                        fake.get_log(match.group(2)),
+                        content_type="application/json",
+                    )
+
+                if url.path == "/api/v1/archived-workflows" and fake.archive:
+                    selector = dict(
+                        requirement.split("=", 1)
+                        for requirement in query.get("listOptions.fieldSelector", "").split(",")
+                        if requirement
+                    )
+                    items = [
+                        {"metadata": wf["metadata"]}
+                        for wf in fake.archived.values()
+                        if all(wf["metadata"].get(key.split(".")[-1]) == value for key, value in selector.items())
+                    ]
+                    return self.reply(200, {"items": items})
+
+                if match := re.fullmatch(r"/api/v1/archived-workflows/([^/]+)", url.path):
+                    if not fake.archive or match.group(1) not in fake.archived:
+                        return self.reply(404, {"message": "not found"})
+                    return self.reply(200, fake.archived[match.group(1)])
+
+                if match := re.fullmatch(r"/api/v1/workflow-events/([^/]+)", url.path):
+                    name = query.get("listOptions.fieldSelector", "").replace(
+                        "metadata.name=", ""
+                    )
+                    return self.stream_events(match.group(1), name)
+
+                if match := re.fullmatch(
+                    r"/artifact-files/([^/]+)/workflows/([^/]+)/([^/]+)/outputs/(.+)", url.path
+                ):
+                    # the artifacts of archived workflows are served too
+                    workflow = fake.find_workflow(*match.groups()[:2])
+                    if workflow is None:
+                        return self.reply(404, {"message": "not found"})
+                    if (key := fake.get_artifact_key(workflow, *match.groups()[2:])) is not None:
+                        payload = fake.s3.get_object(ARTIFACTS_BUCKET, key)
+                        if payload is None:
+                            return self.reply(404, {"message": "not found"})
+                        status, payload, headers = get_range(payload, self.headers.get("Range"))
+                        return self.reply(
+                            status, payload, content_type=headers.pop("Content-Type", "text/plain"), headers=headers
+                        )
+                    return self.reply(
+                        200, fake.get_payload(match.group(4)), content_type="text/plain"
+                    )
+
+                self.reply(404, {"message": "not found"})
+
+            def stream_events(self, namespace, name):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                last = None
+                while True:
+                    workflow = fake.get_workflow(namespace, name)
+                    if workflow is None:
+                        return
+                    state = (workflow["status"]["phase"], workflow["status"]["progress"])
+                    if state != last:
+                        event = {"result": {"type": "MODIFIED", "object": workflow}}
+                        try:
+                            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                            self.wfile.flush()
+                        except (BrokenPipeError, ConnectionResetError):
+                            return
+                        last = state
+                    if workflow["status"]["phase"] in COMPLETED_PHASES:
+                        return
+                    time.sleep(0.01)
+
+            def do_POST(self):
+                fake.requests.append(("POST", self.path))
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+                if not fake.healthy:
+                    return self.reply(503, {"message": "unavailable"})
+                if not self.is_authorized():
+                    return self.reply(401, {"message": "Unauthorized"})
+
+                if match := re.fullmatch(r"/api/v1/workflows/([^/]+)", self.path):
+                    name = body["workflow"]["metadata"]["name"]
+                    if fake.get_workflow(match.group(1), name) is not None:
+                        return self.reply(
+                            409, {"code": 6, "message": f'workflows.argoproj.io "{name}" already exists'}
+                        )
+                    return self.reply(200, fake.create_workflow(match.group(1), body["workflow"]))
+
+                self.reply(404, {"message": "not found"})
+
+            def do_PUT(self):
+                fake.requests.append(("PUT", self.path))
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                if not fake.healthy:
+                    return self.reply(503, {"message": "unavailable"})
+                if not self.is_authorized():
+                    return self.reply(401, {"message": "Unauthorized"})
+
+                if match := re.fullmatch(
+                    r"/api/v1/workflows/([^/]+)/([^/]+)/(stop|terminate)", self.path
+                ):
+                    workflow = fake.cancel_workflow(*match.groups())
+                    if workflow is None:
+                        return self.reply(404, {"message": "not found"})
+                    return self.reply(200, workflow)
+
+                self.reply(404, {"message": "not found"})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> "FakeArgoServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        for timer in list(self.timers.values()):
+            timer.cancel()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self) -> dict:
+        """returns the workflows with their current status"""
+        with self.lock:
+            keys = list(self.workflows.keys())
+        snapshot = {key: self.get_workflow(*key) for key in keys}
+        return {key: workflow for key, workflow in snapshot.items() if workflow is not None}
+
+    def find_workflow(self, namespace: str, name: str) -> Optional[dict]:
+        """returns a workflow, from the workflow archive if it was deleted"""
+        workflow = self.get_workflow(namespace, name)
+        if workflow is None:
+            workflow = next(
+                (
+                    wf
+                    for wf in self.archived.values()
+                    if (wf["metadata"]["namespace"], wf["metadata"]["name"]) == (namespace, name)
+                ),
+                None,
+            )
+        return workflow
+
+    def get_payload(self, name: str) -> bytes:
+        """returns a payload_size bytes payload"""
+        line = f"{name} output line\n".encode()
+        return (line * (self.payload_size // len(line) + 1))[: self.payload_size]
+
+    def get_log(self, name: str) -> bytes:
+        """returns the workflow logs as the log endpoint streams them, one JSON object per line"""
+        lines = self.get_payload(name).decode().splitlines()
+        return "".join(
+            json.dumps({"result": {"content": line, "podName": f"{name}-{index % self.nodes}"}})
+            + "\n"
+            for index, line in enumerate(lines)
+        ).encode()
+
+    def get_output_values(self, workflow: dict) -> dict:
+        """returns the values of the outputs of the argo-cwl-runner WorkflowTemplate"""
+        name = workflow["metadata"]["name"]
+        usage_report = {
+            "children": [{"name": f"step-{index}"} for index in range(self.nodes)]
+        }
+        feature_collection = {
+            "type": "FeatureCollection",
+            "features": [],
+            "padding": self.get_payload(name).decode(),
+        }
+
+        return {
+            "results": json.dumps({"stac": f"s3://results/{name}"}),
+            "log": self.get_payload(name).decode(),
+            "usage-report": json.dumps(usage_report),
+            "stac-catalog": f"s3://results/{name}/catalog.json",
+            "feature-collection": json.dumps(feature_collection),
+            "outcome": "succeeded" if self.final_phase == "Succeeded" else "failure",
+        }
+
+    def get_outputs(self, workflow: dict) -> dict:
+        """returns the output parameters (and artifacts) of the argo-cwl-runner WorkflowTemplate"""
+        name = workflow["metadata"]["name"]
+        values = self.get_output_values(workflow)
+
+        artifacts = []
+        if self.s3 is not None:
+            # a directory artifact (archive none), one object per tool log
+            s3_key = f"{name}-{workflow['metadata']['uid']}-artifacts/tool-logs"
+            for index in range(self.nodes):
+                self.s3.put_object(
+                    ARTIFACTS_BUCKET,
+                    f"{s3_key}/step-{index}.log",
+                    self.get_payload(f"tool-logs/step-{index}.log"),
+                )
+            artifacts.append({"name": "tool-logs", "s3": {"key": s3_key}})
+
+        if self.outputs != "artifacts":
+            outputs = {"parameters": [{"name": key, "value": value} for key, value in values.items()]}
+            if artifacts:
+                outputs["artifacts"] = artifacts
+            return outputs
+
+        for key in ARTIFACT_OUTPUTS:
+            s3_key = f"{name}-{workflow['metadata']['uid']}-artifacts/{key}.gz"
+            if self.s3.get_object(ARTIFACTS_BUCKET, s3_key) is None:
+                self.s3.put_object(ARTIFACTS_BUCKET, s3_key, gzip.compress(values[key].encode()))
+            artifacts.append({"name": key, "s3": {"key": s3_key}})
+
+        return {
+            "artifacts": artifacts,
+            "parameters": [
+                {"name": key, "value": value}
+                for key, value in values.items()
+                if key not in ARTIFACT_OUTPUTS
+            ],
+        }
+
+    def get_artifact_repository(self) -> Optional[dict]:
+        """returns the artifact repository of the workflows as in their status"""
+        if self.s3 is None:
+            return None
+        return {
+            "default": True,
+            "artifactRepository": {
+                "s3": {
+                    "bucket": ARTIFACTS_BUCKET,
+                    "endpoint": self.s3.url.split("://", 1)[1],
+                    "insecure": True,
+                    "region": self.s3.region,
+                    "accessKeySecret": {"name": "argo-artifacts", "key": "accesskey"},
+                    "secretKeySecret": {"name": "argo-artifacts", "key": "secretkey"},
+                }
+            },
+        }
+
+    @staticmethod
+    def get_artifact_key(workflow: dict, node_id: str, path: str) -> Optional[str]:
+        """returns the s3 key of an output artifact (or of a file of a directory artifact) of a node"""
+        node = workflow.get("status", {}).get("nodes", {}).get(node_id, {})
+        name, _, file_path = path.partition("/")
+        for artifact in node.get("outputs", {}).get("artifacts", []):
+            if artifact["name"] == name and "s3" in artifact:
+                return f"{artifact['s3']['key']}/{file_path}" if file_path else artifact["s3"]["key"]
+        return None
+
+    def get_exit_node(self, workflow: dict, phase: str) -> dict:
+        """returns the node of the exit handler writing the outputs bundle, stored in s3"""
+        name = workflow["metadata"]["name"]
+        # the files of the calrissian-wdir volume
+        outputs = self.get_output_values(workflow)
+
+        key = f"{name}-{workflow['metadata']['uid']}-artifacts/{OUTPUTS_BUNDLE_TEMPLATE}"
+        with tempfile.TemporaryDirectory() as wdir:
+            os.makedirs(os.path.join(wdir, CALRISSIAN_TOOL_LOGS))
+            for output, file_name in CALRISSIAN_OUTPUTS.items():
+                with open(os.path.join(wdir, file_name), "w") as stream:
+                    stream.write(outputs[output])
+            with open(os.path.join(wdir, CALRISSIAN_LOG), "w") as stream:
+                stream.write(outputs["log"])
+            for index in range(self.nodes):
+                with open(os.path.join(wdir, CALRISSIAN_TOOL_LOGS, f"step-{index}.log"), "wb") as stream:
+                    stream.write(self.get_payload(f"tool-logs/step-{index}.log"))
+
+            write_outputs_bundle(
+                os.path.join(wdir, "bundle"),
+                phase,
+                {output: os.path.join(wdir, file_name) for output, file_name in CALRISSIAN_OUTPUTS.items()},
+                os.path.join(wdir, CALRISSIAN_LOG),
+                os.path.join(wdir, CALRISSIAN_TOOL_LOGS),
+            )
+            with open(os.path.join(wdir, "bundle"), "rb") as stream:
+                self.s3.put_object(ARTIFACTS_BUCKET, key, stream.read())
+
+        return {
+            "id": f"{name}-exit",
+            "name": f"{name}.onExit",
+            "displayName": f"{name}.onExit",
+            "templateName": OUTPUTS_BUNDLE_TEMPLATE,
+            "type": "Pod",
+            "phase": "Succeeded",
+            "outputs": {"artifacts": [{"name": OUTPUTS_BUNDLE_TEMPLATE, "s3": {"key": key}}]},
+        }
+
+    def create_workflow(self, namespace: str, workflow: dict) -> dict:
+        """stores a submitted workflow"""
+        name = workflow["metadata"]["name"]
+        workflow["metadata"]["namespace"] = namespace
+        workflow["metadata"].setdefault("labels", {})
+        workflow["metadata"]["creationTimestamp"] = format_time(datetime.now(timezone.utc))
+        workflow["metadata"]["uid"] = str(uuid.uuid4())
+        workflow["status"] = {"phase": "Pending", "progress": f"0/{self.nodes}"}
+
+        with self.lock:
+            self.workflows[(namespace, name)] = workflow
+            self.started[(namespace, name)] = (time.monotonic(), datetime.now(timezone.utc))
+
+            if get_template(workflow, NOTIFY_TEMPLATE) is not None:
+                timer = threading.Timer(self.run_duration, self.notify_completion, (namespace, name))
+                timer.daemon = True
+                self.timers[(namespace, name)] = timer
+                timer.start()
+
+        return self.get_workflow(namespace, name)
+
+    def notify_completion(self, namespace: str, name: str) -> None:
+        """runs the notify-completion exit handler of a completed workflow"""
+        self.timers.pop((namespace, name), None)
+        workflow = self.get_workflow(namespace, name)
+        if workflow is None:
+            return
+
+        url = next(
+            env["value"]
+            for env in get_template(workflow, NOTIFY_TEMPLATE)["script"]["env"]
+            if env["name"] == CALLBACK_URL_ENV
+        )
+        request = Request(
+            url,
+            data=json.dumps(
+                {"name": name, "uid": workflow["metadata"]["uid"], "phase": workflow["status"]["phase"]}
+            ).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urlopen(request, timeout=10) as response:
+                status = response.status
+        except OSError as exc:
+            status = getattr(exc, "code", None)
+        self.notifications.append((name, workflow["status"]["phase"], status))
+
+    @staticmethod
+    def get_ttl(workflow: dict) -> Optional[float]:
+        """returns the time (in seconds) a completed workflow is kept according to its ttlStrategy"""
+        ttl_strategy = workflow.get("spec", {}).get("ttlStrategy") or {}
+        key = "secondsAfterSuccess" if workflow["status"]["phase"] == "Succeeded" else "secondsAfterFailure"
+        return ttl_strategy.get(key, ttl_strategy.get("secondsAfterCompletion"))
+
+    def cancel_workflow(self, namespace: str, name: str, mode: str) -> Optional[dict]:
+        """stops or terminates a workflow, it fails right away"""
+        workflow = self.get_workflow(namespace, name)
+        if workflow is None:
+            return None
+
+        with self.lock:
+            if self.started.pop((namespace, name), None) is not None:
+                workflow["status"]["phase"] = "Failed"
+                workflow["status"]["message"] = f"Stopped with strategy '{mode.capitalize()}'"
+                workflow["status"]["finishedAt"] = format_time(datetime.now(timezone.utc))
+                workflow["metadata"]["labels"]["workflows.argoproj.io/completed"] = "true"
+
+            timer = self.timers.pop((namespace, name), None)
+
+        if timer is not None:
+            timer.cancel()
+            # stopped workflows run their exit handlers, terminated workflows do not
+            if mode == "stop":
+                threading.Thread(target=self.notify_completion, args=(namespace, name), daemon=True).start()
+
+        return workflow
+
+    def get_workflow(self, namespace: str, name: str) -> Optional[dict]:
+        """returns a workflow with its status at the current time"""
+        with self.lock:
+            workflow = self.workflows.get((namespace, name))
+
+            # workflows added by the tests keep their status
+            if workflow is None or (namespace, name) not in self.started:
+                return workflow
+
+            started, started_at = self.started[(namespace, name)]
+            elapsed = time.monotonic() - started
+            if elapsed >= self.run_duration:
+                completed_nodes = self.nodes
+                phase = self.final_phase
+            else:
+                completed_nodes = int(self.nodes * elapsed / self.run_duration)
+                phase = "Running"
+
+            # the steps run one after the other, the next steps are not created yet
+            step_duration = timedelta(seconds=self.run_duration / self.nodes)
+            nodes = {}
+            for index in range(min(completed_nodes + 1, self.nodes)):
+                nodes[f"{name}-{index}"] = {
+                    "id": f"{name}-{index}",
+                    "name": f"{name}.step-{index}",
+                    "displayName": f"step-{index}",
+                    "templateName": f"step-{index}",
+                    "type": "Pod",
+                    "phase": "Succeeded" if index < completed_nodes else "Running",
+                    "startedAt": format_time(started_at + index * step_duration),
+                }
+                if index < completed_nodes:
+                    nodes[f"{name}-{index}"]["finishedAt"] = format_time(
+                        started_at + (index + 1) * step_duration
+                    )
+
+            node = {"id": name, "name": name, "type": "Steps", "phase": phase}
+            if phase in COMPLETED_PHASES:
+                # the outputs are produced once, at completion
+                previous = workflow["status"].get("nodes", {}).get(name, {})
+                node["outputs"] = previous.get("outputs") or self.get_outputs(workflow)
+                workflow["metadata"]["labels"]["workflows.argoproj.io/completed"] = "true"
+            nodes[name] = node
+
+            on_exit = workflow.get("spec", {}).get("onExit")
+            if phase in COMPLETED_PHASES and (
+                on_exit == OUTPUTS_BUNDLE_TEMPLATE
+                or (on_exit and get_template(workflow, OUTPUTS_BUNDLE_TEMPLATE) is not None)
+            ):
+                # the exit handler runs once
+                nodes[f"{name}-exit"] = workflow["status"].get("nodes", {}).get(
+                    f"{name}-exit"
+                ) or self.get_exit_node(workflow, phase)
+
+            workflow["status"] = {
+                "phase": phase,
+                "progress": f"{completed_nodes}/{self.nodes}",
+                "startedAt": format_time(started_at),
+                "nodes": nodes,
+            }
+            if self.s3 is not None:
+                workflow["status"]["artifactRepositoryRef"] = self.get_artifact_repository()
+            if phase in COMPLETED_PHASES:
+                workflow["status"]["finishedAt"] = format_time(
+                    started_at + timedelta(seconds=self.run_duration)
+                )
+
+                ttl = self.get_ttl(workflow)
+                if ttl is not None and elapsed >= self.run_duration + ttl:
+                    # deleted by the controller, and archived
+                    del self.workflows[(namespace, name)]
+                    del self.started[(namespace, name)]
+                    if self.archive:
+                        self.archived[workflow["metadata"]["uid"]] = workflow
+                    return None
+
+            return workflow
@@ -0,0 +1,207 @@
+# Description: This file contains an in-process fake S3-compatible object store (the artifact repository)
+# used by the tests and the benchmarks.
+import hashlib
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+def get_range(payload: bytes, range_header: Optional[str]) -> Tuple[int, bytes, dict]:
+    """returns the status, the payload and the headers of the response to a GET with a single byte range"""
+    headers = {"Content-Type": "application/octet-stream", "Accept-Ranges": "bytes"}
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header or "")
+    if match is None:
+        return 200, payload, headers
+
+    size = len(payload)
+    first, last = match.groups()
+    if not first:
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first >= size:
+        return 416, b"", {"Content-Range": f"bytes */{size}"}
+
+    headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    return 206, payload[first:last + 1], headers
+
+
+class FakeS3Server:
+    """
+    Minimal in-process S3-compatible object store.
+
+    It serves the path-style PUT, GET (with a single byte range) and HEAD object operations and
+    the multipart uploads. Only the access key of the signed (or presigned) requests is checked,
+    not their signature.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        region: str = "us-east-1",
+        access_key: Optional[str] = None,
+        ranges: bool = True,
+    ) -> None:
+        """
+        :param latency: Delay (in seconds) added to every response.
+        :param region: Region of the store.
+        :param access_key: Access key id the requests must be signed with, anonymous requests are allowed if None.
+        :param ranges: Whether the byte ranges are served, the whole object is sent (200) otherwise.
+        """
+        self.latency = latency
+        self.ranges = ranges
+        self.region = region
+        self.access_key = access_key
+        self.objects = {}
+        # parts of the multipart uploads in progress per upload id
+        self.uploads = {}
+        self.requests = []
+        # client addresses, one per connection
+        self.connections = set()
+        self.lock = threading.Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, payload=b"", headers=None, body=True):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(payload)
+
+            def setup(self):
+                super().setup()
+                fake.connections.add(self.client_address)
+
+            def is_authorized(self):
+                if fake.access_key is None:
+                    return True
+                credential = parse_qs(urlparse(self.path).query).get("X-Amz-Credential", [""])[0]
+                return credential.startswith(f"{fake.access_key}/") or (
+                    f"Credential={fake.access_key}/" in self.headers.get("Authorization", "")
+                )
+
+            def get_query(self):
+                return {name: values[0] for name, values in parse_qs(
+                    urlparse(self.path).query, keep_blank_values=True
+                ).items()}
+
+            def get_object(self, body):
+                fake.requests.append((self.command, self.path, dict(self.headers)))
+                if not self.is_authorized():
+                    return self.reply(403, b"<Error><Code>AccessDenied</Code></Error>", body=body)
+                bucket, key = fake.split_path(self.path)
+                payload = fake.get_object(bucket, key)
+                if payload is None:
+                    return self.reply(404, b"<Error><Code>NoSuchKey</Code></Error>", body=body)
+
+                self.reply(*get_range(payload, self.headers.get("Range") if fake.ranges else None), body=body)
+
+            def do_GET(self):
+                self.get_object(body=True)
+
+            def do_HEAD(self):
+                self.get_object(body=False)
+
+            def do_PUT(self):
+                fake.requests.append(("PUT", self.path, dict(self.headers)))
+                payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.is_authorized():
+                    return self.reply(403, b"<Error><Code>AccessDenied</Code></Error>")
+
+                etag = f'"{hashlib.md5(payload).hexdigest()}"'
+                query = self.get_query()
+                if "uploadId" in query:
+                    with fake.lock:
+                        parts = fake.uploads.get(query["uploadId"])
+                        if parts is None:
+                            return self.reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                        parts[int(query["partNumber"])] = (etag, payload)
+                else:
+                    fake.put_object(*fake.split_path(self.path), payload)
+                self.reply(200, headers={"ETag": etag})
+
+            def do_POST(self):
+                fake.requests.append(("POST", self.path, dict(self.headers)))
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.is_authorized():
+                    return self.reply(403, b"<Error><Code>AccessDenied</Code></Error>")
+
+                bucket, key = fake.split_path(self.path)
+                query = self.get_query()
+                if "uploads" in query:
+                    upload_id = uuid.uuid4().hex
+                    with fake.lock:
+                        fake.uploads[upload_id] = {}
+                    return self.reply(
+                        200,
+                        f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                        f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>".encode(),
+                    )
+
+                with fake.lock:
+                    parts = fake.uploads.pop(query.get("uploadId"), None)
+                if parts is None:
+                    return self.reply(404, b"<Error><Code>NoSuchUpload</Code></Error>")
+                completed = [
+                    (int(number), etag)
+                    for number, etag in re.findall(
+                        r"<PartNumber>(\d+)</PartNumber>\s*<ETag>([^<]+)</ETag>", body.decode()
+                    )
+                ]
+                if [parts.get(number, (None,))[0] for number, _ in completed] != [
+                    etag.replace("&quot;", '"') for _, etag in completed
+                ]:
+                    return self.reply(400, b"<Error><Code>InvalidPart</Code></Error>")
+
+                fake.put_object(bucket, key, b"".join(parts[number][1] for number, _ in completed))
+                self.reply(200, b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>")
+
+            def do_DELETE(self):
+                fake.requests.append(("DELETE", self.path, dict(self.headers)))
+                with fake.lock:
+                    fake.uploads.pop(self.get_query().get("uploadId"), None)
+                self.reply(204)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> "FakeS3Server":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def split_path(path: str):
+        """returns the bucket and the key of a path-style object URL"""
+        bucket, _, key = unquote(urlparse(path).path).lstrip("/").partition("/")
+        return bucket, key
+
+    def put_object(self, bucket: str, key: str, payload: bytes) -> None:
+        """stores an object"""
+        with self.lock:
+            self.objects[(bucket, key)] = payload
+
+    def get_object(self, bucket: str, key: str) -> Optional[bytes]:
+        """returns an object, None if it does not exist"""
+        with self.lock:
+            return self.objects.get((bucket, key))
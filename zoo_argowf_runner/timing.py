@@ -0,0 +1,107 @@
+# Description: This file contains the recorder of the wall time, API calls and bytes transferred per execution phase.
+import functools
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import attr
+
+
+@attr.s
+class PhaseTiming:
+    name = attr.ib()
+    wall_time = attr.ib(default=0.0)
+    api_calls = attr.ib(default=0)
+    bytes_sent = attr.ib(default=0)
+    bytes_received = attr.ib(default=0)
+
+
+class PhaseRecorder:
+    """
+    Records the wall time, the API calls and the bytes transferred per execution phase.
+
+    Phases may be nested, the time spent in a nested phase is not counted in the enclosing
+    phase so that the phase times add up to the total time. API calls are counted in the
+    innermost active phase.
+    """
+
+    # phase of the API calls sent out of any phase
+    UNATTRIBUTED = "unattributed"
+
+    def __init__(self) -> None:
+        self.phases = {}
+        self.stack = []
+        self.mark = time.perf_counter()
+
+    def get_phase(self, name: str) -> PhaseTiming:
+        if name not in self.phases:
+            self.phases[name] = PhaseTiming(name=name)
+        return self.phases[name]
+
+    def charge(self) -> None:
+        """adds the time elapsed since the last mark to the innermost active phase"""
+        now = time.perf_counter()
+        if self.stack:
+            self.get_phase(self.stack[-1]).wall_time += now - self.mark
+        self.mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """records the time spent in the with block under the phase name"""
+        self.charge()
+        self.stack.append(name)
+        self.get_phase(name)
+        try:
+            yield self
+        finally:
+            self.charge()
+            self.stack.pop()
+
+    def count_api_call(self, bytes_sent: int = 0, bytes_received: int = 0) -> None:
+        """counts an API call in the innermost active phase"""
+        phase = self.get_phase(self.stack[-1] if self.stack else self.UNATTRIBUTED)
+        phase.api_calls += 1
+        phase.bytes_sent += bytes_sent
+        phase.bytes_received += bytes_received
+
+    def record_response(self, response) -> None:
+        """counts the API call of a requests response with its request and response body sizes"""
+        body = response.request.body if response.request is not None else None
+        if isinstance(body, str):
+            body = body.encode()
+        self.count_api_call(
+            bytes_sent=len(body or b""), bytes_received=len(response.content or b"")
+        )
+
+    def as_dict(self) -> dict:
+        """returns the breakdown per phase, in the order the phases started, and the totals"""
+        phases = [attr.asdict(phase) for phase in self.phases.values()]
+        return {
+            "phases": phases,
+            "total": {
+                key: sum(phase[key] for phase in phases)
+                for key in ["wall_time", "api_calls", "bytes_sent", "bytes_received"]
+            },
+        }
+
+
+def timed(name: str):
+    """
+    Decorator recording the calls of a function under a phase of the PhaseRecorder
+    passed with the timings keyword argument, the calls are not recorded without it.
+
+    Args:
+        name (str): The phase name.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, timings: Optional[PhaseRecorder] = None, **kwargs):
+            if timings is None:
+                return func(*args, **kwargs)
+            with timings.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,289 @@
+# Description: This file contains the upload of the Zoo file inputs (the cache files on the Zoo host) to the
+# S3-compatible artifact repository, so that the workflow pods read them from a presigned URL.
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from loguru import logger
+
+from zoo_argowf_runner.argo_api import send_request
+from zoo_argowf_runner.artifacts import S3Location, presign_v4, sign_v4
+from zoo_argowf_runner.timing import PhaseRecorder
+
+# payload hash of the streamed requests, not read twice to be hashed
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# S3 limits of the multipart uploads
+MIN_PART_SIZE = 5 * 1024**2
+MAX_PARTS = 10000
+
+
+def get_file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """returns the hex sha256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        while chunk := stream.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_local_files(value) -> List[str]:
+    """returns the paths of the CWL File inputs (e.g. the Zoo cache files) of a value, in order and once each"""
+    paths = []
+    if isinstance(value, dict):
+        if value.get("class") == "File" and isinstance(value.get("path"), str):
+            paths.append(value["path"])
+        for item in value.values():
+            paths.extend(find_local_files(item))
+    elif isinstance(value, list):
+        for item in value:
+            paths.extend(find_local_files(item))
+    return list(dict.fromkeys(paths))
+
+
+def relocate_files(value, locations: Dict[str, str]):
+    """returns a copy of a value whose CWL File inputs read from the uploaded locations instead of their path"""
+    if isinstance(value, dict):
+        if value.get("class") == "File" and value.get("path") in locations:
+            relocated = {name: item for name, item in value.items() if name != "path"}
+            relocated["location"] = locations[value["path"]]
+            return relocated
+        return {name: relocate_files(item, locations) for name, item in value.items()}
+    if isinstance(value, list):
+        return [relocate_files(item, locations) for item in value]
+    return value
+
+
+class InputUploader:
+    """
+    Uploads the file inputs to the artifact repository.
+
+    The files are content-addressed (the key is their sha256), a file already uploaded, by this
+    job or another one, is not uploaded again. The files are uploaded concurrently, streamed
+    from disk, and in parts of part_size bytes (one part in memory at a time) above part_size.
+    """
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        endpoint: str,
+        bucket: str,
+        prefix: str = "zoo-inputs",
+        region: str = "us-east-1",
+        public_endpoint: Optional[str] = None,
+        expires: int = 604800,
+        part_size: int = 16 * 1024**2,
+        max_connections: int = 16,
+        timeout: float = 300,
+    ) -> None:
+        """
+        :param access_key: Access key id of the artifact repository.
+        :param secret_key: Secret access key of the artifact repository.
+        :param endpoint: URL of the artifact repository from the Zoo host.
+        :param bucket: Bucket of the uploaded files.
+        :param prefix: Prefix of the keys of the uploaded files.
+        :param region: Region of the artifact repository.
+        :param public_endpoint: URL of the artifact repository from the workflow pods, defaults to endpoint.
+        :param expires: Validity (in seconds) of the presigned URLs of the files, 7 days at most.
+        :param part_size: Size (in bytes) of the parts of the multipart uploads, 5 MiB at least.
+        :param max_connections: Maximum number of pooled connections and concurrent uploads.
+        :param timeout: Timeout (in seconds) of the requests.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"The parts of the multipart uploads are {MIN_PART_SIZE} bytes at least")
+
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.region = region
+        self.public_endpoint = (public_endpoint or endpoint).rstrip("/")
+        self.expires = expires
+        self.part_size = part_size
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls) -> Optional["InputUploader"]:
+        """
+        Returns the uploader of the bucket ARGO_WF_INPUTS_BUCKET with the artifact repository credentials
+        (ARGO_WF_S3_ACCESS_KEY_ID, ARGO_WF_S3_SECRET_ACCESS_KEY and ARGO_WF_S3_ENDPOINT), None if not set:
+        the file inputs are passed as paths.
+        """
+        bucket = os.environ.get("ARGO_WF_INPUTS_BUCKET")
+        access_key = os.environ.get("ARGO_WF_S3_ACCESS_KEY_ID")
+        secret_key = os.environ.get("ARGO_WF_S3_SECRET_ACCESS_KEY")
+        endpoint = os.environ.get("ARGO_WF_S3_ENDPOINT")
+
+        if not bucket:
+            return None
+        if not access_key or not secret_key or not endpoint:
+            raise ValueError(
+                "ARGO_WF_INPUTS_BUCKET requires ARGO_WF_S3_ACCESS_KEY_ID, ARGO_WF_S3_SECRET_ACCESS_KEY "
+                "and ARGO_WF_S3_ENDPOINT"
+            )
+
+        return cls(
+            access_key=access_key,
+            secret_key=secret_key,
+            endpoint=endpoint,
+            bucket=bucket,
+            prefix=os.environ.get("ARGO_WF_INPUTS_PREFIX", "zoo-inputs"),
+            region=os.environ.get("ARGO_WF_S3_REGION", "us-east-1"),
+            public_endpoint=os.environ.get("ARGO_WF_INPUTS_ENDPOINT") or None,
+            expires=int(os.environ.get("ARGO_WF_INPUTS_URL_EXPIRES", 604800)),
+            part_size=int(os.environ.get("ARGO_WF_INPUTS_PART_SIZE", 16 * 1024**2)),
+            max_connections=int(os.environ.get("ARGO_WF_S3_MAX_CONNECTIONS", 16)),
+        )
+
+    def get_location(self, digest: str) -> S3Location:
+        """returns the location of the file with a sha256"""
+        return S3Location(
+            endpoint=self.endpoint,
+            bucket=self.bucket,
+            key=f"{self.prefix}/sha256/{digest}",
+            region=self.region,
+        )
+
+    def request(self, operation: str, method: str, url: str, headers: Optional[dict] = None, **kwargs):
+        """sends a signed request to the artifact repository, the payload is not signed"""
+        return send_request(
+            operation,
+            method,
+            url,
+            session=self.session,
+            headers=sign_v4(
+                method,
+                url,
+                headers or {},
+                self.access_key,
+                self.secret_key,
+                self.region,
+                payload_hash=UNSIGNED_PAYLOAD,
+            ),
+            timeout=self.timeout,
+            **kwargs,
+        )
+
+    def exists(self, location: S3Location) -> bool:
+        """returns whether an object exists"""
+        response = self.request("s3_head_object", "HEAD", location.get_url())
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def put(self, location: S3Location, path: str, size: int) -> None:
+        """uploads a file in a single request, streamed from disk"""
+        with open(path, "rb") as stream:
+            response = self.request(
+                "s3_put_object",
+                "PUT",
+                location.get_url(),
+                headers={"Content-Length": str(size)},
+                data=stream,
+            )
+        response.raise_for_status()
+
+    def put_multipart(self, location: S3Location, path: str, size: int) -> None:
+        """uploads a file in parts, the upload is aborted if a part fails"""
+        url = location.get_url()
+        response = self.request("s3_create_multipart_upload", "POST", f"{url}?uploads")
+        response.raise_for_status()
+        upload_id = re.search(r"<UploadId>([^<]+)</UploadId>", response.text).group(1)
+
+        # the parts are as large as needed to stay within the maximum number of parts
+        part_size = max(self.part_size, -(-size // MAX_PARTS))
+        etags = []
+        try:
+            with open(path, "rb") as stream:
+                for number in range(1, -(-size // part_size) + 1):
+                    response = self.request(
+                        "s3_upload_part",
+                        "PUT",
+                        f"{url}?partNumber={number}&uploadId={quote(upload_id, safe='')}",
+                        data=stream.read(part_size),
+                    )
+                    response.raise_for_status()
+                    etags.append(response.headers["ETag"])
+
+            parts = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, start=1)
+            )
+            response = self.request(
+                "s3_complete_multipart_upload",
+                "POST",
+                f"{url}?uploadId={quote(upload_id, safe='')}",
+                data=f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode(),
+            )
+            response.raise_for_status()
+        except BaseException:
+            self.request("s3_abort_multipart_upload", "DELETE", f"{url}?uploadId={quote(upload_id, safe='')}")
+            raise
+
+    def upload(self, path: str) -> Tuple[str, int]:
+        """
+        Uploads a file unless the same content is already uploaded.
+
+        :param path: Path of the file.
+        :return: The presigned URL the workflow pods read the file from and the number of bytes uploaded.
+        :raises requests.exceptions.RequestException: The file cannot be uploaded.
+        """
+        size = os.path.getsize(path)
+        location = self.get_location(get_file_digest(path))
+
+        if self.exists(location):
+            logger.info(f"{path} is already uploaded to {location.key}")
+            size = 0
+        elif size > self.part_size:
+            self.put_multipart(location, path, size)
+        else:
+            self.put(location, path, size)
+
+        url = presign_v4(
+            "GET",
+            f"{self.public_endpoint}/{location.bucket}/{quote(location.key, safe='/~')}",
+            self.access_key,
+            self.secret_key,
+            self.region,
+            expires=self.expires,
+        )
+        return url, size
+
+    def upload_inputs(self, processing_parameters: dict, timings: Optional[PhaseRecorder] = None) -> dict:
+        """
+        Uploads the file inputs of the processing parameters concurrently.
+
+        :param processing_parameters: The processing parameters with the CWL File inputs (class and path).
+        :param timings: Recorder counting the uploads.
+        :return: The processing parameters with the File inputs read from their uploaded location.
+        """
+        paths = [path for path in find_local_files(processing_parameters) if os.path.isfile(path)]
+        if not paths:
+            return processing_parameters
+
+        with ThreadPoolExecutor(max_workers=min(self.max_connections, len(paths))) as executor:
+            uploads = list(executor.map(self.upload, paths))
+
+        # counted from this thread, the recorder charges the current phase
+        if timings is not None:
+            for _, size in uploads:
+                timings.count_api_call(bytes_sent=size)
+
+        locations = {path: url for path, (url, _) in zip(paths, uploads)}
+        logger.info(f"uploaded {len(paths)} file inputs to {self.bucket}/{self.prefix}")
+        return relocate_files(processing_parameters, locations)
@@ -0,0 +1,285 @@
+# Description: This file contains the pre-flight validation of the processing parameters: a validator compiled
+# once per service from the CWL input schema, checking and coercing the parameters in a single pass.
+import re
+import weakref
+from typing import Callable, List
+
+from zoo_argowf_runner.zoo_helpers import CWLWorkflow
+
+# errors reported at most, the job is rejected at the first one anyway
+MAX_ERRORS = 10
+
+INTEGER_PATTERN = re.compile(r"[+-]?\d+")
+
+BOOLEANS = {"true": True, "false": False, "1": True, "0": False}
+
+_validators = weakref.WeakKeyDictionary()
+
+
+class InputValidationError(ValueError):
+    """Raised when the processing parameters do not match the CWL input schema of the service."""
+
+    def __init__(self, errors: List[str]) -> None:
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+class Invalid(Exception):
+    """Raised by a compiled converter, carries the message of the rejected value."""
+
+
+def to_int(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and INTEGER_PATTERN.fullmatch(value.strip()):
+        return int(value)
+    raise Invalid(f"expected an integer, got {value!r}")
+
+
+def to_float(value):
+    if type(value) is float:
+        return value
+    if isinstance(value, (int, str)) and not isinstance(value, bool):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise Invalid(f"expected a number, got {value!r}")
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    # Zoo passes the booleans as 0 or 1
+    if isinstance(value, (int, str)) and str(value).strip().lower() in BOOLEANS:
+        return BOOLEANS[str(value).strip().lower()]
+    raise Invalid(f"expected a boolean, got {value!r}")
+
+
+def to_string(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise Invalid(f"expected a string, got {value!r}")
+
+
+def to_null(value):
+    if value is None:
+        return value
+    raise Invalid(f"expected null, got {value!r}")
+
+
+def to_any(value):
+    if value is None:
+        raise Invalid("expected a value, got null")
+    return value
+
+
+def to_self(value):
+    return value
+
+
+def file_converter(cwl_class: str) -> Callable:
+    """returns the converter of a File or Directory: an object of the class or a URL staged in"""
+
+    def convert(value):
+        if isinstance(value, str) and value:
+            return value
+        if isinstance(value, dict) and value.get("class") == cwl_class and (
+            "path" in value or "location" in value or "contents" in value or "listing" in value
+        ):
+            return value
+        raise Invalid(f"expected a {cwl_class}, got {value!r}")
+
+    return convert
+
+
+PRIMITIVES = {
+    "null": to_null,
+    "boolean": to_bool,
+    "int": to_int,
+    "long": to_int,
+    "float": to_float,
+    "double": to_float,
+    "string": to_string,
+    "Any": to_any,
+    "File": file_converter("File"),
+    "Directory": file_converter("Directory"),
+}
+
+# the values accepted as they are by the primitive converters, to check the large arrays at once
+EXACT_TYPES = {
+    "boolean": (bool,),
+    "int": (int,),
+    "long": (int,),
+    "float": (float,),
+    "double": (float,),
+    "string": (str,),
+}
+
+
+def compile_type(cwl_type) -> Callable:
+    """
+    Compiles the converter of a CWL type, as returned by CWLWorkflow.get_schema_type.
+
+    Args:
+        cwl_type (str, list or dict): The type name, a list for unions or a dict for array, enum and record schemas.
+
+    Returns:
+        Callable: The function returning the coerced value, raising Invalid if it does not match the type.
+    """
+    if isinstance(cwl_type, str):
+        # the types defined elsewhere (e.g. SchemaDefRequirement) are left to cwltool
+        return PRIMITIVES.get(cwl_type, to_self)
+
+    if isinstance(cwl_type, list):
+        return compile_union(cwl_type)
+
+    if cwl_type["type"] == "array":
+        return compile_array(cwl_type["items"])
+
+    if cwl_type["type"] == "enum":
+        symbols = frozenset(cwl_type["symbols"])
+
+        def convert_enum(value):
+            if isinstance(value, str) and value in symbols:
+                return value
+            raise Invalid(f"expected one of {sorted(symbols)}, got {value!r}")
+
+        return convert_enum
+
+    if cwl_type["type"] == "record":
+        fields = [(field["name"], compile_type(field["type"])) for field in cwl_type["fields"]]
+
+        def convert_record(value):
+            if not isinstance(value, dict):
+                raise Invalid(f"expected a record, got {value!r}")
+            converted = dict(value)
+            for name, convert in fields:
+                try:
+                    converted[name] = convert(value.get(name))
+                except Invalid as exc:
+                    raise Invalid(f"{name}: {exc}") from None
+            return converted
+
+        return convert_record
+
+    raise ValueError(f"Unsupported CWL type: {cwl_type}")
+
+
+def compile_union(members: list) -> Callable:
+    """returns the converter of a union: the value as it is if a member accepts it exactly, else the first coercion"""
+    converters = [compile_type(member) for member in members]
+    exact = tuple(
+        python_type
+        for member in members
+        if isinstance(member, str)
+        for python_type in EXACT_TYPES.get(member, ())
+    )
+    optional = "null" in members
+
+    def convert_union(value):
+        if value is None and optional:
+            return None
+        # a boolean is an int for isinstance, not for CWL
+        if isinstance(value, exact) and not (isinstance(value, bool) and bool not in exact):
+            return value
+        for convert in converters:
+            try:
+                return convert(value)
+            except Invalid:
+                pass
+        raise Invalid(f"expected {members!r}, got {value!r}")
+
+    return convert_union
+
+
+def compile_array(items) -> Callable:
+    """returns the converter of an array, a single value is an array of one item (as Zoo passes them)"""
+    convert_item = compile_type(items)
+    exact = frozenset(EXACT_TYPES[items]) if isinstance(items, str) and items in EXACT_TYPES else None
+
+    def convert_array(value):
+        if not isinstance(value, list):
+            value = [value]
+
+        # the arrays of exactly typed items are checked at once, without a Python call per item
+        if exact is not None and set(map(type, value)) <= exact:
+            return value
+
+        converted = []
+        append = converted.append
+        for index, item in enumerate(value):
+            try:
+                append(convert_item(item))
+            except Invalid as exc:
+                raise Invalid(f"[{index}]: {exc}") from None
+        return converted
+
+    return convert_array
+
+
+class InputValidator:
+    """
+    Validator of the processing parameters of a service, compiled from its CWL input schema.
+
+    The parameters not declared by the schema are passed as they are.
+    """
+
+    def __init__(self, schema: List[dict]) -> None:
+        """
+        :param schema: The CWL input schema, see CWLWorkflow.get_input_schema.
+        """
+        self.inputs = []
+        for inp in schema:
+            cwl_type = inp["type"]
+            optional = inp.get("default") is not None or (
+                isinstance(cwl_type, list) and "null" in cwl_type
+            )
+            self.inputs.append((inp["id"], compile_type(cwl_type), optional))
+
+    def validate(self, parameters: dict) -> dict:
+        """
+        Checks and coerces the processing parameters (e.g. the numbers given as strings).
+
+        :param parameters: The processing parameters.
+        :return: The coerced parameters.
+        :raises InputValidationError: Parameters are missing or do not match their type.
+        """
+        converted = dict(parameters)
+        errors = []
+
+        for name, convert, optional in self.inputs:
+            if name not in parameters or parameters[name] is None:
+                if not optional:
+                    errors.append(f"{name}: missing mandatory input")
+                continue
+            try:
+                converted[name] = convert(parameters[name])
+            except Invalid as exc:
+                errors.append(f"{name}: {exc}")
+
+            if len(errors) >= MAX_ERRORS:
+                break
+
+        if errors:
+            raise InputValidationError(errors)
+        return converted
+
+
+def get_input_validator(workflow: CWLWorkflow) -> InputValidator:
+    """
+    Returns the validator of a service, compiled at the first call and kept with the workflow.
+
+    Args:
+        workflow (CWLWorkflow): The CWL workflow (or its bundle).
+
+    Returns:
+        InputValidator: The compiled validator.
+    """
+    if (validator := _validators.get(workflow)) is None:
+        validator = _validators[workflow] = InputValidator(workflow.get_input_schema())
+    return validator
@@ -1,9 +1,75 @@
 # Description: Helper classes for the zoo-argowf-runner
 import os
+import sys
 import attr
 import inspect
-import cwl_utils
-from cwl_utils.parser import load_document_by_yaml
+import importlib.util
+
+# cwl_utils parser module of each CWL version
+CWL_PARSERS = {"v1.0": "cwl_v1_0", "v1.1": "cwl_v1_1", "v1.2": "cwl_v1_2"}
+
+
+def get_cwl_parser(version: str):
+    """
+    Returns the cwl_utils parser module of a CWL version.
+
+    cwl_utils.parser imports the parsers of all the CWL versions, the parser module
+    is loaded on its own so that only the declared version is imported.
+
+    Args:
+        version (str): The CWL version (e.g. 'v1.0').
+
+    Returns:
+        module: The cwl_utils.parser.cwl_v1_x module.
+    """
+    if version not in CWL_PARSERS:
+        raise ValueError(f"Unsupported CWL version: {version}")
+
+    name = f"cwl_utils.parser.{CWL_PARSERS[version]}"
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    package = importlib.util.find_spec("cwl_utils")
+    spec = importlib.util.spec_from_file_location(
+        name,
+        os.path.join(
+            package.submodule_search_locations[0], "parser", f"{CWL_PARSERS[version]}.py"
+        ),
+    )
+    module = importlib.util.module_from_spec(spec)
+
+    # registered so that a later import of cwl_utils.parser reuses it
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+
+    return module
+
+
+def load_cwl_document(cwl: dict, uri: str):
+    """
+    Loads a CWL document with the parser of the version it declares.
+
+    Args:
+        cwl (dict): The CWL document as loaded from YAML.
+        uri (str): The base URI of the document.
+
+    Returns:
+        The parsed process or list of processes.
+    """
+    version = cwl.get("cwlVersion")
+    result = get_cwl_parser(version).load_document_by_yaml(cwl, uri)
+
+    if isinstance(result, list):
+        for elem in result:
+            if "cwlVersion" in elem.attrs:
+                elem.cwlVersion = version
+
+    return result
 
 
 # useful class for hints in CWL
@@ -25,10 +91,30 @@ class ResourceRequirement:
         )
 
 
+# pod placement hints provided by the execution handler
+@attr.s
+class PodPlacement:
+    node_selector = attr.ib(default=None)
+    env_vars = attr.ib(default=None)
+    affinity = attr.ib(default=None)
+    tolerations = attr.ib(default=None)
+    priority_class = attr.ib(default=None)
+
+
+# estimated resources of an execution
+@attr.s
+class ResourcePlan:
+    volume_size = attr.ib()
+    max_cores = attr.ib()
+    max_ram = attr.ib()
+    # seconds after which Argo fails the running workflow
+    active_deadline_seconds = attr.ib(default=None)
+
+
 class CWLWorkflow:
     def __init__(self, cwl, workflow_id):
         self.raw_cwl = cwl
-        self.cwl = load_document_by_yaml(cwl, "io://")
+        self.cwl = load_cwl_document(cwl, "io://")
         self.workflow_id = workflow_id
 
     def get_version(self):
@@ -43,8 +129,8 @@ class CWLWorkflow:
 
         return self.get_workflow().doc
 
-    def get_workflow(self) -> cwl_utils.parser.cwl_v1_0.Workflow:
-        # returns a cwl_utils.parser.cwl_v1_0.Workflow)
+    def get_workflow(self):
+        # returns a cwl_utils.parser.cwl_v1_x.Workflow
         ids = [elem.id.split("#")[-1] for elem in self.cwl]
 
         return self.cwl[ids.index(self.workflow_id)]
@@ -65,17 +151,88 @@ class CWLWorkflow:
                 inputs.append(inp.id.split("/")[-1])
         return inputs
 
+    @staticmethod
+    def get_schema_type(cwl_type):
+        """Returns a CWL input type as plain data
+
+        Args:
+            cwl_type (str, list or schema object): the parsed CWL type
+
+        Returns:
+            str, list or dict: the type name, a list for unions or a dict for
+            array, enum and record schemas
+        """
+        if isinstance(cwl_type, str):
+            return cwl_type.split("#")[-1]
+        if isinstance(cwl_type, list):
+            return [CWLWorkflow.get_schema_type(elem) for elem in cwl_type]
+        if cwl_type.type == "array":
+            return {"type": "array", "items": CWLWorkflow.get_schema_type(cwl_type.items)}
+        if cwl_type.type == "enum":
+            return {
+                "type": "enum",
+                "symbols": [symbol.split("/")[-1] for symbol in cwl_type.symbols],
+            }
+        if cwl_type.type == "record":
+            return {
+                "type": "record",
+                "fields": [
+                    {
+                        "name": field.name.split("/")[-1],
+                        "type": CWLWorkflow.get_schema_type(field.type),
+                    }
+                    for field in cwl_type.fields or []
+                ],
+            }
+        raise ValueError(f"Unsupported CWL type: {cwl_type}")
+
+    def get_input_schema(self):
+        """Returns the workflow inputs schema as plain data (id, type and default)"""
+        return [
+            {
+                "id": inp.id.split("/")[-1],
+                "type": self.get_schema_type(inp.type),
+                "default": inp.default,
+            }
+            for inp in self.get_workflow().inputs
+        ]
+
+    def get_processes(self):
+        """Returns the processes run by the workflow, itself first then in step order, each once"""
+        processes = {}
+        pending = [self.get_workflow()]
+        while pending:
+            elem = pending.pop(0)
+            if elem.id in processes:
+                continue
+            processes[elem.id] = elem
+            for step in getattr(elem, "steps", None) or []:
+                # the step runs a process of the $graph ('#crop') or an embedded one
+                pending.append(
+                    self.get_object_by_id(step.run.split("#")[-1])
+                    if isinstance(step.run, str)
+                    else step.run
+                )
+        return list(processes.values())
+
+    def get_docker_images(self):
+        """Returns the container images (DockerRequirement dockerPull) of the workflow processes, each once"""
+        images = []
+        for elem in self.get_processes():
+            for requirement in (elem.requirements or []) + (elem.hints or []):
+                # the hints are not parsed
+                if isinstance(requirement, dict):
+                    class_, image = requirement.get("class"), requirement.get("dockerPull")
+                else:
+                    class_, image = requirement.class_, getattr(requirement, "dockerPull", None)
+                if class_ == "DockerRequirement" and image and image not in images:
+                    images.append(image)
+        return images
+
     @staticmethod
     def has_scatter_requirement(workflow):
         return any(
-            isinstance(
-                requirement,
-                (
-                    cwl_utils.parser.cwl_v1_0.ScatterFeatureRequirement,
-                    cwl_utils.parser.cwl_v1_1.ScatterFeatureRequirement,
-                    cwl_utils.parser.cwl_v1_2.ScatterFeatureRequirement,
-                ),
-            )
+            requirement.class_ == "ScatterFeatureRequirement"
             for requirement in workflow.requirements
         )
 
@@ -87,7 +244,7 @@ class CWLWorkflow:
             elem (CommandLineTool or Workflow): CommandLineTool or Workflow
 
         Returns:
-            cwl_utils.parser.cwl_v1_2.ResourceRequirement or ResourceRequirement
+            cwl_utils.parser.cwl_v1_x.ResourceRequirement or ResourceRequirement
         """
         resource_requirement = []
 
@@ -96,14 +253,7 @@ class CWLWorkflow:
             resource_requirement = [
                 requirement
                 for requirement in elem.requirements
-                if isinstance(
-                    requirement,
-                    (
-                        cwl_utils.parser.cwl_v1_0.ResourceRequirement,
-                        cwl_utils.parser.cwl_v1_1.ResourceRequirement,
-                        cwl_utils.parser.cwl_v1_2.ResourceRequirement,
-                    ),
-                )
+                if requirement.class_ == "ResourceRequirement"
             ]
 
             if len(resource_requirement) == 1:
@@ -133,14 +283,7 @@ class CWLWorkflow:
         }
 
         for elem in self.cwl:
-            if isinstance(
-                elem,
-                (
-                    cwl_utils.parser.cwl_v1_0.Workflow,
-                    cwl_utils.parser.cwl_v1_1.Workflow,
-                    cwl_utils.parser.cwl_v1_2.Workflow,
-                ),
-            ):
+            if elem.class_ == "Workflow":
                 if resource_requirement := self.get_resource_requirement(elem):
                     for resource_type in [
                         "coresMin",